@@ -1,6 +1,7 @@
+import datetime
 from typing import List, Optional
 
-from sqlalchemy import Column, Float, ForeignKeyConstraint, Identity, Index, Integer, LargeBinary, PrimaryKeyConstraint, Table, Unicode
+from sqlalchemy import Column, DateTime, Float, ForeignKeyConstraint, Identity, Index, Integer, LargeBinary, PrimaryKeyConstraint, Table, Unicode
 from sqlalchemy.dialects.mssql import IMAGE
 from sqlalchemy.orm import DeclarativeBase, Mapped, mapped_column, relationship
 
@@ -66,6 +67,8 @@ class Camera(Base):
     Manager1: Mapped[Optional['Manager']] = relationship('Manager', back_populates='Camera')
     CameraHaveSlot: Mapped[List['CameraHaveSlot']] = relationship('CameraHaveSlot', back_populates='Camera1')
     PTS: Mapped[List['PTS']] = relationship('PTS', back_populates='Camera1')
+    TicketIssue: Mapped[List['TicketIssue']] = relationship('TicketIssue', back_populates='Camera1',
+                                                            passive_deletes=True)
 
 
 class CheckIn(Base):
@@ -127,6 +130,7 @@ class Ticket(Base):
 
     Slot_: Mapped[List['Slot']] = relationship('Slot', secondary='TicketAllowSlot', back_populates='Ticket')
     Manager1: Mapped[Optional['Manager']] = relationship('Manager', back_populates='Ticket')
+    TicketIssue: Mapped[Optional['TicketIssue']] = relationship('TicketIssue', uselist=False, back_populates='Ticket1')
 
 
 class CameraHaveSlot(Base):
@@ -169,6 +173,25 @@ class PTS(Base):
     Camera1: Mapped[Optional['Camera']] = relationship('Camera', back_populates='PTS')
 
 
+class TicketIssue(Base):
+    __tablename__ = 'TicketIssue'
+    __table_args__ = (
+        ForeignKeyConstraint(['Camera'], ['Camera.ID'], ondelete='CASCADE', name='FK_TicketIssue_Camera'),
+        ForeignKeyConstraint(['Ticket'], ['Ticket.ID'], name='FK_TicketIssue_Ticket'),
+        PrimaryKeyConstraint('Ticket', name='PK_TicketIssue')
+    )
+
+    Ticket_: Mapped[int] = mapped_column('Ticket', Integer, primary_key=True)
+    Camera_: Mapped[Optional[int]] = mapped_column('Camera', Integer)
+    TrackID: Mapped[Optional[int]] = mapped_column(Integer)
+    ReservedAt: Mapped[Optional[datetime.datetime]] = mapped_column(DateTime)
+    IssuedAt: Mapped[Optional[datetime.datetime]] = mapped_column(DateTime)
+    ReleasedAt: Mapped[Optional[datetime.datetime]] = mapped_column(DateTime)
+
+    Camera1: Mapped[Optional['Camera']] = relationship('Camera', back_populates='TicketIssue')
+    Ticket1: Mapped['Ticket'] = relationship('Ticket', back_populates='TicketIssue')
+
+
 t_TicketAllowSlot = Table(
     'TicketAllowSlot', Base.metadata,
     Column('Ticket', Integer, primary_key=True, nullable=False),
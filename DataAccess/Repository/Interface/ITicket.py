@@ -0,0 +1,19 @@
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+class ITicket:
+    def reserve_tickets(self, manager_username: str, camera_id: int, count: int) -> Optional[List[int]]:
+        pass
+
+    def assign_tickets(self, assignments: List[Dict]) -> bool:
+        pass
+
+    def release_tickets(self, camera_id: int, ticket_ids: Optional[List[int]] = None) -> int:
+        pass
+
+    def return_tickets(self, camera_id: int, ticket_ids: Optional[List[int]] = None,
+                       issued_before: Optional[datetime] = None) -> int:
+        pass
+
+    def get_allowed_slots(self, ticket_ids: List[int]) -> Optional[List[Tuple[int, int]]]:
+        pass
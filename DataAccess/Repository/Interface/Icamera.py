@@ -26,4 +26,8 @@ class ICameraRepository(ABC):
 
     @abstractmethod
     def get_cameras_by_manager(self, manager: str) -> List[Camera]:
-        pass
\ No newline at end of file
+        pass
+
+    @abstractmethod
+    def get_layout_fingerprint(self, camera_id: int, manager: str) -> Optional[str]:
+        pass
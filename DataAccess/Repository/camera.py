@@ -29,4 +29,7 @@ class CameraRepository(ICameraRepository):
     def get_cameras_by_manager(self, manager: str) -> List[Camera]:
         if not manager or not manager.strip():
             raise ValueError("Manager name cannot be empty!")
-        return self.camera_dao.get_cameras_by_manager(manager)
\ No newline at end of file
+        return self.camera_dao.get_cameras_by_manager(manager)
+
+    def get_layout_fingerprint(self, camera_id: int, manager: str) -> Optional[str]:
+        return self.camera_dao.get_layout_fingerprint(camera_id, manager)
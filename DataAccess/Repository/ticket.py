@@ -0,0 +1,59 @@
+# ticket.py
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+import logging
+from DataAccess.ticketDAO import TicketDAO
+from DataAccess.Repository.Interface.ITicket import ITicket
+
+# Set up logging
+logging.basicConfig(level=logging.DEBUG, format='%(asctime)s - %(levelname)s - %(message)s')
+
+class TicketRepository(ITicket):
+    def __init__(self, db_context):
+        self.ticket_dao = TicketDAO(db_context)
+        logging.debug("TicketRepository initialized")
+
+    def reserve_tickets(self, manager_username: str, camera_id: int, count: int) -> Optional[List[int]]:
+        """Reserve a block of free tickets for a camera; empty list if none is free, None on error."""
+        try:
+            return self.ticket_dao.reserve_tickets(manager_username, camera_id, count)
+        except Exception as e:
+            logging.error(f"Error reserving tickets for camera {camera_id}: {str(e)}")
+            return None
+
+    def assign_tickets(self, assignments: List[Dict]) -> bool:
+        """Write a batch of ticket assignments back; False on error."""
+        try:
+            self.ticket_dao.assign_tickets(assignments)
+            return True
+        except Exception as e:
+            logging.error(f"Error assigning {len(assignments)} tickets: {str(e)}")
+            return False
+
+    def release_tickets(self, camera_id: int, ticket_ids: Optional[List[int]] = None) -> int:
+        """Release unassigned tickets reserved by a camera; 0 on error."""
+        try:
+            return self.ticket_dao.release_tickets(camera_id, ticket_ids)
+        except Exception as e:
+            logging.error(f"Error releasing tickets of camera {camera_id}: {str(e)}")
+            return 0
+
+    def return_tickets(self, camera_id: int, ticket_ids: Optional[List[int]] = None,
+                       issued_before: Optional[datetime] = None) -> int:
+        """Mark assigned tickets of a camera as released, keeping the assignment; 0 on error."""
+        try:
+            return self.ticket_dao.return_tickets(camera_id, ticket_ids, issued_before)
+        except Exception as e:
+            logging.error(f"Error returning tickets of camera {camera_id}: {str(e)}")
+            return 0
+
+    def get_allowed_slots(self, ticket_ids: List[int]) -> Optional[List[Tuple[int, int]]]:
+        """Retrieve (ticket, slot) pairs of TicketAllowSlot for a batch of tickets.
+
+        Returns None on error, so callers can tell a failed query from tickets with no allowed slot.
+        """
+        try:
+            return self.ticket_dao.get_allowed_slots(ticket_ids)
+        except Exception as e:
+            logging.error(f"Error retrieving allowed slots for {len(ticket_ids)} tickets: {str(e)}")
+            return None
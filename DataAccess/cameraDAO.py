@@ -1,5 +1,8 @@
+import hashlib
+import json
 from typing import List, Optional
-from BusinessObject.models import Camera
+from BusinessObject.models import Camera, CheckIn, Manager, PTS, Slot, TicketIssue
+from sqlalchemy import delete, select
 from sqlalchemy.orm import Session
 
 class CameraDAO:
@@ -23,6 +26,8 @@ class CameraDAO:
         with self.db_context.get_session() as session:
             camera = session.get(Camera, camera_id)
             if camera:
+                # Trả lại ticket camera đang giữ (database cũ chưa có ON DELETE CASCADE trên FK_TicketIssue_Camera)
+                session.execute(delete(TicketIssue).where(TicketIssue.Camera_ == camera_id))
                 session.delete(camera)
                 session.commit()
                 return True
@@ -40,4 +45,29 @@ class CameraDAO:
         with self.db_context.get_session() as session:
             cameras = session.query(Camera).filter(Camera.Manager_ == manager).all()
             print(f"Cameras found for manager '{manager}': {[camera.ID for camera in cameras]}")
-            return cameras
\ No newline at end of file
+            return cameras
+
+    def get_layout_fingerprint(self, camera_id: int, manager: str) -> Optional[str]:
+        """SHA-1 of the data a camera bundle is compiled from; None if the camera does not exist.
+
+        Covers ValLink and MainMap plus every row (ID and coordinates, ordered by ID) of the manager's
+        slots and check-ins and of the camera's PTS points, so any edit changes the fingerprint.
+        """
+        with self.db_context.get_session() as session:
+            val_link = session.scalar(select(Camera.ValLink).where(Camera.ID == camera_id))
+            if val_link is None and session.get(Camera, camera_id) is None:
+                return None
+            data = [val_link, session.scalar(select(Manager.MainMap).where(Manager.UserName == manager))]
+            quad_columns = ['d1x', 'd1y', 'd2x', 'd2y', 'd3x', 'd3y', 'd4x', 'd4y']
+            for model, columns, condition in (
+                (Slot, quad_columns, Slot.Manager_ == manager),
+                (CheckIn, quad_columns, CheckIn.Manager_ == manager),
+                (PTS, ['srcX', 'srcY', 'dstX', 'dstY'], PTS.Camera_ == camera_id),
+            ):
+                rows = session.execute(
+                    select(model.ID, *[getattr(model, column) for column in columns])
+                    .where(condition)
+                    .order_by(model.ID)
+                ).all()
+                data.append([list(row) for row in rows])
+            return hashlib.sha1(json.dumps(data, default=str).encode("utf-8")).hexdigest()
@@ -1,16 +1,91 @@
+import hashlib
+import json
+import os
+import threading
 import database
 from sqlalchemy import create_engine
 from sqlalchemy.orm import sessionmaker
 from BusinessObject.models import Base
 
+DEFAULT_DB_URL = "mssql+pyodbc://@"+database.server+"/CarPark?driver=ODBC+Driver+17+for+SQL+Server&Trusted_Connection=yes"
+
+# File lưu phiên bản schema đã kiểm tra cho từng database
+SCHEMA_VERSION_FILE = os.path.join("cache", "schema_version.json")
+
+# Engine và sessionmaker dùng chung trong tiến trình, theo db_url
+_engines = {}
+_sessionmakers = {}
+_schema_checked = set()
+_lock = threading.Lock()
+
+
+def get_engine(db_url=DEFAULT_DB_URL):
+    """Trả về engine dùng chung của db_url, tạo một lần mỗi tiến trình với connection pool.
+
+    Kích thước pool lấy từ database.py (pool_size, max_overflow, pool_pre_ping, pool_recycle).
+    """
+    with _lock:
+        engine = _engines.get(db_url)
+        if engine is None:
+            options = {"pool_pre_ping": getattr(database, "pool_pre_ping", True)}
+            if not db_url.startswith("sqlite"):
+                options["pool_size"] = getattr(database, "pool_size", 5)
+                options["max_overflow"] = getattr(database, "max_overflow", 10)
+                options["pool_recycle"] = getattr(database, "pool_recycle", 1800)
+            engine = create_engine(db_url, **options)
+            _engines[db_url] = engine
+            _sessionmakers[db_url] = sessionmaker(bind=engine)
+        return engine
+
+
+def schema_version():
+    """Mã băm của các bảng và cột trong BusinessObject.models."""
+    description = [
+        (table.name, [(column.name, str(column.type)) for column in table.columns])
+        for table in Base.metadata.sorted_tables
+    ]
+    return hashlib.sha1(json.dumps(description).encode("utf-8")).hexdigest()
+
+
+def _read_schema_versions():
+    try:
+        with open(SCHEMA_VERSION_FILE, encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def _write_schema_version(db_url, version):
+    versions = _read_schema_versions()
+    versions[db_url] = version
+    try:
+        os.makedirs(os.path.dirname(SCHEMA_VERSION_FILE), exist_ok=True)
+        with open(SCHEMA_VERSION_FILE, "w", encoding="utf-8") as f:
+            json.dump(versions, f, indent=2)
+    except OSError as e:
+        print(f"Cannot save schema version: {str(e)}")
+
+
+def ensure_schema_once(db_url=DEFAULT_DB_URL, force=False):
+    """Chạy create_all một lần mỗi tiến trình; bỏ qua nếu phiên bản schema đã lưu khớp với models."""
+    if db_url in _schema_checked and not force:
+        return
+    version = schema_version()
+    if force or _read_schema_versions().get(db_url) != version:
+        Base.metadata.create_all(get_engine(db_url))
+        _write_schema_version(db_url, version)
+    _schema_checked.add(db_url)
+
+
 class DBContext:
-    def __init__(self, db_url="mssql+pyodbc://@"+database.server+"/CarPark?driver=ODBC+Driver+17+for+SQL+Server&Trusted_Connection=yes"):
-        self.engine = create_engine(db_url)
-        Base.metadata.create_all(self.engine)
-        self.Session = sessionmaker(bind=self.engine)
+    def __init__(self, db_url=DEFAULT_DB_URL):
+        self.db_url = db_url
+        self.engine = get_engine(db_url)
+        ensure_schema_once(db_url)
+        self.Session = _sessionmakers[db_url]
 
     def get_session(self):
         return self.Session()
 
     def ensure_schema(self):
-        Base.metadata.create_all(self.engine)
\ No newline at end of file
+        ensure_schema_once(self.db_url, force=True)
@@ -0,0 +1,157 @@
+# ticketDAO.py
+from datetime import datetime
+import random
+import time
+from typing import Dict, List, Optional, Tuple
+import logging
+from sqlalchemy import delete, insert, select, update
+from sqlalchemy.exc import IntegrityError
+from DataAccess.dbcontext import DBContext
+from BusinessObject.models import Ticket, TicketIssue, t_TicketAllowSlot
+
+# Set up logging
+logging.basicConfig(level=logging.DEBUG, format='%(asctime)s - %(levelname)s - %(message)s')
+
+# Số lần thử lại khi một tiến trình khác giữ chỗ cùng ticket; lần thử thứ n chờ ngẫu nhiên tối đa
+# RESERVE_BACKOFF * n giây
+RESERVE_ATTEMPTS = 10
+RESERVE_BACKOFF = 0.05
+
+class TicketDAO:
+    def __init__(self, db_context: DBContext):
+        self._db_context = db_context
+        logging.debug("TicketDAO initialized with db_context")
+
+    def reserve_tickets(self, manager_username: str, camera_id: int, count: int) -> List[int]:
+        """Reserve up to count free tickets of a manager for a camera in one batch.
+
+        A ticket is free when it has no TicketIssue row or its row was released (ReleasedAt set); the
+        released row is replaced in the same transaction. On SQL Server the free tickets are read with
+        UPDLOCK/READPAST, so concurrent workers skip each other's rows instead of all picking the lowest IDs.
+        The reservation inserts one TicketIssue row per ticket; the primary key on Ticket makes a ticket
+        reservable by one worker only, so when another process still reserves the same tickets first the
+        batch is rolled back and retried after a random backoff.
+
+        Returns an empty list only when the manager has no free ticket; raises if the batch keeps losing
+        the race or on a database error.
+        """
+        logging.debug(f"Reserving {count} tickets of manager {manager_username} for camera {camera_id}")
+        with self._db_context.get_session() as session:
+            for attempt in range(RESERVE_ATTEMPTS):
+                try:
+                    ticket_ids = session.execute(
+                        select(Ticket.ID)
+                        .with_hint(Ticket, "WITH (UPDLOCK, ROWLOCK, READPAST)", "mssql")
+                        .where(Ticket.Manager_ == manager_username, Ticket.ID.not_in(
+                            select(TicketIssue.Ticket_).where(TicketIssue.ReleasedAt.is_(None))
+                        ))
+                        .order_by(Ticket.ID)
+                        .limit(count)
+                    ).scalars().all()
+                    if not ticket_ids:
+                        logging.warning(f"No free tickets for manager {manager_username}")
+                        return []
+                    now = datetime.now()
+                    # Dòng đã trả lại được thay bằng dòng mới; tiến trình khác dùng lại cùng ticket gây IntegrityError
+                    session.execute(delete(TicketIssue).where(TicketIssue.Ticket_.in_(ticket_ids),
+                                                              TicketIssue.ReleasedAt.is_not(None)))
+                    session.execute(insert(TicketIssue), [
+                        {"Ticket_": ticket_id, "Camera_": camera_id, "ReservedAt": now} for ticket_id in ticket_ids
+                    ])
+                    session.commit()
+                    logging.debug(f"Reserved tickets {ticket_ids[0]}..{ticket_ids[-1]} for camera {camera_id}")
+                    return list(ticket_ids)
+                except IntegrityError:
+                    session.rollback()
+                    logging.warning(f"Tickets reserved concurrently, retrying ({attempt + 1}/{RESERVE_ATTEMPTS})")
+                    time.sleep(random.uniform(0, RESERVE_BACKOFF * (attempt + 1)))
+                except Exception as e:
+                    session.rollback()
+                    logging.error(f"Failed to reserve tickets: {str(e)}")
+                    raise Exception(f"Failed to reserve tickets: {str(e)}")
+            logging.error(f"Failed to reserve tickets after {RESERVE_ATTEMPTS} concurrent attempts")
+            raise Exception("Failed to reserve tickets: reserved concurrently by other workers")
+
+    def assign_tickets(self, assignments: List[Dict]) -> int:
+        """Write ticket assignments ({"ticket", "track_id", "issued_at"}) back in one batched update."""
+        if not assignments:
+            return 0
+        logging.debug(f"Assigning {len(assignments)} tickets")
+        with self._db_context.get_session() as session:
+            try:
+                session.execute(update(TicketIssue), [
+                    {"Ticket_": item["ticket"], "TrackID": item["track_id"], "IssuedAt": item["issued_at"]}
+                    for item in assignments
+                ])
+                session.commit()
+                return len(assignments)
+            except Exception as e:
+                session.rollback()
+                logging.error(f"Failed to assign tickets: {str(e)}")
+                raise Exception(f"Failed to assign tickets: {str(e)}")
+
+    def release_tickets(self, camera_id: int, ticket_ids: Optional[List[int]] = None) -> int:
+        """Release tickets reserved by a camera but never assigned (all of them if ticket_ids is None)."""
+        logging.debug(f"Releasing unassigned tickets of camera {camera_id}")
+        with self._db_context.get_session() as session:
+            try:
+                statement = delete(TicketIssue).where(TicketIssue.Camera_ == camera_id, TicketIssue.TrackID.is_(None))
+                if ticket_ids is not None:
+                    if not ticket_ids:
+                        return 0
+                    statement = statement.where(TicketIssue.Ticket_.in_(ticket_ids))
+                released = session.execute(statement).rowcount
+                session.commit()
+                logging.debug(f"Released {released} tickets of camera {camera_id}")
+                return released
+            except Exception as e:
+                session.rollback()
+                logging.error(f"Failed to release tickets: {str(e)}")
+                raise Exception(f"Failed to release tickets: {str(e)}")
+
+    def return_tickets(self, camera_id: int, ticket_ids: Optional[List[int]] = None,
+                       issued_before: Optional[datetime] = None) -> int:
+        """Mark tickets assigned by a camera as released (handed back), keeping the assignment record.
+
+        Limited to ticket_ids and/or to tickets issued before issued_before; returned tickets can be
+        reserved again.
+        """
+        logging.debug(f"Returning tickets of camera {camera_id}")
+        with self._db_context.get_session() as session:
+            try:
+                statement = (
+                    update(TicketIssue)
+                    .where(TicketIssue.Camera_ == camera_id, TicketIssue.TrackID.is_not(None),
+                           TicketIssue.ReleasedAt.is_(None))
+                    .values(ReleasedAt=datetime.now())
+                )
+                if ticket_ids is not None:
+                    if not ticket_ids:
+                        return 0
+                    statement = statement.where(TicketIssue.Ticket_.in_(ticket_ids))
+                if issued_before is not None:
+                    statement = statement.where(TicketIssue.IssuedAt < issued_before)
+                returned = session.execute(statement).rowcount
+                session.commit()
+                logging.debug(f"Returned {returned} tickets of camera {camera_id}")
+                return returned
+            except Exception as e:
+                session.rollback()
+                logging.error(f"Failed to return tickets: {str(e)}")
+                raise Exception(f"Failed to return tickets: {str(e)}")
+
+    def get_allowed_slots(self, ticket_ids: List[int]) -> List[Tuple[int, int]]:
+        """Retrieve the (ticket, slot) pairs of TicketAllowSlot for the given tickets in one query."""
+        if not ticket_ids:
+            return []
+        logging.debug(f"Getting allowed slots for {len(ticket_ids)} tickets")
+        with self._db_context.get_session() as session:
+            try:
+                rows = session.execute(
+                    select(t_TicketAllowSlot.c.Ticket, t_TicketAllowSlot.c.Slot)
+                    .where(t_TicketAllowSlot.c.Ticket.in_(ticket_ids))
+                ).all()
+                return [(ticket_id, slot_id) for ticket_id, slot_id in rows]
+            except Exception as e:
+                logging.error(f"Database error in get_allowed_slots: {str(e)}")
+                raise Exception(f"Database error: {str(e)}")
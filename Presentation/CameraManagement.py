@@ -1,4 +1,4 @@
-from PyQt5 import QtWidgets
+from PyQt5 import QtCore, QtWidgets
 from PyQt5.QtWidgets import QMessageBox, QTableWidgetItem
 from DataAccess.dbcontext import DBContext
 from DataAccess.Repository.camera import CameraRepository
@@ -8,8 +8,23 @@ from Presentation.PointPicker import PointPickerView
 from Presentation.Designer.CameraManagement import Ui_CameraManagementView
 from BusinessObject.models import Camera, Manager
 from typing import Optional
-from Utils.CameraTracking import process_video, load_camera_data
+from Presentation.CameraPreview import PreviewReceiver, CameraPreviewWidget
 from Utils.homography import run_homography
+from Utils.supervisor import CameraSupervisor
+from Utils.bundle import invalidate_camera_bundles
+from Utils import startup
+
+
+class SupervisorStopper(QtCore.QThread):
+    """Dừng CameraSupervisor (chờ các worker thoát) ngoài luồng giao diện; báo xong qua tín hiệu finished."""
+
+    def __init__(self, supervisor, parent=None):
+        super().__init__(parent)
+        self.supervisor = supervisor
+
+    def run(self):
+        self.supervisor.stop()
+
 
 class CameraManagementView(QtWidgets.QMainWindow, Ui_CameraManagementView):
     def __init__(self, manager_username: str):
@@ -21,12 +36,22 @@ class CameraManagementView(QtWidgets.QMainWindow, Ui_CameraManagementView):
         self.pts_repo = PTSRepository(self.db_context)
         self.current_camera_id: Optional[int] = None
         self.points = {}
+        self.supervisor: Optional[CameraSupervisor] = None
+        self.preview_receiver: Optional[PreviewReceiver] = None
+        self.supervisor_stopper: Optional[SupervisorStopper] = None
+        self.close_requested = False
+        self.preview_widgets = {}
+        self.supervisor_timer = QtCore.QTimer(self)
+        self.supervisor_timer.setInterval(1000)
         print(f"Initializing CameraManagementView with manager: {self.manager_username}")
         self.setupUi(self)
         print("UI setup completed")
         self.load_main_map()
         self.connect_signals()
         print("Signals connected")
+        # Model YOLO chỉ được load trong các worker camera (Utils.supervisor), không load trong giao diện
+        # Startup record được ghi khi camera đầu tiên load xong model (update_supervisor_status) hoặc khi thoát
+        startup.mark("console_shown")
 
     def load_main_map(self):
         try:
@@ -54,6 +79,10 @@ class CameraManagementView(QtWidgets.QMainWindow, Ui_CameraManagementView):
             print("Connected clear_button signal")
             self.operate_button.clicked.connect(self.operate_camera)
             print("Connected operate_button signal")
+            self.operate_all_button.clicked.connect(self.operate_all_cameras)
+            print("Connected operate_all_button signal")
+            self.supervisor_timer.timeout.connect(self.update_supervisor_status)
+            self.preview_tabs.tabCloseRequested.connect(self.close_preview_tab)
             self.mapping_button.clicked.connect(self.run_mapping)
             print("Connected mapping_button signal")
             self.delete_pts_button.clicked.connect(self.delete_pts)
@@ -90,6 +119,7 @@ class CameraManagementView(QtWidgets.QMainWindow, Ui_CameraManagementView):
             print(
                 f"Calling run_homography with camera_id={self.current_camera_id}, val_link={camera.ValLink}, main_map={manager.MainMap}")
             run_homography(self.current_camera_id, camera.ValLink, manager.MainMap, self.db_context)
+            invalidate_camera_bundles(camera_id=self.current_camera_id)
             print("run_homography completed successfully")
             QMessageBox.information(self, "Thành công", "Đã hoàn thành ánh xạ!")
         except Exception as e:
@@ -111,6 +141,7 @@ class CameraManagementView(QtWidgets.QMainWindow, Ui_CameraManagementView):
                 QMessageBox.warning(self, "Lỗi", "ID PTS phải là một số nguyên!")
                 return
             if self.pts_repo.delete_pts_by_id(pts_id):
+                invalidate_camera_bundles()
                 QMessageBox.information(self, "Thành công", f"Đã xóa PTS với ID {pts_id}!")
                 self.pts_id_edit.clear()
             else:
@@ -130,6 +161,7 @@ class CameraManagementView(QtWidgets.QMainWindow, Ui_CameraManagementView):
             )
             if reply == QMessageBox.Yes:
                 if self.pts_repo.delete_pts_by_camera_id(self.current_camera_id):
+                    invalidate_camera_bundles(camera_id=self.current_camera_id)
                     QMessageBox.information(self, "Thành công", "Đã xóa tất cả điểm PTS của camera!")
                 else:
                     QMessageBox.warning(self, "Thông báo", "Không có điểm PTS nào để xóa!")
@@ -143,7 +175,10 @@ class CameraManagementView(QtWidgets.QMainWindow, Ui_CameraManagementView):
                 QMessageBox.warning(self, "Lỗi", "Vui lòng chọn một camera để chỉnh sửa điểm!")
                 return
             picker = PointPickerView(self.manager_username)
-            if picker.exec_():
+            accepted = picker.exec_()
+            # Slot và check-in có thể đã thay đổi trong Point Picker
+            invalidate_camera_bundles(manager_username=self.manager_username)
+            if accepted:
                 self.points = picker.get_points()
                 self.edit_camera()
         except Exception as e:
@@ -154,14 +189,140 @@ class CameraManagementView(QtWidgets.QMainWindow, Ui_CameraManagementView):
             if self.current_camera_id is None:
                 QMessageBox.warning(self, "Lỗi", "Vui lòng chọn một camera để vận hành!")
                 return
-            video_path, destination_zones, checkin_zones, slot_ids = load_camera_data(self.current_camera_id, self.manager_username)
-            if video_path:
-                process_video(video_path, self.current_camera_id, self.manager_username, destination_zones, checkin_zones, slot_ids)
+            camera = self.camera_repo.get_camera_by_id(self.current_camera_id)
+            if camera and camera.ValLink:
+                self.start_cameras([self.current_camera_id])
             else:
                 QMessageBox.critical(self, "Lỗi", "Không có đường dẫn video hợp lệ để xử lý!")
         except Exception as e:
             QMessageBox.critical(self, "Lỗi", f"Không thể vận hành camera: {str(e)}")
 
+    def operate_all_cameras(self):
+        try:
+            if self.supervisor is not None and self.supervisor_stopper is None and self.supervisor.is_running():
+                reply = QMessageBox.question(
+                    self, "Xác nhận", "Các camera đang vận hành. Bạn có muốn dừng tất cả?",
+                    QMessageBox.Yes | QMessageBox.No, QMessageBox.No
+                )
+                if reply == QMessageBox.Yes:
+                    self.stop_supervisor()
+                return
+            cameras = self.camera_repo.get_cameras_by_manager(self.manager_username)
+            camera_ids = [camera.ID for camera in cameras if camera.ValLink]
+            if not camera_ids:
+                QMessageBox.warning(self, "Lỗi", "Không có camera nào có đường dẫn video hợp lệ để vận hành!")
+                return
+            self.start_cameras(camera_ids)
+        except Exception as e:
+            QMessageBox.critical(self, "Lỗi", f"Không thể vận hành các camera: {str(e)}")
+
+    def start_cameras(self, camera_ids):
+        """Vận hành camera trong tiến trình worker; khung hình hiển thị trong tab của từng camera."""
+        if self.supervisor_stopper is not None:
+            QMessageBox.warning(self, "Lỗi", "Các camera đang được dừng, vui lòng thử lại sau!")
+            return
+        if self.supervisor is None:
+            self.supervisor = CameraSupervisor(self.manager_username, camera_ids, preview=True)
+            self.preview_receiver = PreviewReceiver(self.supervisor.preview_queue, self)
+            self.preview_receiver.frame_ready.connect(self.on_preview_frame)
+            self.preview_receiver.start()
+            self.supervisor.start()
+            self.supervisor_timer.start()
+        else:
+            for camera_id in camera_ids:
+                if not self.supervisor.add_camera(camera_id):
+                    print(f"Camera ID {camera_id} is already operating")
+        for camera_id in camera_ids:
+            self.add_preview_tab(camera_id)
+        print(f"Operating cameras {camera_ids} for manager {self.manager_username}")
+
+    def add_preview_tab(self, camera_id):
+        widget = self.preview_widgets.get(camera_id)
+        if widget is None:
+            widget = CameraPreviewWidget(camera_id)
+            self.preview_widgets[camera_id] = widget
+            self.preview_tabs.addTab(widget, f"Camera {camera_id}")
+        self.preview_tabs.setCurrentWidget(widget)
+        self.preview_tabs.setVisible(True)
+
+    def close_preview_tab(self, index):
+        widget = self.preview_tabs.widget(index)
+        self.preview_tabs.removeTab(index)
+        self.preview_widgets.pop(widget.camera_id, None)
+        widget.deleteLater()
+        # Không chờ worker thoát ở đây; trạng thái được cập nhật bởi update_supervisor_status
+        if self.supervisor is not None and self.supervisor_stopper is None:
+            self.supervisor.stop_camera(widget.camera_id, wait=False)
+        self.preview_tabs.setVisible(self.preview_tabs.count() > 0)
+
+    def on_preview_frame(self, camera_id):
+        data = self.preview_receiver.take(camera_id) if self.preview_receiver is not None else None
+        widget = self.preview_widgets.get(camera_id)
+        if data is not None and widget is not None:
+            widget.show_frames(*data)
+
+    def update_supervisor_status(self):
+        if self.supervisor is None:
+            return
+        stats = self.supervisor.get_stats()
+        parts = []
+        for camera_id, entry in stats.items():
+            if entry["model_ready"] is not None and "model_ready" not in startup.get_marks():
+                startup.mark("model_ready")
+                startup.mark("worker_model_ready", entry["model_ready"])
+                startup.write_startup_record()
+            if camera_id in self.preview_widgets:
+                self.preview_widgets[camera_id].set_stats(entry)
+            if not entry["alive"]:
+                state = "stopped"
+            elif entry["status"] != "running":
+                state = "loading model" if entry["status"] == "loading" else "starting"
+            else:
+                state = f"{entry['fps']:.1f} FPS"
+            if entry["frames"]:
+                state += f", {entry['skipped'] / entry['frames']:.0%} skipped"
+            if entry["restarts"]:
+                state += f", {entry['restarts']} restarts"
+            parts.append(f"Camera {camera_id}: {state}")
+        self.statusbar.showMessage(" | ".join(parts))
+        if not self.supervisor.is_running():
+            self.stop_supervisor()
+
+    def stop_supervisor(self):
+        """Dừng tất cả worker ở luồng nền; giao diện được cập nhật trong on_supervisor_stopped."""
+        self.supervisor_timer.stop()
+        if self.supervisor is None or self.supervisor_stopper is not None:
+            return
+        self.statusbar.showMessage("Đang dừng các camera...")
+        self.supervisor_stopper = SupervisorStopper(self.supervisor, self)
+        self.supervisor_stopper.finished.connect(self.on_supervisor_stopped)
+        self.supervisor_stopper.start()
+
+    def on_supervisor_stopped(self):
+        for camera_id, entry in self.supervisor.get_stats().items():
+            if camera_id in self.preview_widgets:
+                self.preview_widgets[camera_id].set_stats(dict(entry, alive=False))
+        self.supervisor = None
+        self.supervisor_stopper.deleteLater()
+        self.supervisor_stopper = None
+        # Preview receiver chạy đến khi các worker đã thoát để worker không bị chặn khi gửi khung hình
+        if self.preview_receiver is not None:
+            self.preview_receiver.stop()
+            self.preview_receiver = None
+        self.statusbar.showMessage("Đã dừng các camera")
+        print("Camera supervisor stopped")
+        if self.close_requested:
+            self.close()
+
+    def closeEvent(self, event):
+        # Chỉ đóng cửa sổ sau khi các worker đã thoát (on_supervisor_stopped gọi lại close)
+        if self.supervisor is not None:
+            self.close_requested = True
+            self.stop_supervisor()
+            event.ignore()
+            return
+        super().closeEvent(event)
+
     def refresh_table(self):
         try:
             print("Refreshing table...")
@@ -210,6 +371,7 @@ class CameraManagementView(QtWidgets.QMainWindow, Ui_CameraManagementView):
                 manager.MainMap = self.main_map_edit.text().strip() or None
                 self.manager_repo.update_manager(manager)
                 print(f"Updated MainMap for manager {self.manager_username}: {manager.MainMap}")
+                invalidate_camera_bundles(manager_username=self.manager_username)
 
             QMessageBox.information(self, "Thành công", "Đã thêm camera và cập nhật MainMap!")
             self.clear_form()
@@ -249,6 +411,8 @@ class CameraManagementView(QtWidgets.QMainWindow, Ui_CameraManagementView):
                     manager.MainMap = self.main_map_edit.text().strip() or None
                     self.manager_repo.update_manager(manager)
                     print(f"Updated MainMap for manager {self.manager_username}: {manager.MainMap}")
+                # ValLink của camera và MainMap của manager có thể đã thay đổi
+                invalidate_camera_bundles(manager_username=self.manager_username)
 
                 QMessageBox.information(self, "Thành công", "Đã cập nhật camera và MainMap!")
                 self.clear_form()
@@ -271,6 +435,7 @@ class CameraManagementView(QtWidgets.QMainWindow, Ui_CameraManagementView):
         if reply == QMessageBox.Yes:
             try:
                 if self.camera_repo.delete_camera(self.current_camera_id):
+                    invalidate_camera_bundles(camera_id=self.current_camera_id)
                     QMessageBox.information(self, "Thành công", "Đã xóa camera!")
                     self.clear_form()
                     self.refresh_table()
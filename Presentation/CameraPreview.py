@@ -0,0 +1,121 @@
+import queue
+import threading
+
+import cv2
+from PyQt5 import QtCore, QtGui, QtWidgets
+
+from Utils.preview import decode_preview
+
+
+class PreviewReceiver(QtCore.QThread):
+    """Luồng nhận khung hình từ các worker camera (CameraSupervisor.preview_queue).
+
+    Chỉ giữ khung hình mới nhất của mỗi camera: frame_ready(camera_id) được phát một lần cho tới khi
+    giao diện lấy khung hình bằng take(), nên giao diện chỉ vẽ khung hình mới nhất dù worker gửi nhanh hơn.
+    """
+
+    frame_ready = QtCore.pyqtSignal(int)
+
+    def __init__(self, preview_queue, parent=None):
+        super().__init__(parent)
+        self.preview_queue = preview_queue
+        self._latest = {}
+        self._pending = set()
+        self._lock = threading.Lock()
+        self._running = True
+
+    def run(self):
+        while self._running:
+            try:
+                message = self.preview_queue.get(timeout=0.2)
+            except queue.Empty:
+                continue
+            except (EOFError, OSError):
+                break
+            camera_id, frame, mapped_frame, info = decode_preview(message)
+            with self._lock:
+                self._latest[camera_id] = (frame, mapped_frame, info)
+                if camera_id in self._pending:
+                    continue
+                self._pending.add(camera_id)
+            self.frame_ready.emit(camera_id)
+
+    def take(self, camera_id):
+        """Lấy khung hình mới nhất (frame, mapped_frame, info) của camera, None nếu không có."""
+        with self._lock:
+            self._pending.discard(camera_id)
+            return self._latest.pop(camera_id, None)
+
+    def stop(self):
+        self._running = False
+        self.wait(2000)
+
+
+class ScaledImageLabel(QtWidgets.QLabel):
+    """QLabel hiển thị ảnh co giãn theo kích thước widget, giữ tỷ lệ."""
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.setAlignment(QtCore.Qt.AlignCenter)
+        self.setSizePolicy(QtWidgets.QSizePolicy.Ignored, QtWidgets.QSizePolicy.Ignored)
+        self.setMinimumSize(160, 90)
+        self._pixmap = None
+
+    def set_image(self, image):
+        if image is None:
+            return
+        rgb = cv2.cvtColor(image, cv2.COLOR_BGR2RGB)
+        height, width = rgb.shape[:2]
+        qimage = QtGui.QImage(rgb.data, width, height, rgb.strides[0], QtGui.QImage.Format_RGB888)
+        self._pixmap = QtGui.QPixmap.fromImage(qimage)
+        self._update_pixmap()
+
+    def _update_pixmap(self):
+        if self._pixmap is not None:
+            self.setPixmap(self._pixmap.scaled(self.size(), QtCore.Qt.KeepAspectRatio, QtCore.Qt.SmoothTransformation))
+
+    def resizeEvent(self, event):
+        super().resizeEvent(event)
+        self._update_pixmap()
+
+
+class CameraPreviewWidget(QtWidgets.QWidget):
+    """Khung xem của một camera: ảnh ValLink đã vẽ, MainMap và số slot trống."""
+
+    def __init__(self, camera_id, parent=None):
+        super().__init__(parent)
+        self.camera_id = camera_id
+        layout = QtWidgets.QVBoxLayout(self)
+        self.info_label = QtWidgets.QLabel(f"Camera {camera_id}: đang khởi động...")
+        layout.addWidget(self.info_label)
+        images = QtWidgets.QHBoxLayout()
+        self.frame_label = ScaledImageLabel()
+        self.map_label = ScaledImageLabel()
+        images.addWidget(self.frame_label, 3)
+        images.addWidget(self.map_label, 2)
+        layout.addLayout(images)
+        self._info = None
+        self._fps = None
+        self._loading = True
+
+    def show_frames(self, frame, mapped_frame, info):
+        self.frame_label.set_image(frame)
+        self.map_label.set_image(mapped_frame)
+        self._info = info
+        self._loading = False
+        self._update_info()
+
+    def set_stats(self, entry):
+        self._fps = entry["fps"] if entry["alive"] else None
+        self._loading = entry["alive"] and entry.get("status") != "running"
+        self._update_info()
+
+    def _update_info(self):
+        parts = [f"Camera {self.camera_id}"]
+        if self._info is not None:
+            parts.append(f"Slot trống: {self._info['available']}/{self._info['total']}")
+        if self._loading:
+            parts.append("đang tải mô hình...")
+        else:
+            parts.append(f"{self._fps:.1f} FPS" if self._fps is not None else "đã dừng")
+        self.info_label.setText(" | ".join(parts))
@@ -242,6 +242,13 @@ class Ui_CameraManagementView(object):
         self.operate_button.setIconSize(QtCore.QSize(39, 18))
         self.verticalLayout_5.addWidget(self.operate_button)
 
+        self.operate_all_button = QtWidgets.QPushButton("Operate All")
+        self.operate_all_button.setObjectName("operate_all_button")
+        self.operate_all_button.setEnabled(True)
+        self.operate_all_button.setIcon(QtGui.QIcon("C:/Users/ADMIN/Pictures/operate.png"))
+        self.operate_all_button.setIconSize(QtCore.QSize(39, 18))
+        self.verticalLayout_5.addWidget(self.operate_all_button)
+
         self.table = QtWidgets.QTableWidget()
         self.table.setObjectName("table")
         self.table.setColumnCount(11)
@@ -263,6 +270,14 @@ class Ui_CameraManagementView(object):
 
         self.main_layout.addWidget(self.widget_2)
 
+        # Khung xem các camera đang vận hành (mỗi camera một tab)
+        self.preview_tabs = QtWidgets.QTabWidget(self.centralwidget)
+        self.preview_tabs.setObjectName("preview_tabs")
+        self.preview_tabs.setTabsClosable(True)
+        self.preview_tabs.setMinimumHeight(360)
+        self.preview_tabs.setVisible(False)
+        self.main_layout.addWidget(self.preview_tabs)
+
         # Menu bar và Status bar
         self.menubar = QtWidgets.QMenuBar(MainWindow)
         self.menubar.setObjectName("menubar")
@@ -1,7 +1,6 @@
 from PyQt5.QtWidgets import QMainWindow, QMessageBox
 from DataAccess.dbcontext import DBContext
 from DataAccess.Repository.manager import ManagerRepository
-from Presentation.CameraManagement import CameraManagementView
 from Presentation.Designer.Login import Ui_LoginView
 
 class LoginView(QMainWindow, Ui_LoginView):
@@ -22,6 +21,8 @@ class LoginView(QMainWindow, Ui_LoginView):
 
     def open_camera_management(self, username):
         try:
+            # Import khi cần để cửa sổ đăng nhập không phải chờ load phần xử lý camera
+            from Presentation.CameraManagement import CameraManagementView
             self.camera_management = CameraManagementView(manager_username=username)
             self.camera_management.show()
             self.close()  # Đóng cửa sổ login
@@ -1,7 +1,7 @@
 import cv2
-import torch
+import time
+import threading
 import numpy as np
-from ultralytics import YOLO
 from collections import deque
 from DataAccess.dbcontext import DBContext
 from DataAccess.Repository.camera import CameraRepository
@@ -9,29 +9,95 @@ from DataAccess.Repository.manager import ManagerRepository
 from DataAccess.Repository.slot import SlotRepository
 from DataAccess.Repository.pts import PTSRepository
 from DataAccess.Repository.CheckIn import CheckInRepository
+from DataAccess.Repository.ticket import TicketRepository
 from BusinessObject.models import Camera, Slot, CheckIn
+from Utils.pipeline import FrameQueue, FrameReader, PipelineStage, StageStats, END_OF_STREAM, DROP_NONE
+from Utils.occupancy import compile_zones, compute_occupancy, OccupancySnapshot, ZoneLabelMask
+from Utils.projection import HomographyProjector, get_projector
+from Utils.homography import get_camera_homography
+from Utils.bundle import load_camera_bundle, save_camera_bundle, invalidate_camera_bundles
+from Utils.detector import get_model, get_int8_model, empty_cuda_cache, extract_detections
+from Utils.motion import MotionGate
+from Utils.roi import ZoneROI
+from Utils.prediction import KalmanBoxPredictor, DetectionSchedule
+from Utils.camera_config import get_camera_config
+from Utils.tracker_profiles import tracker_config_path, tracker_buffer
+from Utils.track_store import TrackStateStore
+from Utils.sink import OccupancyEventWriter
+from Utils.overlay import ZoneOverlay, MainMapRenderer, draw_vehicle_marker
+from Utils.display import DisplayScheduler
+from Utils.tickets import TicketDispenser
+from Utils.ticket_slots import AllowedSlotMatrix
 
-# Kiểm tra và chọn thiết bị
-device = "cuda" if torch.cuda.is_available() else "cpu"
-print(f"Using device: {device}")
 accuracy_limit = 0.3
 
-# Load mô hình YOLO
-try:
-    model = YOLO('car-100_v3.pt')
-except Exception as e:
-    print(f"Error loading model: {e}")
-
-# Hàng đợi ticket
+# Thiết lập model và tracker (được lưu trong camera bundle)
+MODEL_PATH = 'car-100_v3.pt'
+TRACKER_CONFIG = "botsort.yaml"
+TRACK_CONF = 0.75
+TRACK_IOU = 0.45
+TRACK_IMGSZ = 640  # Kích thước ảnh suy luận khi chạy trên toàn khung hình
+
+def get_model_settings(camera_id=None):
+    """Thiết lập model hiện tại dưới dạng dict (dùng để kiểm tra camera bundle còn hợp lệ), gồm backend,
+    int8 và tracker_profile trong thiết lập của camera (camera_config.json)."""
+    config = get_camera_config(camera_id)
+    return {
+        "model": MODEL_PATH,
+        "tracker": TRACKER_CONFIG,
+        "conf": TRACK_CONF,
+        "iou": TRACK_IOU,
+        "accuracy_limit": accuracy_limit,
+        "backend": config["backend"],
+        "int8": config["int8"],
+        "tracker_profile": config["tracker_profile"],
+    }
+
+# Mô hình YOLO được load khi vận hành lần đầu trong worker camera, không load khi import module
+model = None
+
+def load_model(camera_id, video_path, backend="torch", int8=False):
+    """Load model suy luận cho camera: INT8 hiệu chuẩn bằng video của camera nếu int8, ngược lại theo backend."""
+    if int8:
+        return get_int8_model(MODEL_PATH, camera_id, video_path)
+    return get_model(MODEL_PATH, backend)
+
+# Hàng đợi ticket mẫu (0 được đỗ mọi slot, 1 không được đỗ slot nào), dùng khi không có ticket_dispenser
 tickets = deque()
 
 def add_ticket(number):
     """Thêm ticket vào hàng đợi."""
     tickets.append(number)
 
+# TicketDispenser cấp ticket từ bảng Ticket cho camera đang xử lý (None thì dùng hàng đợi ticket mẫu)
+ticket_dispenser = None
+# Luồng nền đang khởi động TicketDispenser (None nếu không chờ kết nối database)
+ticket_dispenser_starter = None
+_ticket_dispenser_lock = threading.Lock()
+# Slot được phép của các ticket (TicketAllowSlot) theo thứ tự slot_ids của camera đang xử lý
+ticket_slots = AllowedSlotMatrix([])
+
+def issue_ticket(obj_id):
+    """Cấp ticket cho xe obj_id; None nếu hết ticket hoặc TicketDispenser đang khởi động."""
+    # Đọc luồng khởi động trước: luồng này gán ticket_dispenser trước khi tự xóa khỏi ticket_dispenser_starter
+    starting = ticket_dispenser_starter is not None
+    dispenser = ticket_dispenser
+    if dispenser is not None:
+        return dispenser.issue(obj_id)
+    if starting:
+        return None
+    return tickets.popleft() if tickets else None
+
+def release_ticket(obj_id, ticket):
+    """Trả lại ticket của xe obj_id khi track bị loại bỏ khỏi tracked_ids (xe đã rời khỏi camera)."""
+    dispenser = ticket_dispenser
+    if dispenser is not None:
+        dispenser.release(ticket)
+
 # Biến toàn cục
 main_map_img = None
 homography_matrix = None
+projector = None  # HomographyProjector của camera đang xử lý
 slot_quads_mainmap = {}  # Lưu tọa độ slot từ MainMap
 checkin_quads_mainmap = {}  # Lưu tọa độ check-in từ MainMap
 val_link_shape = (384, 640)  # Kích thước khung hình ValLink
@@ -60,28 +126,89 @@ def is_in_quadrilateral(box, quad_points):
 
 # Hàm ánh xạ tọa độ từ MainMap sang ValLink
 def map_to_val_link(points, homography_matrix):
-    """Ánh xạ tọa độ từ MainMap sang ValLink."""
+    """Ánh xạ tọa độ từ MainMap sang ValLink (tất cả điểm trong một lần biến đổi)."""
     if homography_matrix is None or not points:
         print("Cannot map to ValLink: Homography matrix or points missing")
         return []
 
-    transformed_points = []
-    for point in points:
-        src_point = np.array([[point[0], point[1]]], dtype=np.float32).reshape(-1, 1, 2)
-        try:
-            dst_point = cv2.perspectiveTransform(src_point, homography_matrix)
-            x, y = int(dst_point[0][0][0]), int(dst_point[0][0][1])
-            transformed_points.append((x, y))
-            print(f"Transformed point {point} to ({x}, {y})")
-        except Exception as e:
-            print(f"Error transforming point {point}: {str(e)}")
-            return []
-    return transformed_points
+    try:
+        transformed = HomographyProjector(homography_matrix).to_val_link(points)
+    except Exception as e:
+        print(f"Error transforming points {points}: {str(e)}")
+        return []
+    return [(int(x), int(y)) for x, y in transformed]
+
+def load_main_map(main_map_path):
+    """Đọc ảnh MainMap, trả về None nếu không có hoặc đọc thất bại."""
+    if not main_map_path:
+        print("No valid MainMap found for manager.")
+        return None
+    image = cv2.imread(main_map_path, -1)
+    if image is None:
+        print(f"Failed to load MainMap from {main_map_path}")
+    else:
+        print(f"Loaded MainMap from {main_map_path}")
+    return image
+
+# Load dữ liệu từ camera bundle
+def load_camera_bundle_data(camera_id, manager_username, on_stale=None):
+    """Khởi động từ camera bundle đã biên dịch, không cần database.
+
+    Bundle được dùng ngay; luồng nền (check_camera_bundle) so fingerprint của bundle với dữ liệu hiện tại
+    trong database để phát hiện thay đổi ngoài giao diện, nên SQL Server chậm hoặc không truy cập được
+    không làm chậm việc khởi động.
+
+    Returns:
+        tuple: (video_path, destination_zones, checkin_zones, slot_ids) hoặc None nếu không có bundle hợp lệ.
+    """
+    global main_map_img, homography_matrix, projector, slot_quads_mainmap, checkin_quads_mainmap
+    bundle = load_camera_bundle(camera_id, manager_username, get_model_settings(camera_id))
+    if bundle is None or not bundle["val_link"]:
+        return None
+    threading.Thread(target=check_camera_bundle, args=(camera_id, manager_username, bundle["fingerprint"], on_stale),
+                     name=f"bundle-check-{camera_id}", daemon=True).start()
+    main_map_img = load_main_map(bundle["main_map"])
+    homography_matrix = bundle["homography"]
+    projector = get_projector(camera_id, homography_matrix)
+    slot_quads_mainmap = bundle["slot_quads_mainmap"]
+    checkin_quads_mainmap = bundle["checkin_quads_mainmap"]
+    print(f"Loaded camera bundle for camera {camera_id}: {len(bundle['slot_ids'])} slots, "
+          f"{len(bundle['checkin_zones'])} check-ins")
+    return bundle["val_link"], bundle["destination_zones"], bundle["checkin_zones"], bundle["slot_ids"]
+
+def check_camera_bundle(camera_id, manager_username, fingerprint, on_stale=None):
+    """So fingerprint của bundle với dữ liệu hiện tại trong database; nếu khác (hoặc camera đã bị xóa) thì
+    xóa bundle và gọi on_stale() để phiên đang chạy tải lại dữ liệu. Không truy vấn được database thì
+    giữ bundle."""
+    try:
+        current = CameraRepository(DBContext()).get_layout_fingerprint(camera_id, manager_username)
+    except Exception as e:
+        print(f"Cannot check camera bundle for camera {camera_id} against database: {str(e)}")
+        return
+    if current == fingerprint:
+        return
+    print(f"Camera bundle for camera {camera_id} is stale, rebuilding")
+    invalidate_camera_bundles(camera_id=camera_id)
+    if on_stale is not None:
+        on_stale()
 
 # Load dữ liệu từ database
-def load_camera_data(camera_id, manager_username):
-    """Load thông tin camera, slot, check-in từ MainMap, và PTS từ database."""
-    global main_map_img, homography_matrix, slot_quads_mainmap, checkin_quads_mainmap
+def load_camera_data(camera_id, manager_username, use_bundle=True, on_stale=None, raise_errors=False):
+    """Load thông tin camera, slot, check-in từ MainMap, và PTS từ database.
+
+    Nếu use_bundle và camera đã có bundle hợp lệ thì khởi động từ bundle mà không truy vấn database;
+    ngược lại đọc từ database rồi ghi lại bundle cho lần sau. on_stale() được gọi (từ luồng nền) nếu
+    bundle vừa dùng hóa ra đã cũ so với database.
+
+    Lỗi database trả về (None, [], [], []) như camera không có ValLink, trừ khi raise_errors thì lỗi được
+    ném ra để phân biệt với camera không có video.
+    """
+    global main_map_img, homography_matrix, projector, slot_quads_mainmap, checkin_quads_mainmap
+    if use_bundle:
+        bundle_data = load_camera_bundle_data(camera_id, manager_username, on_stale)
+        if bundle_data is not None:
+            return bundle_data
+
     destination_zones = []
     checkin_zones = []
     slot_ids = []
@@ -101,15 +228,8 @@ def load_camera_data(camera_id, manager_username):
 
         # Load MainMap
         manager = manager_repo.get_manager_by_username(manager_username)
-        if not manager or not manager.MainMap:
-            print("No valid MainMap found for manager.")
-            main_map_img = None
-        else:
-            main_map_img = cv2.imread(manager.MainMap, -1)
-            if main_map_img is None:
-                print(f"Failed to load MainMap from {manager.MainMap}")
-            else:
-                print(f"Loaded MainMap from {manager.MainMap}")
+        main_map_path = manager.MainMap if manager else None
+        main_map_img = load_main_map(main_map_path)
 
         # Load slot data từ MainMap cho manager
         slots = slot_repo.get_slots_by_manager(manager_username)
@@ -123,7 +243,6 @@ def load_camera_data(camera_id, manager_username):
                     (slot.d3x, slot.d3y),
                     (slot.d4x, slot.d4y)
                 ]
-                print(f"Loaded slot {slot.ID} from MainMap: {slot_quads_mainmap[slot.ID]}")
             else:
                 print(f"Slot {slot.ID} missing coordinates, skipping.")
         slot_ids = list(slot_quads_mainmap.keys())
@@ -141,60 +260,70 @@ def load_camera_data(camera_id, manager_username):
                     (checkin.d3x, checkin.d3y),
                     (checkin.d4x, checkin.d4y)
                 ]
-                print(f"Loaded check-in {checkin.ID} from MainMap: {checkin_quads_mainmap[checkin.ID]}")
             else:
                 print(f"Check-in {checkin.ID} missing coordinates, skipping.")
         print(f"Total check-ins loaded into checkin_quads_mainmap: {len(checkin_quads_mainmap)}")
 
-        # Load PTS points and compute homography (MainMap to ValLink)
+        # Load PTS points and homography (MainMap to ValLink), chỉ tính lại khi điểm PTS thay đổi
         pts_records = pts_repo.get_pts_by_camera_id(camera_id)
-        src_points = []
-        dst_points = []
-        for pts in pts_records:
-            if all(attr is not None for attr in [pts.srcX, pts.srcY, pts.dstX, pts.dstY]):
-                src_points.append([float(pts.dstX), float(pts.dstY)])
-                dst_points.append([float(pts.srcX), float(pts.srcY)])
-        print(f"Loaded {len(src_points)} PTS points for camera {camera_id}")
-        print("MainMap points (src):", src_points)
-        print("ValLink points (dst):", dst_points)
-
-        if len(src_points) < 4 or len(dst_points) < 4:
-            print("Warning: At least 4 point pairs are required for homography. Mapping disabled.")
-            homography_matrix = None
-        elif len(src_points) != len(dst_points):
-            print(f"Error: Mismatched point counts (src: {len(src_points)}, dst: {len(dst_points)})")
+        print(f"Loaded {len(pts_records)} PTS points for camera {camera_id}")
+        try:
+            homography_matrix = get_camera_homography(camera_id, pts_records)
+            if homography_matrix is None:
+                print("Warning: Homography unavailable. Mapping disabled.")
+            else:
+                print("Homography matrix (MainMap to ValLink):")
+                print(homography_matrix)
+        except Exception as e:
+            print(f"Error computing homography: {str(e)}")
             homography_matrix = None
+
+        # Ánh xạ tất cả slot và check-in từ MainMap sang ValLink, mỗi loại trong một lần biến đổi
+        projector = get_projector(camera_id, homography_matrix)
+        destination_zones = []
+        checkin_zones = []
+        if projector is None:
+            print("Cannot map zones to ValLink: Homography matrix missing")
+            slot_ids = []
         else:
             try:
-                src_pts = np.array(src_points, dtype=np.float32).reshape(-1, 1, 2)
-                dst_pts = np.array(dst_points, dtype=np.float32).reshape(-1, 1, 2)
-                homography_matrix, _ = cv2.findHomography(src_pts, dst_pts, cv2.RANSAC, 5.0)
-                if homography_matrix is None:
-                    print("Error: Homography calculation failed")
-                else:
-                    print("Homography matrix (MainMap to ValLink) computed successfully:")
-                    print(homography_matrix)
+                slot_zone_array = projector.quads_to_val_link(list(slot_quads_mainmap.values()))
+                checkin_zone_array = projector.quads_to_val_link(list(checkin_quads_mainmap.values()))
+                destination_zones = [[(int(x), int(y)) for x, y in quad] for quad in slot_zone_array]
+                checkin_zones = [[(int(x), int(y)) for x, y in quad] for quad in checkin_zone_array]
             except Exception as e:
-                print(f"Error computing homography: {str(e)}")
-                homography_matrix = None
-
-        # Ánh xạ slot và check-in từ MainMap sang ValLink
-        destination_zones = [map_to_val_link(quad, homography_matrix) for quad in slot_quads_mainmap.values()]
-        checkin_zones = [map_to_val_link(quad, homography_matrix) for quad in checkin_quads_mainmap.values()]
-        destination_zones = [zone for zone in destination_zones if zone]
-        checkin_zones = [zone for zone in checkin_zones if zone]
+                print(f"Error mapping zones to ValLink: {str(e)}")
+                slot_ids = []
         print(f"Final destination_zones for ValLink: {destination_zones}")
         print(f"Final checkin_zones for ValLink: {checkin_zones}")
 
+        if camera.ValLink:
+            try:
+                save_camera_bundle(camera_id, manager_username, camera.ValLink, main_map_path, homography_matrix,
+                                   slot_quads_mainmap, checkin_quads_mainmap, destination_zones, checkin_zones,
+                                   slot_ids, get_model_settings(camera_id),
+                                   camera_repo.get_layout_fingerprint(camera_id, manager_username))
+            except Exception as e:
+                print(f"Error saving camera bundle for camera {camera_id}: {str(e)}")
+
         return camera.ValLink, destination_zones, checkin_zones, slot_ids
 
     except Exception as e:
         print(f"Error loading camera data: {str(e)}")
+        if raise_errors:
+            raise
         return None, [], [], []
 
 # Vẽ vùng đích và check-in từ destination_zones với màu sắc trên ValLink
-def draw_destination_zones(frame, detected_boxes, slot_ids, destination_zones, checkin_zones):
-    """Vẽ các vùng đích (slot) và check-in trên ValLink với màu xanh nếu trống, đỏ nếu có xe."""
+def draw_destination_zones(frame, snapshot, slot_ids, destination_zones, checkin_zones, overlay=None):
+    """Vẽ các vùng đích (slot) và check-in trên ValLink với màu xanh nếu trống, đỏ nếu có xe.
+
+    Trạng thái slot được đọc từ OccupancySnapshot của khung hình. Nếu có overlay (ZoneOverlay dựng
+    sẵn cho ValLink), viền và nhãn được chép từ lớp phủ thay vì vẽ lại.
+    """
+    if overlay is not None:
+        overlay.draw(frame, snapshot)
+        return
     if not destination_zones or len(destination_zones) != len(slot_ids):
         print("No or mismatched destination zones to draw on ValLink")
         print(f"Destination zones: {destination_zones}")
@@ -207,8 +336,7 @@ def draw_destination_zones(frame, detected_boxes, slot_ids, destination_zones, c
         if len(points) < 3:
             print(f"Invalid quad for slot {slot_ids[idx]} on ValLink: {points}, skipping")
             continue
-        has_vehicle = any(is_in_quadrilateral(box, points) for box, _ in detected_boxes)
-        color = (0, 255, 0) if not has_vehicle else (0, 0, 255)
+        color = (0, 255, 0) if not snapshot.is_occupied(slot_ids[idx]) else (0, 0, 255)
         for i in range(len(points)):
             cv2.line(frame, points[i], points[(i + 1) % len(points)], color, 2)
         avg_x = sum(p[0] for p in points) // len(points)
@@ -222,7 +350,6 @@ def draw_destination_zones(frame, detected_boxes, slot_ids, destination_zones, c
         if len(points) < 3:
             print(f"Invalid quad for check-in on ValLink: {points}, skipping")
             continue
-        has_vehicle = any(is_in_quadrilateral(box, points) for box, _ in detected_boxes)
         color = (0, 255, 255)  # Yellow for check-in zones
         for i in range(len(points)):
             cv2.line(frame, points[i], points[(i + 1) % len(points)], color, 2)
@@ -232,17 +359,22 @@ def draw_destination_zones(frame, detected_boxes, slot_ids, destination_zones, c
                     cv2.FONT_HERSHEY_SIMPLEX, 0.5, color, 2)
 
 # Vẽ chấm đỏ tại trung tâm box và tứ giác slot/check-in trên MainMap với màu tương tự ValLink
-def draw_mapped_boxes(main_map, detected_boxes, tracked_ids):
-    """Vẽ tứ giác slot và check-in, chấm đỏ tại trung tâm của các bounding box đã ánh xạ lên MainMap."""
-    if main_map is None or homography_matrix is None:
+def draw_mapped_boxes(main_map, boxes, snapshot, renderer=None):
+    """Vẽ tứ giác slot và check-in, chấm đỏ tại trung tâm của các bounding box đã ánh xạ lên MainMap.
+
+    boxes là mảng (N, 4) theo thứ tự snapshot.vehicle_ids. Màu slot lấy từ OccupancySnapshot để khớp
+    với ValLink và bộ đếm slot trống. Nếu có renderer (MainMapRenderer của MainMap), chỉ các vùng thay
+    đổi được vẽ lại trên canvas của renderer thay vì sao chép và vẽ lại toàn bộ MainMap.
+    """
+    if main_map is None or projector is None or projector.inverse is None:
         print("Cannot draw mapped boxes: MainMap or homography matrix is not available")
         return main_map
 
-    try:
-        inv_homography = np.linalg.inv(homography_matrix)
-    except np.linalg.LinAlgError:
-        print("Cannot invert homography matrix for drawing on MainMap")
-        return main_map
+    if renderer is not None:
+        mapped_centers = map_box_centers(boxes)
+        if mapped_centers is None:
+            mapped_centers = np.empty((0, 2), dtype=np.int64)
+        return renderer.render(snapshot, mapped_centers, mapped_labels(snapshot))
 
     main_map_copy = main_map.copy()
 
@@ -254,22 +386,8 @@ def draw_mapped_boxes(main_map, detected_boxes, tracked_ids):
             print(f"Invalid quad for slot {slot_id} on MainMap: {points}, skipping")
             continue
 
-        # Kiểm tra occupancy bằng cách ánh xạ box từ ValLink về MainMap
-        has_vehicle = False
-        for box, _ in detected_boxes:
-            x1, y1, x2, y2 = map(int, box)
-            center = np.array([[(x1 + x2) / 2, (y1 + y2) / 2]], dtype=np.float32).reshape(-1, 1, 2)
-            try:
-                transformed_center = cv2.perspectiveTransform(center, inv_homography)
-                center_x, center_y = int(transformed_center[0][0][0]), int(transformed_center[0][0][1])
-                if is_in_quadrilateral((center_x, center_y, center_x, center_y), points):  # Use point check
-                    has_vehicle = True
-                    break
-            except Exception as e:
-                print(f"Error transforming center for occupancy check of slot {slot_id}: {str(e)}")
-
         # Chọn màu: xanh lá nếu trống, đỏ nếu có xe
-        color = (0, 255, 0) if not has_vehicle else (0, 0, 255)
+        color = (0, 255, 0) if not snapshot.is_occupied(slot_id) else (0, 0, 255)
         for i in range(len(points)):
             cv2.line(main_map_copy, points[i], points[(i + 1) % len(points)], color, 2)
         avg_x = sum(p[0] for p in points) // len(points)
@@ -293,46 +411,198 @@ def draw_mapped_boxes(main_map, detected_boxes, tracked_ids):
                     cv2.FONT_HERSHEY_SIMPLEX, 0.5, (255, 255, 255), 2)
 
     # Vẽ chấm đỏ tại tâm của các bounding box đã ánh xạ
-    for box, obj_id in detected_boxes:
-        x1, y1, x2, y2 = map(int, box)
-        center = np.array([[(x1 + x2) / 2, (y1 + y2) / 2]], dtype=np.float32).reshape(-1, 1, 2)
-        try:
-            transformed_center = cv2.perspectiveTransform(center, inv_homography)
-            center_x, center_y = int(transformed_center[0][0][0]), int(transformed_center[0][0][1])
-            cv2.circle(main_map_copy, (center_x, center_y), radius=5, color=(0, 0, 255), thickness=-1)
-            if obj_id in tracked_ids:
-                label_text = f"ID: {obj_id}, Ticket: {tracked_ids[obj_id]}"
-                cv2.putText(main_map_copy, label_text, (center_x - 30, center_y - 10),
-                            cv2.FONT_HERSHEY_SIMPLEX, 0.5, (255, 255, 255), 2)
-        except Exception as e:
-            print(f"Error transforming center of box {box}: {str(e)}")
-
+    mapped_centers = map_box_centers(boxes)
+    if mapped_centers is not None:
+        for (center_x, center_y), label in zip(mapped_centers, mapped_labels(snapshot)):
+            draw_vehicle_marker(main_map_copy, (int(center_x), int(center_y)), label)
     return main_map_copy
 
-# Dictionary lưu trữ các object đã theo dõi
-tracked_ids = {}
-
-def process_video(video_path, camera_id, manager_username, destination_zones, checkin_zones, slot_ids):
-    """Xử lý video với YOLO tracking và ánh xạ lên MainMap."""
-    global model, main_map_img, homography_matrix
-    torch.cuda.empty_cache()
-
-    # Kiểm tra video trước khi mở
-    cap = cv2.VideoCapture(video_path)
-    if not cap.isOpened():
-        print(f"Error opening video file: {video_path}")
-        return False
-
-    # Đọc khung hình đầu tiên để kiểm tra kích thước
-    ret, first_frame = cap.read()
-    if not ret or first_frame is None:
-        print(f"Error reading first frame from video: {video_path}")
-        cap.release()
-        return False
-    print(f"Video resolution for Camera ID {camera_id}: {first_frame.shape}")
-    cap.set(cv2.CAP_PROP_POS_FRAMES, 0)
-
-    # Đặt lại trạng thái theo dõi của YOLO
+def map_box_centers(boxes):
+    """Ánh xạ tâm của các bounding box (N, 4) lên MainMap trong một lần; None nếu lỗi."""
+    boxes = np.asarray(boxes, dtype=np.float64).reshape(-1, 4)
+    centers = (boxes[:, :2] + boxes[:, 2:]) / 2
+    try:
+        return projector.to_main_map(centers).astype(np.int64)
+    except Exception as e:
+        print(f"Error transforming box centers to MainMap: {str(e)}")
+        return None
+
+def mapped_labels(snapshot):
+    """Nhãn ticket của từng xe theo thứ tự snapshot.vehicle_ids (None nếu xe chưa có ticket)."""
+    return [f"ID: {obj_id}, Ticket: {snapshot.tickets[obj_id]}" if obj_id in snapshot.tickets else None
+            for obj_id in snapshot.vehicle_ids]
+
+def build_overlays(frame_shape, slot_ids, destination_zones, checkin_zones):
+    """Dựng lớp phủ vùng một lần cho ValLink (kích thước khung hình) và bộ vẽ MainMap của camera hiện tại.
+
+    Returns:
+        tuple: (ZoneOverlay của ValLink, MainMapRenderer hoặc None nếu không có MainMap).
+    """
+    val_link_overlay = None
+    if destination_zones and len(destination_zones) == len(slot_ids):
+        val_link_overlay = ZoneOverlay(frame_shape, slot_ids, destination_zones, checkin_zones)
+    main_map_renderer = None
+    if main_map_img is not None:
+        main_map_renderer = MainMapRenderer(
+            main_map_img, list(slot_quads_mainmap.keys()), list(slot_quads_mainmap.values()),
+            list(checkin_quads_mainmap.values()),
+            [f"CheckIn {checkin_id}" for checkin_id in checkin_quads_mainmap],
+        )
+    return val_link_overlay, main_map_renderer
+
+# Ticket đã cấp theo track ID; track bị tracker xóa (quá track_buffer) được loại bỏ (xem FrameTracker) và
+# ticket của nó được trả lại
+tracked_ids = TrackStateStore(on_evict=release_ticket)
+
+def track_frame(frame_index, frame, slot_ids, slot_zone_array, checkin_zone_array,
+                slot_mask=None, checkin_mask=None, roi=None, tracker_config=TRACKER_CONFIG):
+    """Stage suy luận: chạy YOLO tracking trên một khung hình, cấp và kiểm tra ticket.
+
+    slot_zone_array và checkin_zone_array là các vùng đã biên dịch bằng compile_zones; slot_mask và
+    checkin_mask (ZoneLabelMask) nếu có sẽ được dùng để tra cứu tâm box -> vùng trong O(1).
+    Nếu có roi (ZoneROI), YOLO chỉ chạy trên vùng cắt chứa các vùng và box được chuyển về tọa độ
+    toàn khung hình.
+
+    Kết quả có thêm "timings" (ms): preprocess, inference, postprocess theo ultralytics, tracker (phần
+    còn lại của model.track) và zones (kiểm tra vùng và ticket).
+    """
+    start = time.perf_counter()
+    try:
+        if roi is None:
+            results = model.track(frame, tracker=tracker_config, persist=True, conf=TRACK_CONF, iou=TRACK_IOU,
+                                  imgsz=TRACK_IMGSZ)
+        else:
+            results = model.track(roi.crop(frame), tracker=tracker_config, persist=True, conf=TRACK_CONF,
+                                  iou=TRACK_IOU, imgsz=roi.imgsz)
+    except Exception as e:
+        print(f"Error during tracking (frame {frame_index}): {e}")
+        return None
+    tracked = time.perf_counter()
+
+    detections = extract_detections(results[0], accuracy_limit)
+    if roi is not None:
+        detections = roi.to_frame(detections)
+    result = process_detections(frame_index, frame, detections, slot_ids, slot_zone_array, checkin_zone_array,
+                                slot_mask, checkin_mask)
+
+    speed = getattr(results[0], "speed", None) or {}
+    timings = {stage: speed.get(stage) or 0.0 for stage in ("preprocess", "inference", "postprocess")}
+    timings["tracker"] = max(0.0, (tracked - start) * 1000 - sum(timings.values()))
+    timings["zones"] = (time.perf_counter() - tracked) * 1000
+    result["timings"] = timings
+    return result
+
+def process_detections(frame_index, frame, detections, slot_ids, slot_zone_array, checkin_zone_array,
+                       slot_mask=None, checkin_mask=None):
+    """Kiểm tra vùng, cấp ticket và tạo OccupancySnapshot từ các phát hiện (Detections) của một khung hình."""
+    # Kiểm tra tất cả box với tất cả vùng check-in và slot trong một lần tính vector hóa
+    checkin_membership, _ = compute_occupancy(detections.boxes, checkin_zone_array, checkin_mask)
+    slot_membership, _ = compute_occupancy(detections.boxes, slot_zone_array, slot_mask)
+    vehicle_ids = detections.ids.tolist()
+
+    # Cấp ticket cho xe đi qua check-in zone
+    for idx in np.flatnonzero(checkin_membership.any(axis=1)):
+        obj_id = vehicle_ids[idx]
+        if obj_id not in tracked_ids:
+            ticket = issue_ticket(obj_id)
+            if ticket is not None:
+                tracked_ids[obj_id] = ticket
+                print(f"Vehicle ID {obj_id} passed check-in, assigned ticket: {ticket}")
+
+    # Chụp lại ticket của các xe trong khung hình để stage vẽ không đọc tracked_ids đang thay đổi
+    frame_tickets = {obj_id: tracked_ids[obj_id] for obj_id in vehicle_ids if obj_id in tracked_ids}
+    allowed_slots = ticket_slots.allowed([frame_tickets.get(obj_id) for obj_id in vehicle_ids])
+    snapshot = OccupancySnapshot(frame_index, slot_ids, vehicle_ids, slot_membership, checkin_membership,
+                                 frame_tickets, allowed_slots)
+    return {
+        "index": frame_index,
+        "frame": frame,
+        "detections": detections,
+        "snapshot": snapshot,
+    }
+
+def carry_forward(frame_index, frame, previous):
+    """Kết quả cho khung hình bỏ qua suy luận: giữ nguyên detections và snapshot của lần suy luận trước."""
+    return {
+        "index": frame_index,
+        "frame": frame,
+        "detections": previous["detections"],
+        "snapshot": previous["snapshot"],
+        "skipped": True,
+    }
+
+class FrameTracker:
+    """Trạng thái tracking của một phiên xử lý video: vùng đã biên dịch, ROI, motion gate và dự đoán.
+
+    process() quyết định cho mỗi khung hình: chạy YOLO, dự đoán vị trí bằng KalmanBoxPredictor (giữa
+    các lần detector chạy theo detect_every), hoặc dùng lại kết quả trước khi MotionGate không thấy
+    thay đổi. Trong mọi trường hợp kiểm tra check-in/ticket và trạng thái slot vẫn được cập nhật.
+
+    Đồng hồ của tracked_ids là số lần YOLO tracking chạy (inferred): track không xuất hiện quá track_buffer
+    lần cập nhật của tracker bị loại bỏ; max_tracks (nếu có) giới hạn số track được giữ.
+    """
+
+    def __init__(self, slot_ids, destination_zones, checkin_zones, frame_shape, motion_gate=True,
+                 roi_mode=True, detect_every=1, adaptive_detect=True, tracker_config=TRACKER_CONFIG,
+                 max_tracks=None):
+        self.slot_ids = slot_ids
+        self.tracker_config = tracker_config
+        tracked_ids.ttl = tracker_buffer(tracker_config)
+        tracked_ids.max_tracks = max_tracks
+        # Biên dịch các vùng và ảnh nhãn kích thước khung hình một lần cho cả phiên xử lý
+        self.slot_zone_array = compile_zones(destination_zones)
+        self.checkin_zone_array = compile_zones(checkin_zones)
+        self.slot_mask = ZoneLabelMask(self.slot_zone_array, frame_shape[:2])
+        self.checkin_mask = ZoneLabelMask(self.checkin_zone_array, frame_shape[:2])
+        zone_arrays = (self.slot_zone_array, self.checkin_zone_array)
+        self.roi = ZoneROI.from_zones(zone_arrays, frame_shape[:2], TRACK_IMGSZ) if roi_mode else None
+        self.gate = MotionGate(zone_arrays, frame_shape[:2]) if motion_gate else None
+        self.predictor = KalmanBoxPredictor()
+        self.schedule = DetectionSchedule(detect_every, adaptive_detect)
+        self.last_result = None
+        self.inferred = 0
+        self.predicted = 0
+
+    @property
+    def skipped(self):
+        return self.gate.skipped if self.gate is not None else 0
+
+    def _detections_result(self, frame_index, frame, detections):
+        return process_detections(frame_index, frame, detections, self.slot_ids, self.slot_zone_array,
+                                  self.checkin_zone_array, self.slot_mask, self.checkin_mask)
+
+    def process(self, frame_index, frame):
+        if self.last_result is not None and not self.schedule.due():
+            self.predictor.step()
+            result = self._detections_result(frame_index, frame, self.predictor.detections())
+            result["predicted"] = True
+            self.schedule.predicted()
+            self.predicted += 1
+            self.last_result = result
+            return result
+        if self.gate is not None and self.last_result is not None and not self.gate.should_infer(frame):
+            self.predictor.hold()
+            return carry_forward(frame_index, frame, self.last_result)
+
+        result = track_frame(frame_index, frame, self.slot_ids, self.slot_zone_array, self.checkin_zone_array,
+                             self.slot_mask, self.checkin_mask, self.roi, self.tracker_config)
+        if result is None:
+            if self.gate is not None:
+                # Suy luận lỗi: lần sau so với tham chiếu mới để không bỏ qua dựa trên khung hình lỗi
+                self.gate.reset()
+            return None
+        self.predictor.step()
+        new_tracks = self.predictor.update(result["detections"])
+        self.schedule.detected(result["snapshot"], new_tracks)
+        self.inferred += 1
+        tracked_ids.seen(result["snapshot"].vehicle_ids, self.inferred)
+        self.last_result = result
+        return result
+
+def reset_tracking_state(camera_id, slot_ids):
+    """Đặt lại tracker của YOLO, hàng đợi ticket, slot được phép của ticket và các ID đã cấp ticket trước
+    một phiên xử lý (slot_ids là thứ tự slot trong mảng vùng của camera)."""
+    global ticket_slots
     try:
         model.predictor.trackers[0].reset()
         model.reset()
@@ -352,86 +622,295 @@ def process_video(video_path, camera_id, manager_username, destination_zones, ch
     add_ticket(0)
     add_ticket(1)
     add_ticket(0)
+    ticket_slots = AllowedSlotMatrix(slot_ids)
+    ticket_slots.add({0: slot_ids, 1: []})
     tracked_ids.clear()
 
-    # Thiết lập cửa sổ OpenCV
-    cv2.namedWindow(f"YOLO Tracking - Camera ID {camera_id}")
-    cv2.moveWindow(f"YOLO Tracking - Camera ID {camera_id}", 80, 80)
-    if main_map_img is not None:
-        cv2.namedWindow("MainMap")
-        cv2.moveWindow("MainMap", 780, 80)
+def start_ticket_dispenser(camera_id, manager_username, ticket_source="database"):
+    """Cấp ticket từ bảng Ticket (TicketDispenser) nếu ticket_source là "database" và còn ticket trống;
+    ngược lại dùng hàng đợi ticket mẫu.
 
-    frame_count = 0
-    while cap.isOpened():
-        success, frame = cap.read()
-        if not success or frame is None:
-            print(f"End of video reached or invalid frame at frame {frame_count}.")
-            break
-
-        frame_count += 1
-        if frame.shape[0] <= 0 or frame.shape[1] <= 0:
-            print(f"Invalid frame size at frame {frame_count}: {frame.shape}")
-            continue
+    Kết nối database và giữ chỗ khối ticket đầu tiên chạy trong luồng nền để SQL Server chậm hoặc không truy
+    cập được không chặn việc xử lý video; trong lúc đó xe qua check-in chưa được cấp ticket (được cấp ở khung
+    hình sau nếu còn trong check-in zone). Nếu lỗi database, dùng hàng đợi ticket mẫu.
 
-        try:
-            results = model.track(frame, tracker="botsort.yaml", persist=True, conf=0.75, iou=0.45)
-        except Exception as e:
-            print(f"Error during tracking (frame {frame_count}): {e}")
-            continue
+    Slot được phép của mỗi khối ticket giữ chỗ được nạp vào ticket_slots trong một truy vấn, trước khi
+    ticket của khối được cấp.
+    """
+    global ticket_dispenser_starter
+    stop_ticket_dispenser()
+    if ticket_source != "database":
+        return
+    cancelled = threading.Event()
+    starter = threading.Thread(target=_run_ticket_dispenser_starter, args=(camera_id, manager_username, cancelled),
+                               name=f"tickets-start-{camera_id}", daemon=True)
+    starter.cancelled = cancelled
+    ticket_dispenser_starter = starter
+    starter.start()
+
+def _run_ticket_dispenser_starter(camera_id, manager_username, cancelled):
+    global ticket_dispenser, ticket_slots, ticket_dispenser_starter
+    dispenser = None
+    try:
+        repository = TicketRepository(DBContext())
+        allowed = AllowedSlotMatrix(ticket_slots.slot_ids)
+        dispenser = TicketDispenser(repository, manager_username, camera_id,
+                                    on_reserved=lambda ticket_ids: allowed.load(repository, ticket_ids))
+        started = dispenser.start()
+    except Exception as e:
+        print(f"Error starting ticket dispenser for Camera ID {camera_id}: {str(e)}")
+        started = False
+    with _ticket_dispenser_lock:
+        active = not cancelled.is_set()
+        if started and active:
+            ticket_slots = allowed
+            ticket_dispenser = dispenser
+        if ticket_dispenser_starter is threading.current_thread():
+            ticket_dispenser_starter = None
+    if started and not active:
+        # Phiên xử lý đã kết thúc trong lúc kết nối: trả lại ticket vừa giữ chỗ
+        dispenser.close()
+    elif started:
+        print(f"Issuing tickets from the Ticket table for Camera ID {camera_id}")
+    elif active:
+        print(f"No ticket from the Ticket table for manager {manager_username}, "
+              f"using sample tickets for Camera ID {camera_id}")
+
+def stop_ticket_dispenser(timeout=2.0):
+    """Ghi các lần cấp ticket còn chờ và trả lại ticket chưa dùng.
+
+    Nếu TicketDispenser vẫn đang khởi động sau timeout giây, luồng khởi động tự trả lại ticket khi kết thúc.
+    """
+    global ticket_dispenser, ticket_dispenser_starter
+    starter = ticket_dispenser_starter
+    if starter is not None:
+        starter.cancelled.set()
+        starter.join(timeout=timeout)
+    with _ticket_dispenser_lock:
+        ticket_dispenser_starter = None
+        dispenser, ticket_dispenser = ticket_dispenser, None
+    if dispenser is not None:
+        dispenser.close()
+        print(f"  {dispenser}")
+
+def render_frame(result, slot_ids, destination_zones, checkin_zones, overlays=(None, None), draw_camera=True,
+                 draw_map=True):
+    """Stage vẽ: vẽ box, ticket, slot và check-in lên khung hình ValLink và MainMap.
+
+    overlays là (ZoneOverlay ValLink, MainMapRenderer) từ build_overlays; None thì vẽ lại toàn bộ vùng.
+    Khi có MainMapRenderer, mapped_frame là canvas của renderer, chỉ hợp lệ đến khung hình tiếp theo.
+    draw_camera/draw_map là False thì view tương ứng không được vẽ và trả về None.
+    """
+    detections = result["detections"]
+    snapshot = result["snapshot"]
+    mapped_frame = None
+    if draw_map and main_map_img is not None:
+        mapped_frame = draw_mapped_boxes(main_map_img, detections.boxes, snapshot, overlays[1])
+    if not draw_camera:
+        return None, mapped_frame
+
+    annotated_frame = result["frame"].copy()
+
+    for box, obj_id in detections:
+        x1, y1, x2, y2 = box.astype(int).tolist()
+        if obj_id in snapshot.invalid_vehicle_ids:
+            cv2.putText(annotated_frame, "Invalid Ticket", (x1, y1 - 30),
+                        cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0, 0, 255), 2)
+        cv2.rectangle(annotated_frame, (x1, y1), (x2, y2), (255, 255, 255), 2)
+        if obj_id in snapshot.tickets:
+            label_text = f"ID: {obj_id}, Ticket: {snapshot.tickets[obj_id]}"
+            cv2.putText(annotated_frame, label_text, (x1, y1 - 10),
+                        cv2.FONT_HERSHEY_SIMPLEX, 0.5, (255, 255, 255), 2)
+
+    # Vẽ các slot và check-in từ MainMap lên ValLink
+    draw_destination_zones(annotated_frame, snapshot, slot_ids, destination_zones, checkin_zones, overlays[0])
+
+    cv2.putText(annotated_frame, f"Available Slots: {snapshot.available_count}/{snapshot.total_slots}", (10, 30),
+                cv2.FONT_HERSHEY_SIMPLEX, 0.7, (255, 255, 255), 2)
+    return annotated_frame, mapped_frame
+
+def process_video(video_path, camera_id, manager_username, destination_zones, checkin_zones, slot_ids,
+                  queue_size=4, drop_policy=DROP_NONE, on_stats=None, stats_interval=1.0, motion_gate=None,
+                  roi_mode=None, detect_every=None,
+                  backend=None, int8=None, headless=False, sink=None, every_frame=False, stop_event=None,
+                  on_frame=None, display_fps=None, map_fps=None):
+    """Xử lý video với YOLO tracking và ánh xạ lên MainMap.
+
+    Giải mã, tracking và vẽ chạy song song theo pipeline: luồng giải mã -> luồng tracking -> luồng chính
+    (vẽ và hiển thị), nối với nhau bằng hàng đợi giới hạn queue_size. drop_policy quyết định cách xử lý
+    khi hàng đợi đầy: DROP_NONE (chờ, xử lý mọi khung hình), DROP_OLDEST hoặc DROP_NEWEST (bỏ khung hình,
+    phù hợp với camera trực tiếp).
+
+    Nếu motion_gate, YOLO chỉ chạy khi các vùng slot/check-in có thay đổi (MotionGate); các khung hình
+    tĩnh dùng lại detections và trạng thái chiếm chỗ của lần suy luận trước.
+
+    Nếu roi_mode, YOLO chỉ chạy trên hình chữ nhật bao các vùng (ZoneROI) khi hình chữ nhật này nhỏ
+    hơn đáng kể so với khung hình.
+
+    Nếu detect_every > 1, YOLO chỉ chạy mỗi detect_every khung hình (mọi khung hình khi có hoạt động ở
+    check-in nếu adaptive_detect); vị trí xe ở các khung hình còn lại được dự đoán bằng bộ lọc Kalman.
+
+    backend chọn runtime suy luận (torch, onnx, openvino); int8 dùng model INT8 hiệu chuẩn bằng chính
+    video này.
+
+    Nếu headless, không mở cửa sổ và không vẽ gì (chạy được trên máy không có màn hình); dừng khi hết
+    video hoặc khi stop_event được đặt. Nếu có sink (ví dụ Utils.sink.JsonlSink), các sự kiện occupancy,
+    check-in và ticket được ghi vào sink (trạng thái slot mọi khung hình nếu every_frame).
+
+    Nếu có on_frame, khung hình đã vẽ được chuyển cho on_frame(annotated_frame, mapped_frame, snapshot)
+    (ví dụ để hiển thị trong giao diện Qt) thay vì mở cửa sổ OpenCV.
+
+    Khung hình camera và MainMap được vẽ và hiển thị với tần số riêng display_fps và map_fps
+    (DisplayScheduler), không phải với mọi kết quả tracking; view không đến hạn được truyền cho on_frame
+    là None.
+
+    motion_gate, roi_mode, detect_every, backend, int8, display_fps và map_fps là None thì lấy từ thiết lập
+    của camera
+    (camera_config.json); profile tracker (tracker_profile) luôn lấy từ thiết lập của camera.
+
+    Nếu có on_stats, hàm này được gọi khoảng mỗi stats_interval giây với dict
+    {"camera_id", "frames", "fps", "skipped", "predicted", "tracks", "evicted"} (fps tính trên khoảng vừa
+    qua, skipped và predicted là tổng số khung hình bỏ qua suy luận do MotionGate và do dự đoán, tracks và
+    evicted là số track đang giữ ticket và số track đã bị loại bỏ) để báo cáo cho supervisor.
+    """
+    global model, main_map_img, homography_matrix
+    config = get_camera_config(camera_id)
+    model = load_model(camera_id, video_path, config["backend"] if backend is None else backend,
+                       config["int8"] if int8 is None else int8)
+    if model is None:
+        print(f"Cannot process video for Camera ID {camera_id}: model not available")
+        return False
+    empty_cuda_cache()
 
-        annotated_frame = frame.copy()
-        detected_boxes = []
-        if results[0].boxes is not None and results[0].boxes.id is not None:
-            for box, conf, obj_id in zip(results[0].boxes.xyxy, results[0].boxes.conf, results[0].boxes.id):
-                if conf <= accuracy_limit:
-                    continue
-                obj_id = int(obj_id)
-                detected_boxes.append((box, obj_id))
-                x1, y1, x2, y2 = map(int, box)
-
-                # Kiểm tra check-in zones để cấp ticket
-                for quad in checkin_zones:
-                    if is_in_quadrilateral(box, quad) and obj_id not in tracked_ids and tickets:
-                        tracked_ids[obj_id] = tickets.popleft()
-                        print(f"Vehicle ID {obj_id} passed check-in, assigned ticket: {tracked_ids[obj_id]}")
-
-                # Kiểm tra slot zones để xác nhận ticket
-                for quad in destination_zones:
-                    if is_in_quadrilateral(box, quad):
-                        if obj_id in tracked_ids and tracked_ids[obj_id] == 1:
-                            cv2.putText(annotated_frame, "Invalid Ticket", (x1, y1 - 30),
-                                        cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0, 0, 255), 2)
-
-                cv2.rectangle(annotated_frame, (x1, y1), (x2, y2), (255, 255, 255), 2)
-                if obj_id in tracked_ids:
-                    label_text = f"ID: {obj_id}, Ticket: {tracked_ids[obj_id]}"
-                    cv2.putText(annotated_frame, label_text, (x1, y1 - 10),
-                                cv2.FONT_HERSHEY_SIMPLEX, 0.5, (255, 255, 255), 2)
-
-        # Vẽ các slot và check-in từ MainMap lên ValLink
-        draw_destination_zones(annotated_frame, detected_boxes, slot_ids, destination_zones, checkin_zones)
-
-        total_slots = len(destination_zones)
-        occupied_slots = sum(1 for quad in destination_zones for box, _ in detected_boxes if is_in_quadrilateral(box, quad))
-        available_slots = total_slots - occupied_slots
-        cv2.putText(annotated_frame, f"Available Slots: {available_slots}/{total_slots}", (10, 30),
-                    cv2.FONT_HERSHEY_SIMPLEX, 0.7, (255, 255, 255), 2)
-
-        # Vẽ MainMap với các tứ giác slot và check-in, chấm đỏ đã ánh xạ
-        if main_map_img is not None:
-            mapped_frame = draw_mapped_boxes(main_map_img, detected_boxes, tracked_ids)
-            cv2.imshow("MainMap", mapped_frame)
-
-        cv2.imshow(f"YOLO Tracking - Camera ID {camera_id}", annotated_frame)
-        if cv2.waitKey(1) & 0xFF == ord("q"):
-            break
+    # Kiểm tra video trước khi mở
+    cap = cv2.VideoCapture(video_path)
+    if not cap.isOpened():
+        print(f"Error opening video file: {video_path}")
+        return False
+
+    # Đọc khung hình đầu tiên để kiểm tra kích thước
+    ret, first_frame = cap.read()
+    if not ret or first_frame is None:
+        print(f"Error reading first frame from video: {video_path}")
+        cap.release()
+        return False
+    print(f"Video resolution for Camera ID {camera_id}: {first_frame.shape}")
+    cap.set(cv2.CAP_PROP_POS_FRAMES, 0)
+
+    reset_tracking_state(camera_id, slot_ids)
+    start_ticket_dispenser(camera_id, manager_username, config["ticket_source"])
+
+    # Thiết lập cửa sổ OpenCV
+    use_windows = not headless and on_frame is None
+    show_main_map = use_windows and main_map_img is not None
+    if use_windows:
+        cv2.namedWindow(f"YOLO Tracking - Camera ID {camera_id}")
+        cv2.moveWindow(f"YOLO Tracking - Camera ID {camera_id}", 80, 80)
+    if show_main_map:
+        cv2.namedWindow(f"MainMap - Camera ID {camera_id}")
+        cv2.moveWindow(f"MainMap - Camera ID {camera_id}", 780, 80)
+
+    # Khởi tạo pipeline: giải mã -> tracking -> vẽ/hiển thị (hoặc chỉ ghi sự kiện nếu headless)
+    stop_event = stop_event or threading.Event()
+    event_writer = OccupancyEventWriter(sink, camera_id, every_frame) if sink is not None else None
+    frame_queue = FrameQueue(queue_size, drop_policy)
+    result_queue = FrameQueue(queue_size, drop_policy)
+    reader = FrameReader(cap, frame_queue, stop_event)
+    frame_tracker = FrameTracker(
+        slot_ids, destination_zones, checkin_zones, first_frame.shape,
+        motion_gate=config["motion_gate"] if motion_gate is None else motion_gate,
+        roi_mode=config["roi_mode"] if roi_mode is None else roi_mode,
+        detect_every=config["detect_every"] if detect_every is None else detect_every,
+        adaptive_detect=config["adaptive_detect"],
+        tracker_config=tracker_config_path(config["tracker_profile"]),
+        max_tracks=config["max_tracks"],
+    )
+    if frame_tracker.roi is not None:
+        print(f"Inference {frame_tracker.roi} for Camera ID {camera_id}")
+    tracker_stage = PipelineStage("track", lambda item: frame_tracker.process(*item), frame_queue, result_queue,
+                                  stop_event)
+    render_stats = StageStats("events" if headless else "render")
+    overlays = (None, None) if headless else build_overlays(first_frame.shape, slot_ids, destination_zones,
+                                                            checkin_zones)
+    display = DisplayScheduler(config["display_fps"] if display_fps is None else display_fps,
+                               config["map_fps"] if map_fps is None else map_fps)
+    reader.start()
+    tracker_stage.start()
+
+    start_time = time.perf_counter()
+    frame_count = 0
+    last_stats_time, last_stats_count = start_time, 0
+    try:
+        while True:
+            if stop_event.is_set():
+                break
+            result = result_queue.get(timeout=0.1)
+            if result is None:
+                # Giữ cửa sổ phản hồi trong lúc chờ kết quả
+                if use_windows and cv2.waitKey(1) & 0xFF == ord("q"):
+                    break
+                continue
+            if result is END_OF_STREAM:
+                break
+
+            render_start = time.perf_counter()
+            if event_writer is not None:
+                event_writer.add(result)
+            shown = False
+            if not headless:
+                draw_camera, draw_map = display.poll(render_start, backlog=result_queue.pending())
+                shown = draw_camera or draw_map
+            if shown:
+                annotated_frame, mapped_frame = render_frame(result, slot_ids, destination_zones, checkin_zones,
+                                                             overlays, draw_camera, draw_map)
+                if on_frame is not None:
+                    on_frame(annotated_frame, mapped_frame, result["snapshot"])
+                else:
+                    if mapped_frame is not None:
+                        cv2.imshow(f"MainMap - Camera ID {camera_id}", mapped_frame)
+                    if annotated_frame is not None:
+                        cv2.imshow(f"YOLO Tracking - Camera ID {camera_id}", annotated_frame)
+            render_stats.add(time.perf_counter() - render_start)
+            frame_count += 1
+
+            now = time.perf_counter()
+            if on_stats is not None and now - last_stats_time >= stats_interval:
+                on_stats({
+                    "camera_id": camera_id,
+                    "frames": frame_count,
+                    "fps": (frame_count - last_stats_count) / (now - last_stats_time),
+                    "skipped": frame_tracker.skipped,
+                    "predicted": frame_tracker.predicted,
+                    "tracks": len(tracked_ids),
+                    "evicted": tracked_ids.evicted,
+                })
+                last_stats_time, last_stats_count = now, frame_count
+            if shown and use_windows and cv2.waitKey(1) & 0xFF == ord("q"):
+                break
+    finally:
+        stop_event.set()
+        tracker_stage.join(timeout=5)
+        reader.join(timeout=5)
+        stop_ticket_dispenser()
+
+    elapsed = time.perf_counter() - start_time
+    print(f"Processed {frame_count} frames in {elapsed:.2f}s ({frame_count / elapsed if elapsed > 0 else 0:.1f} FPS)")
+    for stats in (reader.stats, tracker_stage.stats, render_stats):
+        print(f"  {stats}")
+    if not headless:
+        print(f"  {display}")
+    print(f"  Inference on {frame_tracker.inferred} frames, predicted {frame_tracker.predicted}, "
+          f"skipped by motion gate {frame_tracker.skipped}")
+    print(f"  {tracked_ids}")
+    if frame_queue.dropped or result_queue.dropped:
+        print(f"  Dropped frames: decode->track {frame_queue.dropped}, track->render {result_queue.dropped}")
 
     cap.release()
-    cv2.destroyWindow(f"YOLO Tracking - Camera ID {camera_id}")
-    if main_map_img is not None:
-        cv2.destroyWindow("MainMap")
-    if torch.cuda.is_available():
-        torch.cuda.empty_cache()
+    if use_windows:
+        cv2.destroyWindow(f"YOLO Tracking - Camera ID {camera_id}")
+    if show_main_map:
+        cv2.destroyWindow(f"MainMap - Camera ID {camera_id}")
+    empty_cuda_cache()
     print("Video processing completed.")
     return True
 
@@ -0,0 +1,315 @@
+"""Benchmark các chế độ tracking trên một video (mặc định cam1.mp4), không hiển thị cửa sổ.
+
+Ví dụ:
+    python -m Utils.benchmark detect-every --camera 1 --manager admin --every 1 2 3 5
+    python -m Utils.benchmark backends --camera 1 --manager admin --backends torch onnx openvino
+    python -m Utils.benchmark int8-check --camera 1 --manager admin --min-agreement 0.98
+    python -m Utils.benchmark trackers --camera 1 --manager admin --profiles botsort-reid botsort bytetrack
+
+Mỗi cấu hình được so với lần chạy đầu tiên (baseline): FPS của stage tracking, tỷ lệ trạng thái slot
+trùng khớp theo từng khung hình, số ticket được cấp cùng độ trễ (số khung hình) so với baseline, số lần
+đổi ID ước lượng và độ trễ trung bình của từng stage.
+Kết quả được in ra và ghi thêm vào logs/benchmark.jsonl.
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+import cv2
+import numpy as np
+
+from Utils.detector import BACKENDS
+from Utils.tracker_profiles import TRACKER_PROFILES, tracker_config_path
+
+STAGES = ("preprocess", "inference", "postprocess", "tracker", "zones")
+
+BENCHMARK_LOG = os.path.join("logs", "benchmark.jsonl")
+
+
+def iter_frames(video_path, max_frames=None):
+    cap = cv2.VideoCapture(video_path)
+    if not cap.isOpened():
+        raise RuntimeError(f"Error opening video file: {video_path}")
+    try:
+        index = 0
+        while max_frames is None or index < max_frames:
+            ret, frame = cap.read()
+            if not ret:
+                break
+            yield index, frame
+            index += 1
+    finally:
+        cap.release()
+
+
+def run_session(video_path, camera_id, slot_ids, destination_zones, checkin_zones, max_frames=None,
+                **tracker_options):
+    """Chạy FrameTracker trên toàn bộ video; chỉ thời gian xử lý tracking được tính, không tính giải mã.
+
+    Returns:
+        dict: seconds, frames, inferred, predicted, skipped, occupancy (mảng bool khung hình x slot),
+        ticket_events [(frame_index, ticket)] theo thứ tự cấp, tracks [(frame_index, ids, boxes)] của các
+        khung hình có suy luận và stage_ms (độ trễ trung bình từng stage).
+    """
+    from Utils import CameraTracking
+
+    CameraTracking.reset_tracking_state(camera_id, slot_ids)
+    frame_tracker = None
+    occupancy = []
+    ticket_events = []
+    tracks = []
+    stage_totals = dict.fromkeys(STAGES, 0.0)
+    elapsed = 0.0
+    for frame_index, frame in iter_frames(video_path, max_frames):
+        if frame_tracker is None:
+            frame_tracker = CameraTracking.FrameTracker(slot_ids, destination_zones, checkin_zones, frame.shape,
+                                                        **tracker_options)
+        issued = set(CameraTracking.tracked_ids)
+        start = time.perf_counter()
+        result = frame_tracker.process(frame_index, frame)
+        elapsed += time.perf_counter() - start
+        if result is None:
+            occupancy.append(np.zeros(len(slot_ids), dtype=bool))
+            continue
+        occupancy.append(result["snapshot"].slot_occupied)
+        if "timings" in result:
+            for stage in STAGES:
+                stage_totals[stage] += result["timings"][stage]
+            tracks.append((frame_index, result["detections"].ids, result["detections"].boxes))
+        for obj_id, ticket in CameraTracking.tracked_ids.items():
+            if obj_id not in issued:
+                ticket_events.append((frame_index, ticket))
+    frames = len(occupancy)
+    return {
+        "seconds": elapsed,
+        "frames": frames,
+        "inferred": frame_tracker.inferred if frame_tracker else 0,
+        "predicted": frame_tracker.predicted if frame_tracker else 0,
+        "skipped": frame_tracker.skipped if frame_tracker else 0,
+        "occupancy": np.array(occupancy, dtype=bool).reshape(frames, len(slot_ids)),
+        "ticket_events": ticket_events,
+        "tracks": tracks,
+        "stage_ms": {stage: total / len(tracks) if tracks else 0.0 for stage, total in stage_totals.items()},
+    }
+
+
+def count_id_switches(tracks, window=30):
+    """Ước lượng số lần đổi ID khi không có nhãn: một track mới xuất hiện gần vị trí cuối của một track
+    vừa mất (trong window khung hình) được tính là cùng một xe bị đổi ID.
+    """
+    seen = set()
+    lost = {}  # obj_id -> (frame_index, box) của track đã mất
+    last = {}
+    switches = 0
+    for frame_index, ids, boxes in tracks:
+        current = dict(zip(ids.tolist(), boxes))
+        for obj_id in set(last) - set(current):
+            lost[obj_id] = last[obj_id]
+        for obj_id in list(lost):
+            if frame_index - lost[obj_id][0] > window or obj_id in current:
+                del lost[obj_id]
+        for obj_id, box in current.items():
+            if obj_id in seen:
+                continue
+            seen.add(obj_id)
+            center = (box[:2] + box[2:]) / 2
+            for lost_id, (_, lost_box) in list(lost.items()):
+                lost_center = (lost_box[:2] + lost_box[2:]) / 2
+                if np.linalg.norm(center - lost_center) <= max(lost_box[2] - lost_box[0], lost_box[3] - lost_box[1]):
+                    switches += 1
+                    del lost[lost_id]
+                    break
+        last = {obj_id: (frame_index, box) for obj_id, box in current.items()}
+    return switches, len(seen)
+
+
+def compare_sessions(baseline, candidate, tolerance=5):
+    """So sánh trạng thái slot và thời điểm cấp ticket của candidate với baseline."""
+    frames = min(baseline["frames"], candidate["frames"])
+    if frames and baseline["occupancy"].shape[1]:
+        agreement = float((baseline["occupancy"][:frames] == candidate["occupancy"][:frames]).mean())
+    else:
+        agreement = 1.0
+    base_events, cand_events = baseline["ticket_events"], candidate["ticket_events"]
+    delays = [cand[0] - base[0] for base, cand in zip(base_events, cand_events) if base[1] == cand[1]]
+    matched = sum(1 for delay in delays if abs(delay) <= tolerance)
+    return {
+        "occupancy_agreement": agreement,
+        "tickets_issued": len(cand_events),
+        "tickets_matched": matched,
+        "ticket_accuracy": matched / len(base_events) if base_events else 1.0,
+        "mean_ticket_delay": float(np.mean(delays)) if delays else 0.0,
+    }
+
+
+def write_record(record):
+    try:
+        os.makedirs(os.path.dirname(BENCHMARK_LOG), exist_ok=True)
+        with open(BENCHMARK_LOG, "a", encoding="utf-8") as f:
+            f.write(json.dumps(record) + "\n")
+    except OSError as e:
+        print(f"Error writing benchmark record: {str(e)}")
+
+
+def print_table(rows):
+    print(f"{'config':<24}{'FPS':>8}{'inferred':>10}{'predicted':>11}{'skipped':>9}"
+          f"{'occupancy':>11}{'tickets':>9}{'ticket acc':>12}{'delay':>8}{'IDs':>6}{'switches':>10}")
+    for row in rows:
+        print(f"{row['config']:<24}{row['fps']:>8.1f}{row['inferred']:>10}{row['predicted']:>11}{row['skipped']:>9}"
+              f"{row['occupancy_agreement']:>11.1%}{row['tickets_issued']:>9}{row['ticket_accuracy']:>12.1%}"
+              f"{row['mean_ticket_delay']:>8.1f}{row['track_ids']:>6}{row['id_switches']:>10}")
+    print()
+    print(f"{'stage latency (ms)':<24}" + "".join(f"{stage:>13}" for stage in STAGES))
+    for row in rows:
+        print(f"{row['config']:<24}" + "".join(f"{row['stage_ms'][stage]:>13.2f}" for stage in STAGES))
+
+
+def run_configs(args, configs):
+    """Chạy từng cấu hình (tên, tùy chọn), cấu hình đầu tiên chạy được là baseline.
+
+    Tùy chọn gồm khóa "backend" (mặc định torch), "int8", "tracker_profile" và các tham số của FrameTracker.
+    """
+    from Utils import CameraTracking
+
+    val_link, destination_zones, checkin_zones, slot_ids = CameraTracking.load_camera_data(args.camera, args.manager)
+    video_path = args.video or val_link
+    if not slot_ids and not checkin_zones:
+        raise RuntimeError(f"No zones loaded for camera {args.camera}")
+
+    baseline = None
+    rows = []
+    for name, options in configs:
+        options = dict(options)
+        backend = options.pop("backend", "torch")
+        int8 = options.pop("int8", False)
+        options["tracker_config"] = tracker_config_path(options.pop("tracker_profile", None))
+        # Model INT8 được hiệu chuẩn bằng video ValLink của camera, không phải clip đang đo
+        CameraTracking.model = CameraTracking.load_model(args.camera, val_link or video_path, backend, int8)
+        if CameraTracking.model is None:
+            print(f"Skipping {name}: model not available")
+            continue
+        # Ultralytics tạo tracker từ file cấu hình khi tạo predictor; tạo lại để mỗi cấu hình bắt đầu từ đầu
+        CameraTracking.model.predictor = None
+        print(f"Running {name} on {video_path} ...")
+        session = run_session(video_path, args.camera, slot_ids, destination_zones, checkin_zones,
+                              args.max_frames, **options)
+        if baseline is None:
+            baseline = session
+        row = {
+            "config": name,
+            "fps": session["frames"] / session["seconds"] if session["seconds"] > 0 else 0.0,
+            "frames": session["frames"],
+            "inferred": session["inferred"],
+            "predicted": session["predicted"],
+            "skipped": session["skipped"],
+            "stage_ms": session["stage_ms"],
+        }
+        row["id_switches"], row["track_ids"] = count_id_switches(session["tracks"], args.switch_window)
+        row.update(compare_sessions(baseline, session, args.tolerance))
+        rows.append(row)
+    print_table(rows)
+    write_record({
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "benchmark": args.command,
+        "video": video_path,
+        "camera_id": args.camera,
+        "results": rows,
+    })
+    return rows
+
+
+def bench_detect_every(args):
+    # Baseline luôn là chạy detector mọi khung hình
+    every = [1] + [n for n in args.every if n != 1]
+    configs = [(f"detect_every={n}" + (" adaptive" if args.adaptive and n > 1 else ""),
+                {"detect_every": n, "adaptive_detect": args.adaptive, "motion_gate": False, "roi_mode": args.roi})
+               for n in every]
+    return run_configs(args, configs)
+
+
+def bench_backends(args):
+    # Tắt motion gate và dự đoán để mọi khung hình đều chạy suy luận trên backend đang đo
+    configs = [(f"backend={backend}", {"backend": backend, "detect_every": 1, "motion_gate": False,
+                                       "roi_mode": args.roi})
+               for backend in args.backends]
+    return run_configs(args, configs)
+
+
+def bench_trackers(args):
+    # Baseline là profile đầu tiên (mặc định botsort-reid, tức botsort.yaml hiện tại)
+    configs = [(f"tracker={profile}", {"backend": args.backend, "tracker_profile": profile, "detect_every": 1,
+                                       "motion_gate": False, "roi_mode": args.roi})
+               for profile in args.profiles]
+    return run_configs(args, configs)
+
+
+def check_int8(args):
+    """So sánh trạng thái slot giữa model float và INT8; trả về False nếu độ trùng khớp thấp hơn ngưỡng."""
+    # INT8 hiệu chuẩn bằng video ValLink của camera; clip kiểm tra là --video
+    configs = [("float", {"backend": args.backend, "detect_every": 1, "motion_gate": False, "roi_mode": False}),
+               ("int8", {"int8": True, "detect_every": 1, "motion_gate": False, "roi_mode": False})]
+    rows = run_configs(args, configs)
+    if len(rows) < 2:
+        print("INT8 check failed: model not available")
+        return False
+    int8_row = rows[1]
+    passed = (int8_row["occupancy_agreement"] >= args.min_agreement
+              and int8_row["ticket_accuracy"] >= args.min_ticket_accuracy)
+    print(f"INT8 check {'passed' if passed else 'FAILED'}: occupancy agreement "
+          f"{int8_row['occupancy_agreement']:.2%} (min {args.min_agreement:.2%}), ticket accuracy "
+          f"{int8_row['ticket_accuracy']:.2%} (min {args.min_ticket_accuracy:.2%}), "
+          f"speedup {int8_row['fps'] / rows[0]['fps'] if rows[0]['fps'] else 0:.2f}x")
+    return passed
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="Benchmark tracking modes on a video")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    common = argparse.ArgumentParser(add_help=False)
+    common.add_argument("--camera", type=int, required=True, help="Camera ID (zones and homography)")
+    common.add_argument("--manager", required=True, help="Manager username")
+    common.add_argument("--video", default="cam1.mp4", help="Video file (default: cam1.mp4)")
+    common.add_argument("--max-frames", type=int, default=None)
+    common.add_argument("--tolerance", type=int, default=5, help="Ticket delay tolerance in frames")
+    common.add_argument("--switch-window", type=int, default=30,
+                        help="Frames a lost track can be re-identified as an ID switch")
+
+    detect_every = subparsers.add_parser("detect-every", parents=[common],
+                                         help="Compare detecting every N frames against every frame")
+    detect_every.add_argument("--every", type=int, nargs="+", default=[1, 2, 3, 5])
+    detect_every.add_argument("--adaptive", action="store_true", help="Detect every frame while active")
+    detect_every.add_argument("--roi", action="store_true", help="Enable ROI inference")
+    detect_every.set_defaults(func=bench_detect_every)
+
+    backends = subparsers.add_parser("backends", parents=[common], help="Compare inference backends")
+    backends.add_argument("--backends", nargs="+", choices=BACKENDS, default=list(BACKENDS))
+    backends.add_argument("--roi", action="store_true", help="Enable ROI inference")
+    backends.set_defaults(func=bench_backends)
+
+    trackers = subparsers.add_parser("trackers", parents=[common], help="Compare tracker profiles")
+    trackers.add_argument("--profiles", nargs="+", choices=list(TRACKER_PROFILES), default=list(TRACKER_PROFILES))
+    trackers.add_argument("--backend", choices=BACKENDS, default="torch")
+    trackers.add_argument("--roi", action="store_true", help="Enable ROI inference")
+    trackers.set_defaults(func=bench_trackers)
+
+    int8 = subparsers.add_parser("int8-check", parents=[common],
+                                 help="Fail if INT8 slot-occupancy decisions drift from the float model")
+    int8.add_argument("--backend", choices=BACKENDS, default="torch", help="Float reference backend")
+    int8.add_argument("--min-agreement", type=float, default=0.98)
+    int8.add_argument("--min-ticket-accuracy", type=float, default=1.0)
+    int8.set_defaults(func=check_int8)
+    return parser
+
+
+def main(argv=None):
+    """Chạy benchmark; trả về mã thoát 1 nếu một kiểm tra (int8-check) không đạt."""
+    args = build_parser().parse_args(argv)
+    result = args.func(args)
+    return 1 if result is False else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,132 @@
+import glob
+import json
+import os
+import time
+
+import numpy as np
+
+# Thư mục lưu camera bundle đã biên dịch
+BUNDLE_DIR = os.path.join("cache", "bundles")
+BUNDLE_VERSION = 3
+
+
+def _bundle_path(camera_id):
+    return os.path.join(BUNDLE_DIR, f"camera_{camera_id}.npz")
+
+
+def _quads_array(quads):
+    return np.asarray(list(quads), dtype=np.float64).reshape(-1, 4, 2)
+
+
+def save_camera_bundle(camera_id, manager_username, val_link, main_map_path, homography_matrix,
+                       slot_quads_mainmap, checkin_quads_mainmap, destination_zones, checkin_zones, slot_ids,
+                       model_settings, fingerprint=None):
+    """Ghi camera bundle: vùng đã ánh xạ, ID slot/check-in, homography, đường dẫn MainMap và thiết lập model.
+
+    Bundle cho phép khởi động tracking mà không cần tải lại dữ liệu từ SQL Server hay tính lại homography.
+    fingerprint là tóm tắt dữ liệu nguồn trong database (CameraRepository.get_layout_fingerprint) lúc
+    biên dịch, dùng để phát hiện bundle cũ khi dữ liệu được sửa ngoài giao diện.
+    """
+    meta = {
+        "version": BUNDLE_VERSION,
+        "camera_id": camera_id,
+        "manager": manager_username,
+        "val_link": val_link,
+        "main_map": main_map_path,
+        "model_settings": model_settings,
+        "fingerprint": fingerprint,
+        "created_at": time.time(),
+    }
+    os.makedirs(BUNDLE_DIR, exist_ok=True)
+    path = _bundle_path(camera_id)
+    tmp_path = path + ".tmp.npz"
+    np.savez(
+        tmp_path,
+        meta=np.array(json.dumps(meta)),
+        homography=np.asarray(homography_matrix if homography_matrix is not None else np.empty((0, 3)),
+                              dtype=np.float64),
+        mainmap_slot_ids=np.asarray(list(slot_quads_mainmap.keys()), dtype=np.int64),
+        mainmap_slot_quads=_quads_array(slot_quads_mainmap.values()),
+        mainmap_checkin_ids=np.asarray(list(checkin_quads_mainmap.keys()), dtype=np.int64),
+        mainmap_checkin_quads=_quads_array(checkin_quads_mainmap.values()),
+        slot_ids=np.asarray(slot_ids, dtype=np.int64),
+        destination_zones=_quads_array(destination_zones).astype(np.int32),
+        checkin_zones=_quads_array(checkin_zones).astype(np.int32),
+    )
+    # Ghi file tạm rồi đổi tên để worker khác không đọc phải bundle ghi dở
+    os.replace(tmp_path, path)
+    print(f"Saved camera bundle for camera {camera_id} to {path}")
+
+
+def load_camera_bundle(camera_id, manager_username, model_settings, fingerprint=None):
+    """Đọc camera bundle nếu có và còn hợp lệ.
+
+    fingerprint là fingerprint dữ liệu hiện tại trong database; None thì không kiểm tra (ví dụ để khởi
+    động ngay rồi kiểm tra trong nền với fingerprint của bundle).
+
+    Returns:
+        dict: Các khóa val_link, main_map, homography, slot_quads_mainmap, checkin_quads_mainmap,
+        destination_zones, checkin_zones, slot_ids, fingerprint (lúc biên dịch); hoặc None nếu chưa có bundle, bundle của manager
+        khác, thiết lập model hoặc dữ liệu trong database đã thay đổi.
+    """
+    path = _bundle_path(camera_id)
+    if not os.path.exists(path):
+        return None
+    try:
+        with np.load(path) as data:
+            meta = json.loads(str(data["meta"]))
+            if (meta.get("version") != BUNDLE_VERSION or meta.get("manager") != manager_username
+                    or meta.get("model_settings") != model_settings
+                    or (fingerprint is not None and meta.get("fingerprint") != fingerprint)):
+                print(f"Camera bundle for camera {camera_id} is stale, rebuilding")
+                return None
+            homography = data["homography"]
+            return {
+                "val_link": meta["val_link"],
+                "main_map": meta["main_map"],
+                "homography": homography if homography.shape == (3, 3) else None,
+                "slot_quads_mainmap": {
+                    int(slot_id): [tuple(point) for point in quad.tolist()]
+                    for slot_id, quad in zip(data["mainmap_slot_ids"], data["mainmap_slot_quads"])
+                },
+                "checkin_quads_mainmap": {
+                    int(checkin_id): [tuple(point) for point in quad.tolist()]
+                    for checkin_id, quad in zip(data["mainmap_checkin_ids"], data["mainmap_checkin_quads"])
+                },
+                "destination_zones": [[tuple(point) for point in quad] for quad in data["destination_zones"].tolist()],
+                "checkin_zones": [[tuple(point) for point in quad] for quad in data["checkin_zones"].tolist()],
+                "slot_ids": [int(slot_id) for slot_id in data["slot_ids"]],
+                "fingerprint": meta.get("fingerprint"),
+            }
+    except Exception as e:
+        print(f"Error reading camera bundle for camera {camera_id}: {str(e)}")
+        return None
+
+
+def invalidate_camera_bundles(camera_id=None, manager_username=None):
+    """Xóa bundle để lần vận hành sau biên dịch lại từ database.
+
+    Thay đổi ngoài giao diện được phát hiện qua fingerprint khi load; gọi hàm này sau khi slot, check-in, PTS hoặc ValLink thay đổi: theo camera_id (PTS, ValLink) hoặc theo
+    manager_username (slot và check-in dùng chung cho mọi camera của manager). Không truyền gì thì
+    xóa tất cả.
+    """
+    if camera_id is not None:
+        paths = [_bundle_path(camera_id)]
+    else:
+        paths = glob.glob(os.path.join(BUNDLE_DIR, "camera_*.npz"))
+    removed = 0
+    for path in paths:
+        if not os.path.exists(path):
+            continue
+        if manager_username is not None and camera_id is None:
+            try:
+                with np.load(path) as data:
+                    if json.loads(str(data["meta"])).get("manager") != manager_username:
+                        continue
+            except Exception:
+                pass
+        os.remove(path)
+        removed += 1
+    if removed:
+        print(f"Invalidated {removed} camera bundle(s)")
+    return removed
@@ -0,0 +1,43 @@
+import json
+import os
+
+# Thiết lập xử lý theo camera: {"default": {...}, "<camera_id>": {...}}; thiết lập của camera ghi đè "default"
+CAMERA_CONFIG_FILE = "camera_config.json"
+
+DEFAULT_CAMERA_CONFIG = {
+    "detect_every": 1,       # Chạy detector mỗi N khung hình, dự đoán vị trí ở các khung hình còn lại
+    "adaptive_detect": True,  # Chạy detector mọi khung hình khi có xe ở check-in hoặc track mới
+    "motion_gate": True,
+    "roi_mode": True,
+    "backend": "torch",       # Backend suy luận: torch, onnx hoặc openvino (xem Utils.detector.BACKENDS)
+    "int8": False,            # Dùng model INT8 (OpenVINO) hiệu chuẩn bằng video ValLink của camera
+    "tracker_profile": None,  # Profile trong Utils.tracker_profiles.TRACKER_PROFILES, None là botsort.yaml
+    "display_fps": 30.0,      # Tần số làm mới khung hình camera (<= 0 là mọi khung hình)
+    "map_fps": 5.0,           # Tần số làm mới MainMap (<= 0 là mọi khung hình)
+    "max_tracks": None,       # Số track giữ ticket tối đa (loại bỏ track thấy lâu nhất), None là không giới hạn
+    "ticket_source": "database",  # "database": cấp ticket từ bảng Ticket; "sample": hàng đợi ticket mẫu
+}
+
+
+def _read_config_file():
+    try:
+        with open(CAMERA_CONFIG_FILE, encoding="utf-8") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {}
+    except (OSError, ValueError) as e:
+        print(f"Error reading {CAMERA_CONFIG_FILE}: {str(e)}")
+        return {}
+
+
+def get_camera_config(camera_id=None):
+    """Thiết lập xử lý của camera: mặc định, ghi đè bởi mục "default" rồi mục của camera trong file.
+
+    camera_id là None thì chỉ trả về thiết lập mặc định (đã áp dụng mục "default").
+    """
+    data = _read_config_file()
+    config = dict(DEFAULT_CAMERA_CONFIG)
+    config.update(data.get("default", {}))
+    if camera_id is not None:
+        config.update(data.get(str(camera_id), {}))
+    return config
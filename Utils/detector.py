@@ -0,0 +1,238 @@
+import hashlib
+import os
+import shutil
+import sys
+import threading
+import time
+
+import numpy as np
+
+from Utils import startup
+
+# Model đã load theo (đường dẫn, backend); torch và ultralytics chỉ được import khi cần model lần đầu
+_models = {}
+_model_lock = threading.Lock()
+device = None
+
+# Backend suy luận: torch chạy trực tiếp file .pt; onnx (ONNX Runtime) và openvino chạy bản export
+BACKENDS = ("torch", "onnx", "openvino")
+MODEL_CACHE_DIR = os.path.join("cache", "models")
+CALIBRATION_DIR = os.path.join("cache", "calibration")
+
+
+def get_device():
+    """Chọn thiết bị suy luận (cuda nếu có), import torch ở lần gọi đầu tiên."""
+    global device
+    if device is None:
+        import torch
+        device = "cuda" if torch.cuda.is_available() else "cpu"
+        print(f"Using device: {device}")
+    return device
+
+
+def weights_fingerprint(model_path):
+    """Mã băm nội dung file trọng số, để bản export được tạo lại khi file .pt thay đổi."""
+    sha1 = hashlib.sha1()
+    with open(model_path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            sha1.update(chunk)
+    return sha1.hexdigest()[:12]
+
+
+def exported_model_path(model_path, backend):
+    """Đường dẫn bản export đã cache của model_path cho backend (file .onnx hoặc thư mục OpenVINO IR)."""
+    stem = os.path.splitext(os.path.basename(model_path))[0]
+    name = f"{stem}-{weights_fingerprint(model_path)}"
+    if backend == "onnx":
+        return os.path.join(MODEL_CACHE_DIR, name + ".onnx")
+    return os.path.join(MODEL_CACHE_DIR, name + f"_{backend}_model")
+
+
+def export_model(model_path, backend, imgsz=640):
+    """Export model_path sang backend một lần và cache kết quả trong cache/models.
+
+    Bản export dùng kích thước đầu vào động để suy luận theo ROI vẫn dùng được imgsz nhỏ hơn.
+
+    Returns:
+        str: đường dẫn bản export.
+    """
+    target = exported_model_path(model_path, backend)
+    if os.path.exists(target):
+        return target
+    from ultralytics import YOLO
+    start = time.perf_counter()
+    exported = YOLO(model_path).export(format=backend, imgsz=imgsz, dynamic=True)
+    os.makedirs(MODEL_CACHE_DIR, exist_ok=True)
+    shutil.move(str(exported), target)
+    print(f"Exported {model_path} to {backend} in {time.perf_counter() - start:.1f}s: {target}")
+    return target
+
+
+def get_model(model_path, backend="torch"):
+    """Trả về model YOLO của model_path trên backend, load ở lần gọi đầu tiên (an toàn khi gọi từ nhiều luồng).
+
+    Với backend onnx hoặc openvino, model được export (hoặc lấy từ cache) rồi load qua runtime tương
+    ứng; tracker của ultralytics vẫn được dùng như với torch.
+
+    Returns:
+        YOLO: model đã load, hoặc None nếu load thất bại.
+    """
+    if backend not in BACKENDS:
+        print(f"Unknown inference backend '{backend}', using torch")
+        backend = "torch"
+
+    def load():
+        from ultralytics import YOLO
+        if backend == "torch":
+            get_device()
+            return YOLO(model_path)
+        return YOLO(export_model(model_path, backend), task="detect")
+
+    return _load_model((model_path, backend), load, f"{model_path} ({backend})")
+
+
+def get_int8_model(model_path, camera_id, video_path):
+    """Trả về model INT8 (OpenVINO) của model_path đã hiệu chuẩn bằng video ValLink của camera.
+
+    Returns:
+        YOLO: model đã load, hoặc None nếu export hoặc load thất bại.
+    """
+    def load():
+        from ultralytics import YOLO
+        return YOLO(export_int8_model(model_path, camera_id, video_path), task="detect")
+
+    return _load_model((model_path, "openvino-int8", camera_id), load, f"{model_path} (INT8, camera {camera_id})")
+
+
+def _load_model(key, load, description):
+    model = _models.get(key)
+    if model is not None:
+        return model
+    with _model_lock:
+        model = _models.get(key)
+        if model is None:
+            start = time.perf_counter()
+            try:
+                model = load()
+            except Exception as e:
+                print(f"Error loading model {description}: {e}")
+                return None
+            _models[key] = model
+            print(f"Loaded model {description} in {time.perf_counter() - start:.2f}s")
+            startup.mark("model_ready")
+    return model
+
+
+def sample_calibration_frames(video_path, output_dir, count=300):
+    """Lưu count khung hình cách đều nhau của video vào output_dir để hiệu chuẩn lượng tử hóa.
+
+    Returns:
+        int: số khung hình đã lưu.
+    """
+    import cv2
+    cap = cv2.VideoCapture(video_path)
+    if not cap.isOpened():
+        raise RuntimeError(f"Error opening calibration video: {video_path}")
+    try:
+        total = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+        indices = set(np.linspace(0, max(total - 1, 0), min(count, total), dtype=int).tolist()) if total > 0 else None
+        os.makedirs(output_dir, exist_ok=True)
+        saved = index = 0
+        while saved < count:
+            ret, frame = cap.read()
+            if not ret:
+                break
+            if indices is None or index in indices:
+                cv2.imwrite(os.path.join(output_dir, f"frame_{index:06d}.jpg"), frame)
+                saved += 1
+            index += 1
+    finally:
+        cap.release()
+    return saved
+
+
+def export_int8_model(model_path, camera_id, video_path, imgsz=640, count=300):
+    """Export model_path sang OpenVINO INT8 (lượng tử hóa sau huấn luyện, NNCF) cho một camera.
+
+    Dữ liệu hiệu chuẩn là count khung hình lấy từ video ValLink của camera, nên bản INT8 được cache theo
+    camera và theo mã băm trọng số.
+
+    Returns:
+        str: đường dẫn thư mục OpenVINO IR INT8.
+    """
+    stem = os.path.splitext(os.path.basename(model_path))[0]
+    target = os.path.join(MODEL_CACHE_DIR, f"{stem}-{weights_fingerprint(model_path)}-cam{camera_id}_int8_openvino_model")
+    if os.path.exists(target):
+        return target
+
+    import yaml
+    from ultralytics import YOLO
+    start = time.perf_counter()
+    calibration_dir = os.path.abspath(os.path.join(CALIBRATION_DIR, f"camera_{camera_id}"))
+    saved = sample_calibration_frames(video_path, os.path.join(calibration_dir, "images"), count)
+    if saved == 0:
+        raise RuntimeError(f"No calibration frames read from {video_path}")
+    model = YOLO(model_path)
+    data_path = os.path.join(calibration_dir, "data.yaml")
+    with open(data_path, "w", encoding="utf-8") as f:
+        yaml.safe_dump({"path": calibration_dir, "train": "images", "val": "images",
+                        "names": dict(model.names)}, f)
+    exported = model.export(format="openvino", imgsz=imgsz, dynamic=True, int8=True, data=data_path)
+    os.makedirs(MODEL_CACHE_DIR, exist_ok=True)
+    shutil.move(str(exported), target)
+    print(f"Exported INT8 model for camera {camera_id} from {saved} calibration frames in "
+          f"{time.perf_counter() - start:.1f}s: {target}")
+    return target
+
+
+def empty_cuda_cache():
+    """Giải phóng bộ nhớ CUDA nếu torch đã được import (không tự import torch)."""
+    torch = sys.modules.get("torch")
+    if torch is not None and torch.cuda.is_available():
+        torch.cuda.empty_cache()
+
+
+class Detections:
+    """Các phát hiện đã theo dõi của một khung hình dưới dạng mảng NumPy liền kề.
+
+    Attributes:
+        boxes (np.ndarray): (N, 4) float64, x1, y1, x2, y2 theo tọa độ khung hình.
+        confs (np.ndarray): (N,) float32 độ tin cậy.
+        ids (np.ndarray): (N,) int64 track ID.
+    """
+
+    def __init__(self, boxes, confs, ids):
+        self.boxes = boxes
+        self.confs = confs
+        self.ids = ids
+
+    @classmethod
+    def empty(cls):
+        return cls(np.empty((0, 4), dtype=np.float64), np.empty(0, dtype=np.float32), np.empty(0, dtype=np.int64))
+
+    def __len__(self):
+        return self.ids.shape[0]
+
+    def __iter__(self):
+        """Duyệt (box, obj_id) với box là mảng 4 phần tử và obj_id là int."""
+        return zip(self.boxes, self.ids.tolist())
+
+
+def extract_detections(result, min_conf):
+    """Chuyển kết quả tracking của ultralytics sang NumPy một lần mỗi khung hình.
+
+    Toàn bộ bảng box (x1, y1, x2, y2, track_id, conf, cls) được chuyển về CPU trong một lần, sau đó
+    lọc theo độ tin cậy bằng mặt nạ vector. Box chưa có track ID bị bỏ qua.
+    """
+    boxes = result.boxes
+    if boxes is None or boxes.id is None or len(boxes) == 0:
+        return Detections.empty()
+    data = boxes.data.cpu().numpy()
+    # Khi tracking: cột -3 là track ID, cột -2 là độ tin cậy
+    confs = data[:, -2].astype(np.float32)
+    keep = confs > min_conf
+    return Detections(
+        np.ascontiguousarray(data[keep, :4], dtype=np.float64),
+        confs[keep],
+        data[keep, -3].astype(np.int64),
+    )
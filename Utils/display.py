@@ -0,0 +1,42 @@
+import time
+
+
+class DisplayScheduler:
+    """Lịch làm mới hiển thị: khung hình camera và MainMap được làm mới với tần số riêng.
+
+    Vòng lặp hiển thị gọi poll() với mỗi kết quả tracking; chỉ các view đến hạn mới được vẽ và hiển thị,
+    các kết quả còn lại chỉ đi qua (ghi sự kiện, thống kê) nên stage vẽ không làm chậm tracking. Nếu còn
+    kết quả mới hơn đang chờ (backlog), việc vẽ được dời sang kết quả mới hơn (tối đa một chu kỳ) để luôn
+    hiển thị kết quả mới nhất. fps <= 0 là làm mới với mọi kết quả không có backlog.
+    """
+
+    VIEWS = ("camera", "map")
+
+    def __init__(self, camera_fps=30.0, map_fps=5.0):
+        self.intervals = {
+            "camera": 1.0 / camera_fps if camera_fps and camera_fps > 0 else 0.0,
+            "map": 1.0 / map_fps if map_fps and map_fps > 0 else 0.0,
+        }
+        self._next = dict.fromkeys(self.VIEWS, 0.0)
+        self.shown = dict.fromkeys(self.VIEWS, 0)
+
+    def poll(self, now=None, backlog=False):
+        """Trả về (camera_due, map_due) cho kết quả hiện tại và dời hạn của các view đến hạn."""
+        now = time.perf_counter() if now is None else now
+        due = []
+        for view in self.VIEWS:
+            # Có kết quả mới hơn đang chờ thì dời sang kết quả đó, nhưng không quá một chu kỳ
+            deadline = self._next[view] + (self.intervals[view] if backlog else 0.0)
+            if now < deadline or (backlog and not self.intervals[view]):
+                due.append(False)
+                continue
+            # Giữ nhịp đều; nếu bị trễ quá một chu kỳ thì tính lại từ bây giờ thay vì vẽ bù liên tiếp
+            self._next[view] += self.intervals[view]
+            if self._next[view] <= now:
+                self._next[view] = now + self.intervals[view]
+            self.shown[view] += 1
+            due.append(True)
+        return tuple(due)
+
+    def __str__(self):
+        return f"display: camera {self.shown['camera']} frames, map {self.shown['map']} frames"
@@ -3,8 +3,100 @@ import cv2 as cv
 from BusinessObject.models import PTS
 from DataAccess.dbcontext import DBContext
 from DataAccess.Repository.pts import PTSRepository
+import hashlib
 import os
 
+# Thư mục lưu homography đã tính cho từng camera
+HOMOGRAPHY_CACHE_DIR = os.path.join("cache", "homography")
+
+def pts_point_pairs(pts_records):
+    """Lấy các cặp điểm (MainMap, ValLink) hợp lệ từ bản ghi PTS, sắp xếp theo ID."""
+    src_points = []
+    dst_points = []
+    for pts in sorted(pts_records, key=lambda record: record.ID or 0):
+        if all(attr is not None for attr in [pts.srcX, pts.srcY, pts.dstX, pts.dstY]):
+            src_points.append([float(pts.dstX), float(pts.dstY)])
+            dst_points.append([float(pts.srcX), float(pts.srcY)])
+    return src_points, dst_points
+
+def pts_fingerprint(src_points, dst_points):
+    """Mã băm của các cặp điểm, dùng để biết khi nào cần tính lại homography."""
+    data = np.array([src_points, dst_points], dtype=np.float64).tobytes()
+    return hashlib.sha1(data).hexdigest()
+
+def fit_homography(src_points, dst_points):
+    """Tính homography src -> dst bằng RANSAC.
+
+    Returns:
+        tuple: (H, inlier_mask, reprojection_error) hoặc (None, None, None) nếu thất bại.
+        reprojection_error là sai số trung bình (pixel) trên các điểm inlier.
+    """
+    if len(src_points) < 4 or len(dst_points) < 4:
+        print("Warning: At least 4 point pairs are required for homography.")
+        return None, None, None
+    if len(src_points) != len(dst_points):
+        print(f"Error: Mismatched point counts (src: {len(src_points)}, dst: {len(dst_points)})")
+        return None, None, None
+    src_pts = np.array(src_points, dtype=np.float32).reshape(-1, 1, 2)
+    dst_pts = np.array(dst_points, dtype=np.float32).reshape(-1, 1, 2)
+    H, mask = cv.findHomography(src_pts, dst_pts, cv.RANSAC, 5.0)
+    if H is None:
+        print("Error: Homography calculation failed")
+        return None, None, None
+    inliers = mask.ravel().astype(bool)
+    projected = cv.perspectiveTransform(src_pts, H)
+    errors = np.linalg.norm(projected - dst_pts, axis=2).ravel()
+    error = float(errors[inliers].mean()) if inliers.any() else float(errors.mean())
+    return H, mask, error
+
+def _homography_cache_path(camera_id):
+    return os.path.join(HOMOGRAPHY_CACHE_DIR, f"camera_{camera_id}.npz")
+
+def save_homography(camera_id, fingerprint, H, mask, error):
+    """Lưu homography, inlier mask và sai số của camera vào cache."""
+    os.makedirs(HOMOGRAPHY_CACHE_DIR, exist_ok=True)
+    np.savez(_homography_cache_path(camera_id), H=H, mask=mask, error=error, fingerprint=fingerprint)
+
+def load_homography(camera_id, fingerprint):
+    """Đọc homography đã lưu của camera nếu khớp fingerprint.
+
+    Returns:
+        tuple: (H, inlier_mask, reprojection_error) hoặc None nếu chưa có hoặc điểm PTS đã thay đổi.
+    """
+    path = _homography_cache_path(camera_id)
+    if not os.path.exists(path):
+        return None
+    try:
+        with np.load(path) as data:
+            if str(data["fingerprint"]) != fingerprint:
+                return None
+            return data["H"], data["mask"], float(data["error"])
+    except Exception as e:
+        print(f"Error reading cached homography for camera {camera_id}: {str(e)}")
+        return None
+
+def get_camera_homography(camera_id, pts_records):
+    """Homography MainMap -> ValLink của camera: đọc từ cache, chỉ tính lại khi điểm PTS thay đổi.
+
+    Returns:
+        np.ndarray: Ma trận 3x3 hoặc None nếu không đủ điểm hoặc tính thất bại.
+    """
+    src_points, dst_points = pts_point_pairs(pts_records)
+    fingerprint = pts_fingerprint(src_points, dst_points)
+    cached = load_homography(camera_id, fingerprint)
+    if cached is not None:
+        H, _, error = cached
+        print(f"Loaded cached homography for camera {camera_id} (reprojection error {error:.2f}px)")
+        return H
+
+    print(f"Fitting homography for camera {camera_id} from {len(src_points)} PTS points")
+    H, mask, error = fit_homography(src_points, dst_points)
+    if H is None:
+        return None
+    save_homography(camera_id, fingerprint, H, mask, error)
+    print(f"Saved homography for camera {camera_id} (reprojection error {error:.2f}px)")
+    return H
+
 def run_homography(camera_id: int, val_link: str, main_map: str, db_context: DBContext):
     drawing = False
     src_x, src_y = -1, -1
@@ -237,7 +329,8 @@ def run_homography(camera_id: int, val_link: str, main_map: str, db_context: DBC
                 plan_view, H = get_plan_view(src, dst)
                 if plan_view is not None:
                     cv.imshow("plan view", plan_view)
-                    print("Homography matrix saved in memory for use")
+                    # Lưu homography MainMap -> ValLink để tracking dùng lại không cần tính lại
+                    get_camera_homography(camera_id, pts_repo.get_pts_by_camera_id(camera_id))
 
             elif k == ord('m'):
                 print('Merging views')
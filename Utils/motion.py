@@ -0,0 +1,60 @@
+import cv2
+import numpy as np
+
+from Utils.occupancy import ZoneLabelMask
+
+
+class MotionGate:
+    """Quyết định có cần chạy YOLO cho một khung hình hay không bằng cách so sánh khung hình thu nhỏ.
+
+    Chỉ xét các pixel thuộc hợp của các vùng slot và check-in. Khung hình được so với khung hình
+    gần nhất đã chạy suy luận (không phải khung hình liền trước), nên thay đổi chậm vẫn được cộng dồn.
+    Sau max_skip khung hình bỏ qua liên tiếp, suy luận luôn được chạy để tracker không bị lỗi thời.
+    """
+
+    def __init__(self, zone_arrays, frame_shape, scale=0.25, pixel_threshold=25, min_changed_ratio=0.002,
+                 max_skip=30):
+        self.scale = scale
+        self.pixel_threshold = pixel_threshold
+        self.min_changed_ratio = min_changed_ratio
+        self.max_skip = max_skip
+        height, width = int(frame_shape[0]), int(frame_shape[1])
+        self.size = (max(1, round(width * scale)), max(1, round(height * scale)))
+        mask = np.zeros((self.size[1], self.size[0]), dtype=bool)
+        for zone_array in zone_arrays:
+            if zone_array.shape[0]:
+                mask |= ZoneLabelMask(zone_array, (height, width), scale).labels > 0
+        # Không có vùng nào thì xét toàn bộ khung hình
+        self.mask = mask if mask.any() else np.ones_like(mask)
+        self.mask_area = int(self.mask.sum())
+        self.reference = None
+        self.skip_run = 0
+        self.skipped = 0
+
+    def _prepare(self, frame):
+        small = cv2.resize(frame, self.size, interpolation=cv2.INTER_AREA)
+        if small.ndim == 3:
+            small = cv2.cvtColor(small, cv2.COLOR_BGR2GRAY)
+        return cv2.GaussianBlur(small, (5, 5), 0)
+
+    def _changed_ratio(self, prepared):
+        if self.reference is None:
+            return 1.0
+        diff = cv2.absdiff(prepared, self.reference)
+        changed = np.count_nonzero((diff > self.pixel_threshold) & self.mask)
+        return changed / self.mask_area
+
+    def should_infer(self, frame):
+        """True nếu khung hình cần chạy suy luận; khi đó khung hình trở thành tham chiếu mới."""
+        prepared = self._prepare(frame)
+        if self.skip_run < self.max_skip and self._changed_ratio(prepared) < self.min_changed_ratio:
+            self.skip_run += 1
+            self.skipped += 1
+            return False
+        self.reference = prepared
+        self.skip_run = 0
+        return True
+
+    def reset(self):
+        self.reference = None
+        self.skip_run = 0
@@ -0,0 +1,172 @@
+import cv2
+import numpy as np
+
+
+def compile_zones(zones):
+    """Chuyển danh sách tứ giác [(x, y), ...] thành mảng (M, 4, 2) float64.
+
+    Vùng không đủ 4 điểm được điền NaN để không bao giờ chứa điểm nào, giữ nguyên chỉ số
+    của các vùng còn lại (chỉ số m tương ứng với slot_ids[m]).
+    """
+    zone_array = np.full((len(zones), 4, 2), np.nan, dtype=np.float64)
+    for idx, quad in enumerate(zones):
+        if quad is not None and len(quad) == 4:
+            zone_array[idx] = np.asarray(quad, dtype=np.float64)
+    return zone_array
+
+
+def box_centers(boxes):
+    """Tính tâm (N, 2) của các box (N, 4) dạng x1, y1, x2, y2 (làm tròn như is_in_quadrilateral)."""
+    boxes = np.asarray(boxes, dtype=np.float64).reshape(-1, 4).astype(np.int64)
+    centers = np.empty((boxes.shape[0], 2), dtype=np.float64)
+    centers[:, 0] = (boxes[:, 0] + boxes[:, 2]) // 2
+    centers[:, 1] = (boxes[:, 1] + boxes[:, 3]) // 2
+    return centers
+
+
+def points_in_zones(points, zone_array):
+    """Kiểm tra ray casting cho tất cả điểm (N, 2) với tất cả vùng (M, 4, 2) cùng lúc.
+
+    Returns:
+        np.ndarray: Ma trận bool (N, M), True nếu điểm n nằm trong vùng m.
+    """
+    points = np.asarray(points, dtype=np.float64).reshape(-1, 2)
+    if points.shape[0] == 0 or zone_array.shape[0] == 0:
+        return np.zeros((points.shape[0], zone_array.shape[0]), dtype=bool)
+
+    px = points[:, 0][:, None, None]
+    py = points[:, 1][:, None, None]
+    xi = zone_array[None, :, :, 0]
+    yi = zone_array[None, :, :, 1]
+    # Cạnh (i, j) với j là đỉnh liền trước i, giống vòng lặp trong is_in_quadrilateral
+    xj = np.roll(zone_array, 1, axis=1)[None, :, :, 0]
+    yj = np.roll(zone_array, 1, axis=1)[None, :, :, 1]
+
+    with np.errstate(invalid="ignore"):
+        crosses = ((yi > py) != (yj > py)) & (px < (xj - xi) * (py - yi) / (yj - yi + 1e-10) + xi)
+    return np.count_nonzero(crosses, axis=2) % 2 == 1
+
+
+class ZoneLabelMask:
+    """Ảnh nhãn vùng: mỗi pixel chứa chỉ số vùng + 1 phủ pixel đó, 0 nếu không thuộc vùng nào.
+
+    Tra cứu điểm -> vùng chỉ là một phép lấy chỉ số mảng, không phụ thuộc số lượng vùng.
+    Khi các vùng chồng lên nhau, pixel thuộc vùng có chỉ số lớn hơn (vẽ sau). scale < 1 cho phép
+    tạo mask nhỏ hơn ảnh gốc (ví dụ MainMap lớn) để tiết kiệm bộ nhớ.
+    """
+
+    def __init__(self, zone_array, shape, scale=1.0):
+        self.height, self.width = int(shape[0]), int(shape[1])
+        self.scale = scale
+        self.zone_count = zone_array.shape[0]
+        dtype = np.int16 if self.zone_count < np.iinfo(np.int16).max else np.int32
+        self.labels = np.zeros((max(1, round(self.height * scale)), max(1, round(self.width * scale))), dtype=dtype)
+        for idx, quad in enumerate(zone_array):
+            if np.isnan(quad).any():
+                continue
+            polygon = np.round(quad * scale).astype(np.int32)
+            cv2.fillPoly(self.labels, [polygon], idx + 1)
+
+    def lookup(self, points):
+        """Trả về chỉ số vùng (N,) của mỗi điểm (N, 2), -1 nếu không thuộc vùng nào."""
+        points = np.asarray(points, dtype=np.float64).reshape(-1, 2)
+        cols = np.floor(points[:, 0] * self.scale).astype(np.int64)
+        rows = np.floor(points[:, 1] * self.scale).astype(np.int64)
+        inside = (cols >= 0) & (cols < self.labels.shape[1]) & (rows >= 0) & (rows < self.labels.shape[0])
+        indices = np.full(points.shape[0], -1, dtype=np.int64)
+        indices[inside] = self.labels[rows[inside], cols[inside]].astype(np.int64) - 1
+        return indices
+
+    def membership(self, points):
+        """Ma trận bool (N, M) tương thích với points_in_zones, tính từ lookup."""
+        indices = self.lookup(points)
+        membership = np.zeros((indices.shape[0], self.zone_count), dtype=bool)
+        hit = np.flatnonzero(indices >= 0)
+        membership[hit, indices[hit]] = True
+        return membership
+
+
+def compute_occupancy(boxes, zone_array, label_mask=None):
+    """Tính ma trận thành viên box x vùng và trạng thái có xe của từng vùng.
+
+    Args:
+        boxes: Mảng (N, 4) các box x1, y1, x2, y2.
+        zone_array: Mảng (M, 4, 2) từ compile_zones.
+        label_mask: ZoneLabelMask của zone_array; nếu có thì dùng tra cứu mask thay cho ray casting.
+    Returns:
+        tuple: (membership (N, M) bool, occupied (M,) bool)
+    """
+    centers = box_centers(boxes)
+    if label_mask is not None:
+        membership = label_mask.membership(centers)
+    else:
+        membership = points_in_zones(centers, zone_array)
+    return membership, membership.any(axis=0)
+
+
+class OccupancySnapshot:
+    """Kết quả occupancy của một khung hình, tính một lần ở stage tracking và dùng chung cho mọi
+    overlay, bộ đếm và API (ValLink, MainMap, số slot trống).
+
+    Attributes:
+        frame_index (int): Số thứ tự khung hình.
+        slots (dict): {slot_id: True nếu có xe}.
+        slot_vehicles (dict): {slot_id: [vehicle_id, ...]} các xe có tâm nằm trong slot.
+        checkin_vehicles (list): Các vehicle_id đang ở trong vùng check-in.
+        tickets (dict): {vehicle_id: ticket} của các xe trong khung hình đã có ticket.
+        ticket_valid (dict): {vehicle_id: True nếu ticket cho phép ít nhất một slot của camera}.
+        invalid_vehicle_ids (set): Các xe đang đỗ trong slot mà ticket không cho phép.
+
+    allowed_slots là ma trận (số xe, số slot) các slot được phép của từng xe (AllowedSlotMatrix.allowed);
+    None là mọi slot đều được phép.
+    """
+
+    def __init__(self, frame_index, slot_ids, vehicle_ids, slot_membership, checkin_membership, tickets,
+                 allowed_slots=None):
+        self.frame_index = frame_index
+        self.slot_ids = list(slot_ids)
+        self.vehicle_ids = list(vehicle_ids)
+        self.slot_occupied = slot_membership.any(axis=0)
+        self.slots = {slot_id: bool(self.slot_occupied[idx]) for idx, slot_id in enumerate(self.slot_ids)}
+        self.slot_vehicles = {
+            slot_id: [self.vehicle_ids[n] for n in np.flatnonzero(slot_membership[:, idx])]
+            for idx, slot_id in enumerate(self.slot_ids)
+        }
+        self.checkin_vehicles = [self.vehicle_ids[n] for n in np.flatnonzero(checkin_membership.any(axis=1))]
+        self.tickets = dict(tickets)
+        if allowed_slots is None:
+            allowed_slots = np.ones(slot_membership.shape, dtype=bool)
+        # Xe đỗ trong slot mà ticket không cho phép, kiểm tra mọi xe trong một phép tính
+        invalid = (slot_membership & ~allowed_slots).any(axis=1)
+        has_allowed = allowed_slots.any(axis=1)
+        positions = {vehicle_id: n for n, vehicle_id in enumerate(self.vehicle_ids)}
+        self.ticket_valid = {vehicle_id: bool(has_allowed[positions[vehicle_id]]) for vehicle_id in self.tickets}
+        self.invalid_vehicle_ids = {self.vehicle_ids[n] for n in np.flatnonzero(invalid)}
+
+    @property
+    def total_slots(self):
+        return len(self.slot_ids)
+
+    @property
+    def occupied_count(self):
+        return int(np.count_nonzero(self.slot_occupied))
+
+    @property
+    def available_count(self):
+        return self.total_slots - self.occupied_count
+
+    def is_occupied(self, slot_id):
+        return self.slots.get(slot_id, False)
+
+    def to_dict(self):
+        """Chuyển snapshot thành dict thuần Python (dùng cho JSON/API)."""
+        return {
+            "frame": self.frame_index,
+            "total_slots": self.total_slots,
+            "available_slots": self.available_count,
+            "slots": {str(slot_id): occupied for slot_id, occupied in self.slots.items()},
+            "slot_vehicles": {str(slot_id): vehicles for slot_id, vehicles in self.slot_vehicles.items()},
+            "checkin_vehicles": self.checkin_vehicles,
+            "tickets": {str(vehicle_id): ticket for vehicle_id, ticket in self.tickets.items()},
+            "invalid_vehicles": sorted(self.invalid_vehicle_ids),
+        }
@@ -0,0 +1,248 @@
+import cv2
+import numpy as np
+
+FREE_COLOR = (0, 255, 0)
+OCCUPIED_COLOR = (0, 0, 255)
+CHECKIN_COLOR = (0, 255, 255)
+LINE_THICKNESS = 2
+FONT = cv2.FONT_HERSHEY_SIMPLEX
+FONT_SCALE = 0.5
+
+
+def _visible_points(quad, shape):
+    """Các đỉnh nằm trong ảnh (cách vẽ cũ bỏ đỉnh nằm ngoài ảnh)."""
+    return [(int(x), int(y)) for x, y in quad if 0 <= x < shape[1] and 0 <= y < shape[0]]
+
+
+def _label_origin(points):
+    avg_x = sum(p[0] for p in points) // len(points)
+    avg_y = sum(p[1] for p in points) // len(points)
+    return avg_x - 30, avg_y - 10
+
+
+def _draw_zone(image, points, color, label, label_color, offset=(0, 0)):
+    ox, oy = offset
+    shifted = [(x - ox, y - oy) for x, y in points]
+    for i in range(len(shifted)):
+        cv2.line(image, shifted[i], shifted[(i + 1) % len(shifted)], color, LINE_THICKNESS)
+    x, y = _label_origin(points)
+    cv2.putText(image, label, (x - ox, y - oy), FONT, FONT_SCALE, label_color, LINE_THICKNESS)
+
+
+def _zone_rect(points, label, shape):
+    """Hình chữ nhật (x0, y0, x1, y1) chứa viền và nhãn của vùng, đã cắt theo ảnh."""
+    (text_w, text_h), baseline = cv2.getTextSize(label, FONT, FONT_SCALE, LINE_THICKNESS)
+    x, y = _label_origin(points)
+    xs = [p[0] for p in points] + [x, x + text_w]
+    ys = [p[1] for p in points] + [y - text_h, y + baseline]
+    pad = LINE_THICKNESS + 2
+    return (max(0, min(xs) - pad), max(0, min(ys) - pad),
+            min(shape[1], max(xs) + pad + 1), min(shape[0], max(ys) + pad + 1))
+
+
+class ZoneOverlay:
+    """Lớp phủ viền và nhãn slot/check-in được vẽ sẵn một lần cho một kích thước ảnh.
+
+    Hai lớp được vẽ trước cho mọi slot: trống (xanh) và có xe (đỏ), kèm độ phủ (alpha) của nét vẽ để
+    giữ khử răng cưa của chữ như khi vẽ trực tiếp. Lớp hiện tại được ghép từ hai lớp này; mỗi khung hình
+    chỉ các slot đổi trạng thái được chép lại (theo mặt nạ của slot), rồi lớp hiện tại được chép lên ảnh
+    bằng một lần cv2.copyTo có mặt nạ, còn các pixel phủ một phần được trộn theo chỉ số. Không đường hay
+    chữ nào được vẽ lại, nên chi phí mỗi khung hình không tăng theo số lệnh vẽ của các slot.
+    """
+
+    def __init__(self, shape, slot_ids, slot_quads, checkin_quads, checkin_labels=None,
+                 checkin_label_color=CHECKIN_COLOR, name="ValLink"):
+        height, width = int(shape[0]), int(shape[1])
+        self.shape = (height, width)
+        self.slot_ids = list(slot_ids)
+        free = np.zeros((height, width, 3), dtype=np.uint8)
+        occupied = np.zeros((height, width, 3), dtype=np.uint8)
+        coverage = np.zeros((height, width), dtype=np.uint8)
+        # owner: 1 + vị trí slot sở hữu pixel (slot vẽ sau đè slot vẽ trước), 0 nếu không thuộc slot nào
+        owner = np.zeros((height, width), dtype=np.int32)
+        rects = {}
+
+        for position, (slot_id, quad) in enumerate(zip(self.slot_ids, slot_quads)):
+            points = _visible_points(quad, self.shape)
+            if len(points) < 3:
+                print(f"Invalid quad for slot {slot_id} on {name}: {points}, skipping")
+                continue
+            label = f"Slot {slot_id}"
+            _draw_zone(free, points, FREE_COLOR, label, FREE_COLOR)
+            _draw_zone(occupied, points, OCCUPIED_COLOR, label, OCCUPIED_COLOR)
+            x0, y0, x1, y1 = _zone_rect(points, label, self.shape)
+            slot_coverage = np.zeros((y1 - y0, x1 - x0), dtype=np.uint8)
+            _draw_zone(slot_coverage, points, 255, label, 255, offset=(x0, y0))
+            np.maximum(coverage[y0:y1, x0:x1], slot_coverage, out=coverage[y0:y1, x0:x1])
+            owner[y0:y1, x0:x1][slot_coverage > 0] = position + 1
+            rects[slot_id] = (position, y0, y1, x0, x1)
+
+        # Check-in không đổi màu và được vẽ sau slot như cách vẽ cũ, nên pixel của check-in không thuộc slot nào
+        checkin_labels = checkin_labels or ["CheckIn"] * len(checkin_quads)
+        checkin_coverage = np.zeros((height, width), dtype=np.uint8)
+        for label, quad in zip(checkin_labels, checkin_quads):
+            points = _visible_points(quad, self.shape)
+            if len(points) < 3:
+                print(f"Invalid quad for check-in on {name}: {points}, skipping")
+                continue
+            for layer in (free, occupied):
+                _draw_zone(layer, points, CHECKIN_COLOR, label, checkin_label_color)
+            _draw_zone(checkin_coverage, points, 255, label, 255)
+        np.maximum(coverage, checkin_coverage, out=coverage)
+        owner[checkin_coverage > 0] = 0
+
+        self.layers = {False: free, True: occupied}
+        self.current = free.copy()
+        self._slot_regions = {
+            slot_id: (y0, y1, x0, x1, (owner[y0:y1, x0:x1] == position + 1).astype(np.uint8))
+            for slot_id, (position, y0, y1, x0, x1) in rects.items()
+        }
+        self.state = dict.fromkeys(self._slot_regions, False)
+        # Pixel phủ hoàn toàn được chép thẳng; pixel phủ một phần (viền chữ khử răng cưa) được trộn theo
+        # chỉ số kênh màu trên ảnh phẳng (H * W * 3)
+        self._opaque_mask = (coverage == 255).astype(np.uint8)
+        partial = np.flatnonzero((coverage > 0) & (coverage < 255))
+        self._partial_index = (partial[:, None] * 3 + np.arange(3)).reshape(-1)
+        self._inverse_alpha = np.repeat(255 - coverage.reshape(-1)[partial].astype(np.uint16), 3)
+
+    def update(self, snapshot):
+        """Cập nhật lớp hiện tại theo trạng thái slot của snapshot; trả về số slot đổi trạng thái."""
+        flipped = 0
+        for slot_id, (y0, y1, x0, x1, slot_mask) in self._slot_regions.items():
+            occupied = snapshot.is_occupied(slot_id)
+            if occupied == self.state[slot_id]:
+                continue
+            cv2.copyTo(self.layers[occupied][y0:y1, x0:x1], slot_mask, self.current[y0:y1, x0:x1])
+            self.state[slot_id] = occupied
+            flipped += 1
+        return flipped
+
+    def apply(self, image):
+        """Chép lớp hiện tại lên image (cùng kích thước, liên tục trong bộ nhớ) tại các pixel có vẽ."""
+        if image.shape[:2] != self.shape:
+            raise ValueError(f"Overlay built for {self.shape}, got image {image.shape[:2]}")
+        cv2.copyTo(self.current, self._opaque_mask, image)
+        if len(self._partial_index):
+            # Màu lớp đã nhân sẵn alpha (vẽ trên nền đen): ảnh * (1 - alpha) + lớp
+            flat = image.reshape(-1)
+            background = flat[self._partial_index].astype(np.uint16)
+            blended = (background * self._inverse_alpha + 127) // 255 + self.current.reshape(-1)[self._partial_index]
+            flat[self._partial_index] = np.minimum(blended, 255)
+        return image
+
+    def draw(self, image, snapshot):
+        self.update(snapshot)
+        return self.apply(image)
+
+
+MARKER_COLOR = (0, 0, 255)
+MARKER_RADIUS = 5
+MARKER_LABEL_COLOR = (255, 255, 255)
+
+
+def draw_vehicle_marker(image, center, label=None):
+    """Vẽ chấm đỏ tại center và nhãn (nếu có) như cách vẽ trên MainMap; trả về hình chữ nhật bị vẽ."""
+    center_x, center_y = center
+    cv2.circle(image, (center_x, center_y), radius=MARKER_RADIUS, color=MARKER_COLOR, thickness=-1)
+    pad = MARKER_RADIUS + 2
+    x0, y0, x1, y1 = center_x - pad, center_y - pad, center_x + pad + 1, center_y + pad + 1
+    if label is not None:
+        x, y = center_x - 30, center_y - 10
+        cv2.putText(image, label, (x, y), FONT, FONT_SCALE, MARKER_LABEL_COLOR, LINE_THICKNESS)
+        (text_w, text_h), baseline = cv2.getTextSize(label, FONT, FONT_SCALE, LINE_THICKNESS)
+        pad = LINE_THICKNESS + 2
+        x0, y0 = min(x0, x - pad), min(y0, y - text_h - pad)
+        x1, y1 = max(x1, x + text_w + pad + 1), max(y1, y + baseline + pad + 1)
+    return x0, y0, x1, y1
+
+
+def _clip_rect(rect, shape):
+    x0, y0, x1, y1 = rect
+    x0, y0 = max(0, x0), max(0, y0)
+    x1, y1 = min(shape[1], x1), min(shape[0], y1)
+    return (x0, y0, x1, y1) if x0 < x1 and y0 < y1 else None
+
+
+def _intersects(a, b):
+    return a[0] < b[2] and b[0] < a[2] and a[1] < b[3] and b[1] < a[3]
+
+
+class MainMapRenderer:
+    """Vẽ MainMap theo kiểu tăng dần, không sao chép toàn bộ ảnh mỗi khung hình.
+
+    Giữ hai ảnh cố định: base (MainMap kèm viền slot/check-in theo trạng thái hiện tại) và canvas (base
+    kèm chấm xe của khung hình gần nhất). Mỗi khung hình chỉ các hình chữ nhật bẩn được phục hồi: vùng
+    chấm và nhãn của khung hình trước, và vùng của các slot đổi trạng thái (vẽ lại từ ảnh gốc cùng các vùng
+    chồng lên nó); sau đó chấm của khung hình hiện tại được vẽ lên canvas.
+
+    render() trả về chính canvas: ảnh chỉ hợp lệ đến lần render() tiếp theo và không được sửa.
+    """
+
+    def __init__(self, main_map, slot_ids, slot_quads, checkin_quads, checkin_labels=None,
+                 checkin_label_color=(255, 255, 255)):
+        self.main_map = main_map
+        self.shape = main_map.shape[:2]
+        # (slot_id hoặc None cho check-in, điểm, nhãn, màu nhãn cố định, hình chữ nhật), theo thứ tự vẽ cũ
+        self._zones = []
+        for slot_id, quad in zip(slot_ids, slot_quads):
+            points = _visible_points(quad, self.shape)
+            if len(points) < 3:
+                print(f"Invalid quad for slot {slot_id} on MainMap: {points}, skipping")
+                continue
+            label = f"Slot {slot_id}"
+            self._zones.append((slot_id, points, label, None, _zone_rect(points, label, self.shape)))
+        checkin_labels = checkin_labels or ["CheckIn"] * len(checkin_quads)
+        for label, quad in zip(checkin_labels, checkin_quads):
+            points = _visible_points(quad, self.shape)
+            if len(points) < 3:
+                print(f"Invalid quad for check-in on MainMap: {points}, skipping")
+                continue
+            self._zones.append((None, points, label, checkin_label_color, _zone_rect(points, label, self.shape)))
+        self._slot_rects = {zone[0]: zone[4] for zone in self._zones if zone[0] is not None}
+        self.state = dict.fromkeys(self._slot_rects, False)
+
+        self.base = main_map.copy()
+        self._draw_zones(self.base, (0, 0, self.shape[1], self.shape[0]))
+        self.canvas = self.base.copy()
+        self._marker_rects = []
+
+    def _draw_zones(self, image, rect):
+        """Vẽ lên image (ảnh con tại rect) mọi vùng giao với rect, theo trạng thái slot hiện tại."""
+        x0, y0 = rect[0], rect[1]
+        for slot_id, points, label, label_color, zone_rect in self._zones:
+            if not _intersects(zone_rect, rect):
+                continue
+            if slot_id is None:
+                _draw_zone(image, points, CHECKIN_COLOR, label, label_color, offset=(x0, y0))
+            else:
+                color = OCCUPIED_COLOR if self.state[slot_id] else FREE_COLOR
+                _draw_zone(image, points, color, label, color, offset=(x0, y0))
+
+    def _update_base(self, snapshot):
+        flipped = [slot_id for slot_id in self._slot_rects if snapshot.is_occupied(slot_id) != self.state[slot_id]]
+        for slot_id in flipped:
+            self.state[slot_id] = not self.state[slot_id]
+        for slot_id in flipped:
+            x0, y0, x1, y1 = rect = self._slot_rects[slot_id]
+            region = self.base[y0:y1, x0:x1]
+            region[...] = self.main_map[y0:y1, x0:x1]
+            self._draw_zones(region, rect)
+        return [self._slot_rects[slot_id] for slot_id in flipped]
+
+    def render(self, snapshot, centers, labels):
+        """Cập nhật canvas cho một khung hình.
+
+        Args:
+            snapshot: OccupancySnapshot của khung hình (trạng thái slot).
+            centers: tâm xe trên MainMap, mảng (N, 2) số nguyên.
+            labels: nhãn của từng xe (None nếu không có nhãn).
+        """
+        dirty = self._marker_rects + self._update_base(snapshot)
+        for x0, y0, x1, y1 in dirty:
+            self.canvas[y0:y1, x0:x1] = self.base[y0:y1, x0:x1]
+        self._marker_rects = []
+        for (center_x, center_y), label in zip(centers, labels):
+            rect = _clip_rect(draw_vehicle_marker(self.canvas, (int(center_x), int(center_y)), label), self.shape)
+            if rect is not None:
+                self._marker_rects.append(rect)
+        return self.canvas
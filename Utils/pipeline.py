@@ -0,0 +1,182 @@
+import queue
+import threading
+import time
+
+# Chính sách khi hàng đợi đầy
+DROP_NONE = "block"          # Chờ đến khi có chỗ (không bỏ khung hình)
+DROP_OLDEST = "drop_oldest"  # Bỏ khung hình cũ nhất để giữ khung hình mới
+DROP_NEWEST = "drop_newest"  # Bỏ khung hình vừa đến
+DROP_POLICIES = (DROP_NONE, DROP_OLDEST, DROP_NEWEST)
+
+# Đánh dấu kết thúc luồng dữ liệu
+END_OF_STREAM = object()
+
+
+class FrameQueue:
+    """Hàng đợi giới hạn kích thước giữa các stage với chính sách bỏ khung hình."""
+
+    def __init__(self, maxsize=4, drop_policy=DROP_NONE):
+        if drop_policy not in DROP_POLICIES:
+            raise ValueError(f"Unknown drop policy: {drop_policy}")
+        self._queue = queue.Queue(maxsize=max(1, maxsize))
+        self._lock = threading.Lock()
+        self.drop_policy = drop_policy
+        self.dropped = 0
+
+    def put(self, item, stop_event=None):
+        """Đưa item vào hàng đợi theo chính sách. Trả về False nếu item bị bỏ."""
+        if self.drop_policy == DROP_NEWEST:
+            try:
+                self._queue.put_nowait(item)
+                return True
+            except queue.Full:
+                self.dropped += 1
+                return False
+
+        if self.drop_policy == DROP_OLDEST:
+            with self._lock:
+                while True:
+                    try:
+                        self._queue.put_nowait(item)
+                        return True
+                    except queue.Full:
+                        try:
+                            old = self._queue.get_nowait()
+                            if old is END_OF_STREAM:
+                                self._queue.put_nowait(old)
+                                return False
+                            self.dropped += 1
+                        except queue.Empty:
+                            pass
+
+        while stop_event is None or not stop_event.is_set():
+            try:
+                self._queue.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def put_end(self, stop_event=None):
+        """Đưa dấu kết thúc vào hàng đợi.
+
+        Với DROP_NONE sẽ chờ stage sau lấy hết khung hình; khi pipeline đã dừng (hoặc với các chính
+        sách bỏ khung hình) thì bỏ khung hình cũ nhất để không bị chặn.
+        """
+        if self.drop_policy == DROP_NONE:
+            while stop_event is not None and not stop_event.is_set():
+                try:
+                    self._queue.put(END_OF_STREAM, timeout=0.1)
+                    return
+                except queue.Full:
+                    continue
+        with self._lock:
+            while True:
+                try:
+                    self._queue.put_nowait(END_OF_STREAM)
+                    return
+                except queue.Full:
+                    try:
+                        self._queue.get_nowait()
+                        self.dropped += 1
+                    except queue.Empty:
+                        pass
+
+    def get(self, timeout=None):
+        """Lấy item tiếp theo, trả về None nếu hết thời gian chờ."""
+        try:
+            return self._queue.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+    def pending(self):
+        """Còn item đang chờ trong hàng đợi hay không."""
+        return not self._queue.empty()
+
+
+class StageStats:
+    """Thống kê thời gian xử lý của một stage."""
+
+    def __init__(self, name):
+        self.name = name
+        self.count = 0
+        self.busy_time = 0.0
+
+    def add(self, elapsed):
+        self.count += 1
+        self.busy_time += elapsed
+
+    def ms_per_item(self):
+        return (self.busy_time / self.count) * 1000 if self.count else 0.0
+
+    def fps(self):
+        return self.count / self.busy_time if self.busy_time > 0 else 0.0
+
+    def __str__(self):
+        return f"{self.name}: {self.count} frames, {self.ms_per_item():.1f} ms/frame ({self.fps():.1f} FPS max)"
+
+
+class FrameReader(threading.Thread):
+    """Stage giải mã: đọc khung hình từ cv2.VideoCapture và đưa vào hàng đợi."""
+
+    def __init__(self, cap, output_queue, stop_event):
+        super().__init__(name="decode", daemon=True)
+        self.cap = cap
+        self.output_queue = output_queue
+        self.stop_event = stop_event
+        self.stats = StageStats("decode")
+
+    def run(self):
+        frame_index = 0
+        try:
+            while not self.stop_event.is_set():
+                start = time.perf_counter()
+                success, frame = self.cap.read()
+                if not success or frame is None:
+                    print(f"End of video reached or invalid frame at frame {frame_index}.")
+                    break
+                frame_index += 1
+                self.stats.add(time.perf_counter() - start)
+                if frame.shape[0] <= 0 or frame.shape[1] <= 0:
+                    print(f"Invalid frame size at frame {frame_index}: {frame.shape}")
+                    continue
+                self.output_queue.put((frame_index, frame), self.stop_event)
+        except Exception as e:
+            print(f"Error in decode stage: {str(e)}")
+        finally:
+            self.output_queue.put_end(self.stop_event)
+
+
+class PipelineStage(threading.Thread):
+    """Stage xử lý: lấy item từ hàng đợi vào, gọi work(item) và đưa kết quả sang hàng đợi ra.
+
+    Nếu work trả về None thì item bị bỏ qua (ví dụ lỗi tracking ở một khung hình).
+    """
+
+    def __init__(self, name, work, input_queue, output_queue, stop_event):
+        super().__init__(name=name, daemon=True)
+        self.work = work
+        self.input_queue = input_queue
+        self.output_queue = output_queue
+        self.stop_event = stop_event
+        self.stats = StageStats(name)
+
+    def run(self):
+        try:
+            while not self.stop_event.is_set():
+                item = self.input_queue.get(timeout=0.1)
+                if item is None:
+                    continue
+                if item is END_OF_STREAM:
+                    break
+                start = time.perf_counter()
+                try:
+                    result = self.work(item)
+                except Exception as e:
+                    print(f"Error in {self.name} stage: {str(e)}")
+                    result = None
+                self.stats.add(time.perf_counter() - start)
+                if result is not None:
+                    self.output_queue.put(result, self.stop_event)
+        finally:
+            self.output_queue.put_end(self.stop_event)
@@ -0,0 +1,117 @@
+import numpy as np
+
+from Utils.detector import Detections
+
+# Mô hình vận tốc không đổi: trạng thái [cx, cy, w, h, vx, vy, vw, vh], vận tốc tính theo pixel/khung hình
+_F = np.eye(8)
+_F[:4, 4:] = np.eye(4)
+_STD_POSITION = 1.0 / 20
+_STD_VELOCITY = 1.0 / 160
+
+
+def _to_measurements(boxes):
+    """(N, 4) x1, y1, x2, y2 -> (N, 4) cx, cy, w, h."""
+    return np.column_stack(((boxes[:, 0] + boxes[:, 2]) / 2, (boxes[:, 1] + boxes[:, 3]) / 2,
+                            boxes[:, 2] - boxes[:, 0], boxes[:, 3] - boxes[:, 1]))
+
+
+def _to_boxes(states):
+    cx, cy, w, h = states[:, 0], states[:, 1], np.maximum(states[:, 2], 1.0), np.maximum(states[:, 3], 1.0)
+    return np.column_stack((cx - w / 2, cy - h / 2, cx + w / 2, cy + h / 2))
+
+
+class KalmanBoxPredictor:
+    """Bộ lọc Kalman vận tốc không đổi cho tất cả track, tính theo lô trên mảng NumPy.
+
+    step() được gọi mỗi khung hình để dự đoán vị trí; update() hiệu chỉnh bằng kết quả của detector ở
+    các khung hình có suy luận. Track không còn trong kết quả của detector bị xóa, nên ID luôn khớp với
+    tracker của YOLO.
+    """
+
+    def __init__(self):
+        self.ids = np.empty(0, dtype=np.int64)
+        self.confs = np.empty(0, dtype=np.float32)
+        self.states = np.empty((0, 8))
+        self.covariances = np.empty((0, 8, 8))
+
+    def __len__(self):
+        return self.ids.shape[0]
+
+    @staticmethod
+    def _noise(heights, std_position, std_velocity):
+        heights = np.maximum(heights, 1.0)
+        std = np.column_stack([heights * std_position] * 4 + [heights * std_velocity] * 4)
+        return np.einsum("ni,ij->nij", std ** 2, np.eye(8))
+
+    def step(self):
+        """Dự đoán trạng thái của tất cả track sau một khung hình."""
+        if not len(self):
+            return
+        self.states = self.states @ _F.T
+        self.covariances = _F @ self.covariances @ _F.T + self._noise(self.states[:, 3], _STD_POSITION,
+                                                                      _STD_VELOCITY)
+
+    def update(self, detections):
+        """Hiệu chỉnh track có trong detections, tạo track mới và xóa track đã mất."""
+        measurements = _to_measurements(detections.boxes)
+        index = {obj_id: idx for idx, obj_id in enumerate(self.ids.tolist())}
+        known = np.array([index.get(obj_id, -1) for obj_id in detections.ids.tolist()], dtype=np.int64)
+        matched = known >= 0
+
+        states = np.zeros((len(detections), 8))
+        covariances = np.zeros((len(detections), 8, 8))
+        if matched.any():
+            prior_states = self.states[known[matched]]
+            prior_covariances = self.covariances[known[matched]]
+            z = measurements[matched]
+            innovation_cov = prior_covariances[:, :4, :4] + self._noise(z[:, 3], _STD_POSITION, 0)[:, :4, :4]
+            # K = P H^T S^-1, với H = [I 0]
+            gain = np.linalg.solve(innovation_cov, prior_covariances[:, :4, :]).transpose(0, 2, 1)
+            states[matched] = prior_states + np.einsum("nij,nj->ni", gain, z - prior_states[:, :4])
+            covariances[matched] = prior_covariances - gain @ prior_covariances[:, :4, :]
+        if (~matched).any():
+            z = measurements[~matched]
+            states[~matched, :4] = z
+            covariances[~matched] = self._noise(z[:, 3], 2 * _STD_POSITION, 10 * _STD_VELOCITY)
+
+        self.ids = detections.ids.copy()
+        self.confs = detections.confs.copy()
+        self.states = states
+        self.covariances = covariances
+        return int((~matched).sum())
+
+    def hold(self):
+        """Đặt vận tốc về 0 (cảnh đứng yên theo MotionGate)."""
+        self.states[:, 4:] = 0.0
+
+    def clear(self):
+        self.__init__()
+
+    def detections(self):
+        """Vị trí dự đoán hiện tại của các track dưới dạng Detections."""
+        return Detections(np.ascontiguousarray(_to_boxes(self.states)), self.confs, self.ids)
+
+
+class DetectionSchedule:
+    """Lịch chạy detector: mỗi detect_every khung hình, hoặc mọi khung hình khi cảnh có hoạt động.
+
+    Nếu adaptive, detector chạy mọi khung hình khi có xe trong vùng check-in (để cấp ticket đúng lúc)
+    hoặc khi vừa xuất hiện track mới, và quay lại detect_every khi cảnh yên tĩnh.
+    """
+
+    def __init__(self, detect_every=1, adaptive=True):
+        self.detect_every = max(1, int(detect_every))
+        self.adaptive = adaptive
+        self.interval = self.detect_every
+        self.since_detection = 0
+
+    def due(self):
+        return self.since_detection + 1 >= self.interval
+
+    def detected(self, snapshot, new_tracks):
+        self.since_detection = 0
+        active = self.adaptive and (bool(snapshot.checkin_vehicles) or new_tracks > 0)
+        self.interval = 1 if active else self.detect_every
+
+    def predicted(self):
+        self.since_detection += 1
@@ -0,0 +1,67 @@
+import queue
+import time
+
+import cv2
+import numpy as np
+
+
+def _encode(image, max_width, quality):
+    if image is None:
+        return None
+    height, width = image.shape[:2]
+    if width > max_width:
+        image = cv2.resize(image, (max_width, round(height * max_width / width)), interpolation=cv2.INTER_AREA)
+    ok, encoded = cv2.imencode(".jpg", image, [cv2.IMWRITE_JPEG_QUALITY, quality])
+    return encoded.tobytes() if ok else None
+
+
+def _decode(data):
+    if data is None:
+        return None
+    return cv2.imdecode(np.frombuffer(data, dtype=np.uint8), cv2.IMREAD_COLOR)
+
+
+class PreviewPublisher:
+    """Gửi khung hình đã vẽ từ worker camera về giao diện qua hàng đợi giữa các tiến trình.
+
+    Dùng làm on_frame của process_video (frame hoặc MainMap là None khi view đó không được làm mới, giao
+    diện giữ ảnh cũ). Khung hình được giới hạn max_fps, thu nhỏ về max_width và nén
+    JPEG trước khi gửi; khi hàng đợi đầy (giao diện chưa lấy kịp) khung hình bị bỏ thay vì làm chậm
+    tracking.
+    """
+
+    def __init__(self, camera_id, preview_queue, max_fps=15.0, max_width=960, quality=80):
+        self.camera_id = camera_id
+        self.preview_queue = preview_queue
+        self.min_interval = 1.0 / max_fps if max_fps > 0 else 0.0
+        self.max_width = max_width
+        self.quality = quality
+        self.last_sent = 0.0
+        self.dropped = 0
+
+    def __call__(self, annotated_frame, mapped_frame, snapshot):
+        # MainMap chỉ được vẽ thưa (DisplayScheduler) nên khung hình có MainMap luôn được gửi
+        now = time.perf_counter()
+        if mapped_frame is None and now - self.last_sent < self.min_interval:
+            return
+        self.last_sent = now
+        message = (
+            self.camera_id,
+            _encode(annotated_frame, self.max_width, self.quality),
+            _encode(mapped_frame, self.max_width, self.quality),
+            {"frame": snapshot.frame_index, "available": snapshot.available_count, "total": snapshot.total_slots},
+        )
+        try:
+            self.preview_queue.put_nowait(message)
+        except queue.Full:
+            self.dropped += 1
+
+    def close(self):
+        """Đóng đầu ghi của worker; khung hình đã đưa vào hàng đợi vẫn được gửi trước khi tiến trình thoát."""
+        self.preview_queue.close()
+
+
+def decode_preview(message):
+    """Giải nén thông điệp của PreviewPublisher thành (camera_id, frame, main_map, info)."""
+    camera_id, frame, mapped_frame, info = message
+    return camera_id, _decode(frame), _decode(mapped_frame), info
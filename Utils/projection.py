@@ -0,0 +1,56 @@
+import cv2
+import numpy as np
+
+
+class HomographyProjector:
+    """Ánh xạ tọa độ giữa MainMap và ValLink của một camera.
+
+    Ma trận thuận (MainMap -> ValLink) và nghịch (ValLink -> MainMap) được tính một lần; mỗi lần
+    ánh xạ biến đổi toàn bộ điểm bằng một lời gọi cv2.perspectiveTransform.
+    """
+
+    def __init__(self, homography_matrix):
+        self.forward = np.asarray(homography_matrix, dtype=np.float64)
+        try:
+            self.inverse = np.linalg.inv(self.forward)
+        except np.linalg.LinAlgError:
+            print("Cannot invert homography matrix, ValLink to MainMap mapping disabled")
+            self.inverse = None
+
+    @staticmethod
+    def _transform(points, matrix):
+        points = np.asarray(points, dtype=np.float64).reshape(-1, 2)
+        if points.shape[0] == 0:
+            return points
+        return cv2.perspectiveTransform(points.reshape(-1, 1, 2), matrix).reshape(-1, 2)
+
+    def to_val_link(self, points):
+        """Ánh xạ các điểm (K, 2) từ MainMap sang ValLink."""
+        return self._transform(points, self.forward)
+
+    def to_main_map(self, points):
+        """Ánh xạ các điểm (K, 2) từ ValLink sang MainMap."""
+        if self.inverse is None:
+            return None
+        return self._transform(points, self.inverse)
+
+    def quads_to_val_link(self, quads):
+        """Ánh xạ tất cả tứ giác (M, 4, 2) từ MainMap sang ValLink trong một lần gọi."""
+        quads = np.asarray(quads, dtype=np.float64).reshape(-1, 4, 2)
+        return self.to_val_link(quads.reshape(-1, 2)).reshape(-1, 4, 2)
+
+
+# Projector theo camera
+_projectors = {}
+
+
+def get_projector(camera_id, homography_matrix):
+    """Lấy projector của camera, tạo mới khi chưa có hoặc khi ma trận homography thay đổi."""
+    if homography_matrix is None:
+        _projectors.pop(camera_id, None)
+        return None
+    projector = _projectors.get(camera_id)
+    if projector is None or not np.array_equal(projector.forward, homography_matrix):
+        projector = HomographyProjector(homography_matrix)
+        _projectors[camera_id] = projector
+    return projector
@@ -0,0 +1,67 @@
+import math
+
+import numpy as np
+
+from Utils.detector import Detections
+
+
+def zone_bounds(zone_arrays, frame_shape, margin=0.15):
+    """Hình chữ nhật bao (x0, y0, x1, y1) của tất cả vùng, nới thêm margin mỗi phía và cắt theo khung hình.
+
+    margin tính theo tỷ lệ kích thước hình chữ nhật bao, để xe có tâm trong vùng nhưng thân xe nằm
+    ngoài vùng vẫn được nhìn thấy đầy đủ. Trả về None nếu không có vùng hợp lệ.
+    """
+    points = [zone_array.reshape(-1, 2) for zone_array in zone_arrays if zone_array.shape[0]]
+    if not points:
+        return None
+    points = np.concatenate(points)
+    points = points[~np.isnan(points).any(axis=1)]
+    if points.shape[0] == 0:
+        return None
+    height, width = int(frame_shape[0]), int(frame_shape[1])
+    (x0, y0), (x1, y1) = points.min(axis=0), points.max(axis=0)
+    pad_x, pad_y = (x1 - x0) * margin, (y1 - y0) * margin
+    x0, y0 = max(0, int(math.floor(x0 - pad_x))), max(0, int(math.floor(y0 - pad_y)))
+    x1, y1 = min(width, int(math.ceil(x1 + pad_x))), min(height, int(math.ceil(y1 + pad_y)))
+    if x1 <= x0 or y1 <= y0:
+        return None
+    return x0, y0, x1, y1
+
+
+class ZoneROI:
+    """Vùng cắt khung hình cho suy luận chỉ trên phần chứa slot và check-in.
+
+    imgsz được thu nhỏ theo kích thước vùng cắt để giữ nguyên mật độ pixel so với suy luận toàn khung
+    hình ở base_imgsz, nhờ đó chi phí suy luận giảm gần tỷ lệ với diện tích vùng cắt.
+    """
+
+    def __init__(self, rect, frame_shape, base_imgsz=640, stride=32):
+        self.x0, self.y0, self.x1, self.y1 = rect
+        height, width = int(frame_shape[0]), int(frame_shape[1])
+        scale = base_imgsz / max(height, width)
+        long_side = max(self.x1 - self.x0, self.y1 - self.y0) * scale
+        self.imgsz = min(base_imgsz, max(stride, int(math.ceil(long_side / stride)) * stride))
+        self.area_ratio = (self.x1 - self.x0) * (self.y1 - self.y0) / (height * width)
+
+    @classmethod
+    def from_zones(cls, zone_arrays, frame_shape, base_imgsz=640, margin=0.15, max_area_ratio=0.9):
+        """Tạo ZoneROI từ các vùng; None nếu không có vùng hoặc vùng cắt gần bằng cả khung hình."""
+        rect = zone_bounds(zone_arrays, frame_shape, margin)
+        if rect is None:
+            return None
+        roi = cls(rect, frame_shape, base_imgsz)
+        return roi if roi.area_ratio <= max_area_ratio else None
+
+    def crop(self, frame):
+        return np.ascontiguousarray(frame[self.y0:self.y1, self.x0:self.x1])
+
+    def to_frame(self, detections):
+        """Chuyển box từ tọa độ vùng cắt về tọa độ toàn khung hình."""
+        if len(detections) == 0:
+            return detections
+        offset = np.array([self.x0, self.y0, self.x0, self.y0], dtype=np.float64)
+        return Detections(detections.boxes + offset, detections.confs, detections.ids)
+
+    def __str__(self):
+        return (f"ROI ({self.x0}, {self.y0})-({self.x1}, {self.y1}), {self.area_ratio:.0%} of frame, "
+                f"imgsz {self.imgsz}")
@@ -0,0 +1,93 @@
+"""Chạy tracking không giao diện (headless) như một dịch vụ nền.
+
+Ví dụ:
+    python -m Utils.service --manager admin
+    python -m Utils.service --manager admin --cameras 1 2 --output-dir logs/events --drop-policy drop_oldest
+
+Mỗi camera chạy trong một tiến trình riêng (CameraSupervisor, tự khởi động lại khi crash), không mở cửa
+sổ và không vẽ; sự kiện occupancy, check-in và ticket được ghi vào <output-dir>/camera_<id>.jsonl.
+Dừng bằng Ctrl+C hoặc SIGTERM.
+"""
+import argparse
+import signal
+import sys
+import threading
+
+from Utils.pipeline import DROP_POLICIES, DROP_NONE
+from Utils.supervisor import CameraSupervisor
+
+
+def manager_camera_ids(manager_username):
+    """ID các camera có ValLink của manager."""
+    from DataAccess.dbcontext import DBContext
+    from DataAccess.Repository.camera import CameraRepository
+
+    cameras = CameraRepository(DBContext()).get_cameras_by_manager(manager_username)
+    return [camera.ID for camera in cameras if camera.ValLink]
+
+
+def format_stats(stats):
+    parts = []
+    for camera_id, entry in stats.items():
+        state = f"{entry['fps']:.1f} FPS, {entry['frames']} frames" if entry["alive"] else "stopped"
+        if entry["alive"] and entry["status"] != "running":
+            state = "loading model" if entry["status"] == "loading" else "starting"
+        elif entry["alive"]:
+            state += f", {entry['tracks']} tracks ({entry['evicted']} evicted)"
+        if entry["restarts"]:
+            state += f", {entry['restarts']} restarts"
+        parts.append(f"Camera {camera_id}: {state}")
+    return " | ".join(parts)
+
+
+def run_service(manager_username, camera_ids, output_dir, every_frame=False, drop_policy=DROP_NONE,
+                stats_interval=10.0):
+    """Chạy các camera headless đến khi tất cả kết thúc hoặc nhận tín hiệu dừng."""
+    supervisor = CameraSupervisor(manager_username, camera_ids, worker_options={
+        "headless": True,
+        "output_dir": output_dir,
+        "every_frame": every_frame,
+        "drop_policy": drop_policy,
+    })
+    stop_event = threading.Event()
+
+    def request_stop(signum, frame):
+        print(f"Received signal {signum}, stopping cameras")
+        stop_event.set()
+
+    signal.signal(signal.SIGINT, request_stop)
+    signal.signal(signal.SIGTERM, request_stop)
+
+    supervisor.start()
+    print(f"Running cameras {camera_ids} headless, writing events to {output_dir}")
+    try:
+        while not stop_event.wait(stats_interval):
+            print(format_stats(supervisor.get_stats()))
+            if not supervisor.is_running():
+                break
+    finally:
+        supervisor.stop()
+    print(format_stats(supervisor.get_stats()))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run camera tracking headless and write events to JSONL")
+    parser.add_argument("--manager", required=True, help="Manager username")
+    parser.add_argument("--cameras", type=int, nargs="+", help="Camera IDs (default: all cameras of the manager)")
+    parser.add_argument("--output-dir", default="logs/events", help="Directory for camera_<id>.jsonl")
+    parser.add_argument("--every-frame", action="store_true", help="Write slot occupancy for every frame")
+    parser.add_argument("--drop-policy", choices=DROP_POLICIES, default=DROP_NONE,
+                        help="Queue policy when processing falls behind (drop frames for live cameras)")
+    parser.add_argument("--stats-interval", type=float, default=10.0, help="Seconds between status lines")
+    args = parser.parse_args(argv)
+
+    camera_ids = args.cameras or manager_camera_ids(args.manager)
+    if not camera_ids:
+        print(f"No cameras with a video path for manager {args.manager}")
+        return 1
+    run_service(args.manager, camera_ids, args.output_dir, args.every_frame, args.drop_policy, args.stats_interval)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
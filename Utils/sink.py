@@ -0,0 +1,92 @@
+import json
+import os
+import threading
+import time
+
+
+class JsonlSink:
+    """Ghi bản ghi dạng JSON, mỗi bản ghi một dòng, vào file (ghi thêm, an toàn khi gọi từ nhiều luồng).
+
+    Mỗi dòng được flush ngay (line buffering) để tiến trình khác có thể đọc theo thời gian thực và
+    không mất dữ liệu khi worker bị dừng.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._file = open(path, "a", encoding="utf-8", buffering=1)
+        self._lock = threading.Lock()
+        self.count = 0
+
+    def write(self, record):
+        line = json.dumps(record, separators=(",", ":"))
+        with self._lock:
+            self._file.write(line + "\n")
+            self.count += 1
+
+    def close(self):
+        with self._lock:
+            if not self._file.closed:
+                self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+class OccupancyEventWriter:
+    """Chuyển kết quả từng khung hình thành sự kiện và ghi vào sink.
+
+    Loại sự kiện ("type"):
+        occupancy: trạng thái slot; ghi khi thay đổi, hoặc mọi khung hình nếu every_frame.
+        checkin: xe đi vào vùng check-in.
+        ticket: xe được cấp ticket (kèm valid).
+        invalid: xe có ticket không hợp lệ bắt đầu đỗ trong slot.
+    Mọi sự kiện có camera_id, frame và time (epoch giây).
+    """
+
+    def __init__(self, sink, camera_id, every_frame=False):
+        self.sink = sink
+        self.camera_id = camera_id
+        self.every_frame = every_frame
+        self._last_occupied = None
+        self._checkin = set()
+        self._ticketed = set()
+        self._invalid = set()
+
+    def _write(self, event_type, frame_index, timestamp, **fields):
+        record = {"type": event_type, "camera_id": self.camera_id, "frame": frame_index, "time": timestamp}
+        record.update(fields)
+        self.sink.write(record)
+
+    def add(self, result):
+        snapshot = result["snapshot"]
+        frame_index = result["index"]
+        timestamp = round(time.time(), 3)
+
+        occupied = tuple(slot_id for slot_id, busy in snapshot.slots.items() if busy)
+        if self.every_frame or occupied != self._last_occupied:
+            self._last_occupied = occupied
+            self._write("occupancy", frame_index, timestamp, occupied=list(occupied),
+                        available=snapshot.available_count, total=snapshot.total_slots)
+
+        checkin = set(snapshot.checkin_vehicles)
+        for vehicle_id in sorted(checkin - self._checkin):
+            self._write("checkin", frame_index, timestamp, vehicle_id=vehicle_id,
+                        ticket=snapshot.tickets.get(vehicle_id))
+        self._checkin = checkin
+
+        for vehicle_id, ticket in snapshot.tickets.items():
+            if vehicle_id not in self._ticketed:
+                self._ticketed.add(vehicle_id)
+                self._write("ticket", frame_index, timestamp, vehicle_id=vehicle_id, ticket=ticket,
+                            valid=snapshot.ticket_valid[vehicle_id])
+
+        for vehicle_id in sorted(snapshot.invalid_vehicle_ids - self._invalid):
+            self._write("invalid", frame_index, timestamp, vehicle_id=vehicle_id,
+                        ticket=snapshot.tickets.get(vehicle_id))
+        self._invalid = set(snapshot.invalid_vehicle_ids)
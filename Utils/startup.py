@@ -0,0 +1,65 @@
+import atexit
+import json
+import multiprocessing
+import os
+import subprocess
+import sys
+import time
+
+# Mốc thời gian bắt đầu tiến trình (module này được import đầu tiên trong main.py)
+PROCESS_START = time.perf_counter()
+STARTUP_LOG = os.path.join("logs", "startup.jsonl")
+
+_marks = {}
+_written = False
+
+
+def mark(name, seconds=None):
+    """Ghi lại thời gian (giây) từ lúc khởi động đến sự kiện name, chỉ lần đầu tiên.
+
+    seconds: thời gian đã đo ở tiến trình khác (ví dụ worker camera), mặc định đo ở tiến trình hiện tại.
+    """
+    if name not in _marks:
+        _marks[name] = round(time.perf_counter() - PROCESS_START if seconds is None else seconds, 3)
+        print(f"[startup] {name}: {_marks[name]:.3f}s")
+    return _marks[name]
+
+
+def get_marks():
+    return dict(_marks)
+
+
+def _release():
+    """Phiên bản mã nguồn (git commit) để so sánh thời gian khởi động giữa các bản phát hành."""
+    try:
+        result = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                                timeout=2, cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+        if result.returncode == 0:
+            return result.stdout.strip()
+    except Exception:
+        pass
+    return "unknown"
+
+
+def write_startup_record():
+    """Ghi các mốc khởi động vào logs/startup.jsonl (một dòng JSON mỗi lần chạy)."""
+    global _written
+    # Chỉ ghi cho tiến trình giao diện, không ghi cho các worker camera
+    if _written or not _marks or multiprocessing.parent_process() is not None:
+        return
+    _written = True
+    record = {
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "release": _release(),
+        "python": sys.version.split()[0],
+        "marks": get_marks(),
+    }
+    try:
+        os.makedirs(os.path.dirname(STARTUP_LOG), exist_ok=True)
+        with open(STARTUP_LOG, "a", encoding="utf-8") as f:
+            f.write(json.dumps(record) + "\n")
+    except Exception as e:
+        print(f"Error writing startup record: {str(e)}")
+
+
+atexit.register(write_startup_record)
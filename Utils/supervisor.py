@@ -0,0 +1,303 @@
+import multiprocessing as mp
+import os
+import queue
+import signal
+import threading
+import time
+
+# Mã thoát của worker khi camera không có ValLink (không khởi động lại)
+EXIT_NO_VIDEO = 3
+# Mã thoát của worker khi camera bundle đã cũ so với database (khởi động lại ngay để tải lại dữ liệu)
+EXIT_RELOAD = 4
+# Mã thoát của worker khi không load được dữ liệu camera (ví dụ SQL Server chưa truy cập được)
+EXIT_LOAD_ERROR = 5
+
+
+def camera_worker(camera_id, manager_username, stats_queue, options=None, preview_queue=None, stop_signal=None):
+    """Tiến trình worker cho một camera.
+
+    Mỗi tiến trình import Utils.CameraTracking riêng nên có model YOLO, homography, slot và
+    trạng thái tracking riêng, không dùng chung biến toàn cục với camera khác.
+
+    options (dict, tùy chọn): headless, output_dir (ghi sự kiện vào output_dir/camera_<id>.jsonl),
+    every_frame và drop_policy, chuyển tiếp cho process_video.
+    Nếu có preview_queue, khung hình đã vẽ được gửi về giao diện (PreviewPublisher) thay vì mở cửa sổ.
+    stop_signal (multiprocessing.Event, tùy chọn) do supervisor đặt để yêu cầu worker dừng: pipeline kết thúc,
+    vé chưa dùng được trả lại và sink/preview được đóng trước khi tiến trình thoát.
+    """
+    from Utils.CameraTracking import load_camera_data, process_video
+    from Utils.sink import JsonlSink
+    from Utils.preview import PreviewPublisher
+    from Utils import startup
+
+    options = dict(options or {})
+    output_dir = options.pop("output_dir", None)
+
+    stop_event = threading.Event()
+    reload_event = threading.Event()
+
+    def reload_camera_data():
+        # Bundle đã cũ: dừng phiên này, supervisor khởi động lại worker với dữ liệu mới từ database
+        reload_event.set()
+        stop_event.set()
+
+    try:
+        video_path, destination_zones, checkin_zones, slot_ids = load_camera_data(
+            camera_id, manager_username, on_stale=reload_camera_data, raise_errors=True)
+    except Exception:
+        raise SystemExit(EXIT_LOAD_ERROR)
+    if not video_path:
+        print(f"No video path available for Camera ID {camera_id}")
+        raise SystemExit(EXIT_NO_VIDEO)
+
+    model_reported = False
+
+    def report(stats):
+        nonlocal model_reported
+        # Thống kê đầu tiên sau khi load model kèm thời gian load model tính từ lúc worker khởi động,
+        # giao diện ghi vào startup record (worker không ghi startup record)
+        if not model_reported and stats.get("status", "running") == "running":
+            stats = dict(stats, model_ready=startup.get_marks().get("model_ready"))
+            model_reported = True
+        try:
+            stats_queue.put_nowait(stats)
+        except queue.Full:
+            pass
+
+    # Model được load trong worker (process_video), giao diện hiển thị trạng thái này đến khi có thống kê đầu tiên
+    report({"camera_id": camera_id, "status": "loading"})
+    # SIGTERM (ví dụ từ service hoặc hệ điều hành) cũng dừng pipeline thay vì dừng tiến trình giữa chừng
+    signal.signal(signal.SIGTERM, lambda signum, frame: stop_event.set())
+    if stop_signal is not None:
+        def wait_stop_signal():
+            stop_signal.wait()
+            stop_event.set()
+
+        threading.Thread(target=wait_stop_signal, name="stop-signal", daemon=True).start()
+    sink = JsonlSink(os.path.join(output_dir, f"camera_{camera_id}.jsonl")) if output_dir else None
+    on_frame = PreviewPublisher(camera_id, preview_queue) if preview_queue is not None else None
+    try:
+        process_video(video_path, camera_id, manager_username, destination_zones, checkin_zones, slot_ids,
+                      on_stats=report, sink=sink, stop_event=stop_event, on_frame=on_frame, **options)
+    finally:
+        if sink is not None:
+            sink.close()
+        if on_frame is not None:
+            on_frame.close()
+    if reload_event.is_set():
+        raise SystemExit(EXIT_RELOAD)
+
+
+class CameraSupervisor:
+    """Chạy mỗi camera của một manager trong một tiến trình riêng.
+
+    Supervisor theo dõi các worker trong một luồng nền: thu thập FPS mỗi camera và khởi động lại
+    worker bị crash (exit code khác 0) tối đa max_restarts lần, chờ restart_delay giây giữa các lần.
+    Worker không load được dữ liệu camera (EXIT_LOAD_ERROR, ví dụ SQL Server tạm thời không truy cập được)
+    được thử lại mỗi load_retry_delay giây, không giới hạn số lần. Worker kết thúc bình thường (hết video
+    hoặc người dùng nhấn 'q') hoặc camera không có ValLink không được khởi động lại.
+
+    Nếu preview, worker gửi khung hình đã vẽ vào preview_queue (xem Utils.preview) để giao diện hiển thị.
+    """
+
+    def __init__(self, manager_username, camera_ids, max_restarts=5, restart_delay=2.0, poll_interval=0.5,
+                 worker_options=None, preview=False, load_retry_delay=10.0):
+        self.manager_username = manager_username
+        self.worker_options = worker_options
+        self.camera_ids = list(camera_ids)
+        self.max_restarts = max_restarts
+        self.restart_delay = restart_delay
+        self.load_retry_delay = load_retry_delay
+        self.poll_interval = poll_interval
+        self._context = mp.get_context("spawn")
+        self._stats_queue = self._context.Queue(maxsize=1000)
+        # Hàng đợi nhỏ: giao diện chỉ cần khung hình mới nhất, worker bỏ khung hình khi hàng đợi đầy
+        self.preview_queue = self._context.Queue(maxsize=8) if preview else None
+        self._processes = {}
+        self._stats = {}
+        self._lock = threading.Lock()
+        self._stop_event = threading.Event()
+        self._monitor = None
+        self._restart_at = {}
+        self._stopped = set()
+        self._stop_signals = {}
+        self._stop_deadline = {}
+
+    def start(self):
+        """Khởi động worker cho tất cả camera và luồng giám sát."""
+        for camera_id in self.camera_ids:
+            self._init_stats(camera_id)
+            self._start_worker(camera_id)
+        self._monitor = threading.Thread(target=self._monitor_loop, name="camera-supervisor", daemon=True)
+        self._monitor.start()
+
+    def _init_stats(self, camera_id):
+        with self._lock:
+            self._stats[camera_id] = {"fps": 0.0, "frames": 0, "skipped": 0, "predicted": 0, "tracks": 0,
+                                      "evicted": 0, "restarts": 0, "alive": False, "exitcode": None,
+                                      "status": "starting", "model_ready": None}
+
+    def add_camera(self, camera_id):
+        """Khởi động thêm worker cho camera khi supervisor đang chạy; False nếu camera đang chạy."""
+        process = self._processes.get(camera_id)
+        if process is not None and process.is_alive():
+            return False
+        self._stopped.discard(camera_id)
+        self._restart_at.pop(camera_id, None)
+        self._stop_deadline.pop(camera_id, None)
+        if camera_id not in self.camera_ids:
+            self.camera_ids.append(camera_id)
+        self._init_stats(camera_id)
+        self._start_worker(camera_id)
+        return True
+
+    def stop_camera(self, camera_id, timeout=5.0, wait=True):
+        """Dừng worker của một camera, không khởi động lại.
+
+        Nếu wait=False, không chờ worker thoát: luồng giám sát dừng cưỡng bức worker nếu sau timeout giây vẫn chạy.
+        """
+        self._stopped.add(camera_id)
+        self._restart_at.pop(camera_id, None)
+        if not self._signal_stop(camera_id):
+            return
+        if wait:
+            self._join_workers([camera_id], timeout)
+        else:
+            self._stop_deadline[camera_id] = time.monotonic() + timeout
+
+    def _signal_stop(self, camera_id):
+        """Yêu cầu worker tự dừng (xem camera_worker); False nếu worker không chạy."""
+        process = self._processes.get(camera_id)
+        if process is None or not process.is_alive():
+            return False
+        print(f"Stopping worker for Camera ID {camera_id}")
+        self._stop_signals[camera_id].set()
+        return True
+
+    def _join_workers(self, camera_ids, timeout):
+        # Các worker dùng chung một hạn chờ; chỉ dừng cưỡng bức worker không tự thoát kịp
+        # (có thể làm hỏng hàng đợi preview dùng chung)
+        deadline = time.monotonic() + timeout
+        for camera_id in camera_ids:
+            self._processes[camera_id].join(timeout=max(0.0, deadline - time.monotonic()))
+        stuck = [camera_id for camera_id in camera_ids if self._processes[camera_id].is_alive()]
+        for camera_id in stuck:
+            print(f"Worker for Camera ID {camera_id} did not stop in {timeout}s, terminating")
+            self._processes[camera_id].terminate()
+        for camera_id in stuck:
+            self._processes[camera_id].join(timeout=timeout)
+
+    def _start_worker(self, camera_id):
+        stop_signal = self._context.Event()
+        process = self._context.Process(
+            target=camera_worker,
+            args=(camera_id, self.manager_username, self._stats_queue, self.worker_options, self.preview_queue,
+                  stop_signal),
+            name=f"camera-{camera_id}",
+            daemon=True
+        )
+        process.start()
+        self._processes[camera_id] = process
+        self._stop_signals[camera_id] = stop_signal
+        with self._lock:
+            self._stats[camera_id]["alive"] = True
+            self._stats[camera_id]["status"] = "starting"
+        print(f"Started worker for Camera ID {camera_id} (pid {process.pid})")
+
+    def _drain_stats(self):
+        while True:
+            try:
+                stats = self._stats_queue.get_nowait()
+            except queue.Empty:
+                return
+            with self._lock:
+                entry = self._stats.get(stats["camera_id"])
+                if entry is not None:
+                    entry["status"] = stats.get("status", "running")
+                if entry is not None and stats.get("model_ready") is not None:
+                    entry["model_ready"] = stats["model_ready"]
+                if entry is not None and entry["status"] == "running":
+                    entry["fps"] = stats["fps"]
+                    entry["frames"] = stats["frames"]
+                    entry["skipped"] = stats.get("skipped", 0)
+                    entry["predicted"] = stats.get("predicted", 0)
+                    entry["tracks"] = stats.get("tracks", 0)
+                    entry["evicted"] = stats.get("evicted", 0)
+
+    def _monitor_loop(self):
+        while not self._stop_event.is_set():
+            self._drain_stats()
+            now = time.monotonic()
+            for camera_id, process in list(self._processes.items()):
+                # Bỏ qua worker vừa được thay bằng add_camera
+                if self._processes.get(camera_id) is not process:
+                    continue
+                if process.is_alive():
+                    deadline = self._stop_deadline.get(camera_id)
+                    if deadline is not None and now >= deadline:
+                        print(f"Worker for Camera ID {camera_id} did not stop in time, terminating")
+                        process.terminate()
+                        self._stop_deadline.pop(camera_id, None)
+                    continue
+                self._stop_deadline.pop(camera_id, None)
+                with self._lock:
+                    entry = self._stats[camera_id]
+                    entry["alive"] = False
+                    entry["fps"] = 0.0
+                    entry["exitcode"] = process.exitcode
+                if not self._should_restart(camera_id, process):
+                    continue
+                if process.exitcode == EXIT_RELOAD:
+                    print(f"Reloading camera data for Camera ID {camera_id}")
+                    self._start_worker(camera_id)
+                    continue
+                load_error = process.exitcode == EXIT_LOAD_ERROR
+                if camera_id not in self._restart_at:
+                    if load_error:
+                        print(f"Worker for Camera ID {camera_id} could not load camera data, "
+                              f"retrying in {self.load_retry_delay}s")
+                    else:
+                        print(f"Worker for Camera ID {camera_id} crashed (exit code {process.exitcode}), "
+                              f"restarting in {self.restart_delay}s")
+                    self._restart_at[camera_id] = now + (self.load_retry_delay if load_error else self.restart_delay)
+                elif now >= self._restart_at[camera_id]:
+                    self._restart_at.pop(camera_id, None)
+                    if not load_error:
+                        with self._lock:
+                            entry["restarts"] += 1
+                    self._start_worker(camera_id)
+            self._stop_event.wait(self.poll_interval)
+
+    def get_stats(self):
+        """Trả về bản sao thống kê theo camera.
+
+        {camera_id: {"fps", "frames", "skipped", "predicted", "tracks", "evicted", "restarts", "alive", "exitcode",
+        "status", "model_ready"}}, status là "starting" (đang khởi động tiến trình), "loading" (đang load model)
+        hoặc "running"; model_ready là thời gian (giây) worker load model, None nếu chưa load xong.
+        """
+        with self._lock:
+            return {camera_id: dict(entry) for camera_id, entry in self._stats.items()}
+
+    def _should_restart(self, camera_id, process):
+        if camera_id in self._stopped or process.exitcode in (0, EXIT_NO_VIDEO):
+            return False
+        if process.exitcode in (EXIT_RELOAD, EXIT_LOAD_ERROR):
+            return True
+        return self._stats[camera_id]["restarts"] < self.max_restarts
+
+    def is_running(self):
+        """True nếu còn worker đang chạy hoặc sẽ được khởi động lại."""
+        return any(process.is_alive() or self._should_restart(camera_id, process)
+                   for camera_id, process in list(self._processes.items()))
+
+    def stop(self, timeout=5.0):
+        """Dừng luồng giám sát và tất cả worker."""
+        self._stop_event.set()
+        if self._monitor is not None:
+            self._monitor.join(timeout=timeout)
+        # Báo dừng tất cả worker trước rồi mới chờ, để các camera dừng song song
+        stopping = [camera_id for camera_id in list(self._processes) if self._signal_stop(camera_id)]
+        self._join_workers(stopping, timeout)
+        self._processes.clear()
+        self._stop_signals.clear()
+        self._stop_deadline.clear()
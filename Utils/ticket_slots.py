@@ -0,0 +1,69 @@
+import threading
+
+import numpy as np
+
+
+class AllowedSlotMatrix:
+    """Quan hệ ticket -> slot được phép (TicketAllowSlot) dạng ma trận boolean trong bộ nhớ.
+
+    Mỗi hàng là một ticket, mỗi cột là vị trí của slot trong mảng vùng của camera (thứ tự slot_ids), nên
+    việc kiểm tra mọi xe trong khung hình là một lần tra cứu theo chỉ số hàng (allowed) rồi một phép AND
+    với ma trận slot_membership. Hàng 0 cho phép mọi slot và dùng cho xe chưa có ticket hoặc ticket chưa
+    được nạp. Các hàng được thêm dần khi ticket được giữ chỗ (load); thêm hàng an toàn khi các luồng khác
+    đang tra cứu.
+    """
+
+    def __init__(self, slot_ids, capacity=64):
+        self.slot_ids = list(slot_ids)
+        self._columns = {slot_id: idx for idx, slot_id in enumerate(self.slot_ids)}
+        self._rows = {}
+        self._lock = threading.Lock()
+        self.matrix = np.zeros((max(2, capacity), len(self.slot_ids)), dtype=bool)
+        self.matrix[0] = True
+        self._size = 1
+
+    def __len__(self):
+        return len(self._rows)
+
+    def __contains__(self, ticket):
+        return ticket in self._rows
+
+    def add(self, ticket_slots):
+        """Thêm hoặc cập nhật hàng của các ticket: {ticket: [slot_id, ...]}; slot không thuộc camera bị bỏ qua."""
+        with self._lock:
+            new_tickets = [ticket for ticket in ticket_slots if ticket not in self._rows]
+            matrix = self.matrix
+            needed = self._size + len(new_tickets)
+            if needed > len(matrix):
+                matrix = np.zeros((max(needed, 2 * len(matrix)), len(self.slot_ids)), dtype=bool)
+                matrix[:self._size] = self.matrix[:self._size]
+            rows = dict(zip(new_tickets, range(self._size, needed)))
+            for ticket, slot_ids in ticket_slots.items():
+                row = self._rows.get(ticket, rows.get(ticket))
+                matrix[row] = False
+                columns = [self._columns[slot_id] for slot_id in slot_ids if slot_id in self._columns]
+                matrix[row, columns] = True
+            # Ghi dữ liệu hàng trước, công bố chỉ số hàng sau để luồng tra cứu không đọc hàng chưa ghi
+            self.matrix = matrix
+            self._size = needed
+            self._rows.update(rows)
+
+    def load(self, repository, ticket_ids):
+        """Nạp slot được phép của một khối ticket bằng một truy vấn (TicketRepository.get_allowed_slots).
+
+        Trả về False nếu truy vấn lỗi; khi đó không hàng nào được thêm (ticket vẫn dùng hàng 0) thay vì
+        coi các ticket là không được đỗ slot nào.
+        """
+        rows = repository.get_allowed_slots(list(ticket_ids))
+        if rows is None:
+            return False
+        ticket_slots = {ticket_id: [] for ticket_id in ticket_ids}
+        for ticket_id, slot_id in rows:
+            ticket_slots.setdefault(ticket_id, []).append(slot_id)
+        self.add(ticket_slots)
+        return True
+
+    def allowed(self, tickets):
+        """Ma trận (N, số slot) các slot được phép của từng xe; tickets là ticket của từng xe (None nếu chưa có)."""
+        rows = np.fromiter((self._rows.get(ticket, 0) for ticket in tickets), dtype=np.intp, count=len(tickets))
+        return self.matrix[rows]
@@ -0,0 +1,164 @@
+import random
+import threading
+import time
+from collections import deque
+from datetime import datetime, timedelta
+
+# Số lần start() thử giữ chỗ khối đầu tiên khi lỗi database trước khi bỏ cuộc
+START_ATTEMPTS = 3
+
+
+class TicketDispenser:
+    """Cấp ticket thật (bảng Ticket) cho các xe đi qua check-in của một camera.
+
+    Ticket được giữ chỗ theo khối block_size bằng một truy vấn (TicketRepository.reserve_tickets): mỗi
+    ticket có một dòng TicketIssue với khóa chính là ID ticket, nên các worker camera ở các tiến trình khác
+    nhau không bao giờ nhận cùng một ticket. Trong tiến trình, issue() an toàn khi gọi từ nhiều luồng và chỉ
+    lấy ticket từ khối đã giữ chỗ; khi khối còn ít hơn low_water ticket, luồng nền giữ chỗ khối tiếp theo.
+    Việc gán ticket cho xe (track ID, thời điểm) được ghi lại theo lô mỗi flush_interval giây hoặc khi đủ
+    flush_size lần cấp. Khi bảng Ticket đã hết ticket trống hoặc giữ chỗ bị lỗi, việc giữ chỗ chỉ được thử
+    lại sau retry_interval giây.
+
+    release() trả ticket của xe đã rời đi cùng lô ghi tiếp theo: dòng TicketIssue được đánh dấu ReleasedAt
+    (giữ lại lần gán) và ticket có thể được giữ chỗ lại. Ticket đã gán cho xe còn đỗ khi phiên kết thúc hoặc
+    worker bị dừng đột ngột vẫn được giữ; start() và close() chỉ trả lại ticket giữ chỗ chưa dùng, và start()
+    trả lại các ticket đã gán quá retention giây (None thì không bao giờ) để phiên cũ không giữ ticket mãi.
+
+    on_reserved(ticket_ids), nếu có, được gọi với mỗi khối vừa giữ chỗ trước khi các ticket được cấp (ví dụ
+    để nạp slot được phép của cả khối vào AllowedSlotMatrix); nếu trả về False, khối được trả lại và việc giữ
+    chỗ được thử lại sau retry_interval giây.
+    """
+
+    def __init__(self, repository, manager_username, camera_id, block_size=50, low_water=10, flush_size=20,
+                 flush_interval=2.0, retry_interval=10.0, on_reserved=None, retention=24 * 3600):
+        self.repository = repository
+        self.manager_username = manager_username
+        self.camera_id = camera_id
+        self.block_size = block_size
+        self.low_water = low_water
+        self.flush_size = flush_size
+        self.flush_interval = flush_interval
+        self.retry_interval = retry_interval
+        self.on_reserved = on_reserved
+        self.retention = retention
+        self._exhausted_at = None
+        self._available = deque()
+        self._pending = []
+        self._released = []
+        self._lock = threading.Lock()
+        self._reserve_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._worker = None
+        self.issued = 0
+        self.reserved = 0
+        self.written = 0
+        self.released = 0
+
+    def start(self):
+        """Trả lại ticket giữ chỗ chưa dùng còn sót của camera (worker trước bị dừng đột ngột) và ticket đã
+        gán quá retention, giữ chỗ khối đầu tiên và chạy luồng nền. Trả về False nếu không có ticket nào để
+        cấp hoặc database vẫn lỗi sau START_ATTEMPTS lần thử."""
+        self.repository.release_tickets(self.camera_id)
+        if self.retention is not None:
+            self.repository.return_tickets(self.camera_id,
+                                           issued_before=datetime.now() - timedelta(seconds=self.retention))
+        for attempt in range(START_ATTEMPTS):
+            reserved = self._reserve()
+            if reserved is not None:
+                break
+            self._exhausted_at = None
+            time.sleep(random.uniform(0.5, 1.0) * (attempt + 1))
+        if not reserved:
+            return False
+        self._worker = threading.Thread(target=self._run, name=f"tickets-{self.camera_id}", daemon=True)
+        self._worker.start()
+        return True
+
+    def _reserve(self):
+        """Giữ chỗ một khối ticket; trả về số ticket, 0 nếu hết ticket trống và None nếu lỗi."""
+        with self._reserve_lock:
+            now = time.monotonic()
+            if self._exhausted_at is not None and now - self._exhausted_at < self.retry_interval:
+                return 0
+            ticket_ids = self.repository.reserve_tickets(self.manager_username, self.camera_id, self.block_size)
+            if ticket_ids and self.on_reserved is not None and self.on_reserved(ticket_ids) is False:
+                # Không cấp ticket khi chưa biết slot được phép của chúng
+                self.repository.release_tickets(self.camera_id, ticket_ids)
+                ticket_ids = None
+            self._exhausted_at = None if ticket_ids else now
+            if ticket_ids is None:
+                return None
+            with self._lock:
+                self._available.extend(ticket_ids)
+            self.reserved += len(ticket_ids)
+            return len(ticket_ids)
+
+    def issue(self, track_id):
+        """Cấp ticket cho track_id; None nếu đã hết ticket."""
+        with self._lock:
+            if not self._available:
+                ticket = None
+            else:
+                ticket = self._available.popleft()
+                self._pending.append({"ticket": ticket, "track_id": int(track_id), "issued_at": datetime.now()})
+                self.issued += 1
+            low = len(self._available) < self.low_water
+            full = len(self._pending) >= self.flush_size
+        if ticket is None and self._reserve():
+            # Luồng nền chưa kịp giữ chỗ khối mới: giữ chỗ ngay thay vì bỏ lỡ xe
+            return self.issue(track_id)
+        if low or full:
+            self._wake.set()
+        return ticket
+
+    def release(self, ticket):
+        """Trả lại ticket đã cấp (xe đã rời đi), ghi cùng lô tiếp theo."""
+        with self._lock:
+            self._released.append(ticket)
+
+    def flush(self):
+        """Ghi các lần cấp rồi các ticket trả lại đang chờ, mỗi loại trong một lần cập nhật; lần cấp lỗi được
+        giữ lại để ghi lần sau."""
+        with self._lock:
+            batch, self._pending = self._pending, []
+        written = 0
+        if batch and self.repository.assign_tickets(batch):
+            written = len(batch)
+            self.written += written
+        elif batch:
+            with self._lock:
+                self._pending[:0] = batch
+        with self._lock:
+            # Ticket có lần cấp chưa ghi được chỉ được trả lại sau khi lần cấp đã ghi
+            waiting = {item["ticket"] for item in self._pending}
+            released = [ticket for ticket in self._released if ticket not in waiting]
+            self._released = [ticket for ticket in self._released if ticket in waiting]
+        if released:
+            # Không thử lại nếu lỗi: close() và start() của phiên sau trả lại mọi ticket của camera
+            self.released += self.repository.return_tickets(self.camera_id, released)
+        return written
+
+    def _run(self):
+        while not self._stop.is_set():
+            self._wake.wait(self.flush_interval)
+            self._wake.clear()
+            with self._lock:
+                low = len(self._available) < self.low_water
+            if low:
+                self._reserve()
+            self.flush()
+
+    def close(self):
+        self._stop.set()
+        self._wake.set()
+        if self._worker is not None:
+            self._worker.join(timeout=5)
+        self.flush()
+        with self._lock:
+            unused, self._available = list(self._available), deque()
+        self.repository.release_tickets(self.camera_id, unused)
+
+    def __str__(self):
+        return (f"tickets: {self.issued} issued, {self.written} written, {self.released} released, "
+                f"{self.reserved - self.issued} reserved unused")
@@ -0,0 +1,89 @@
+from collections import OrderedDict
+
+
+class TrackStateStore:
+    """Trạng thái theo track ID (ví dụ ticket đã cấp) với thời điểm thấy lần cuối và cơ chế loại bỏ.
+
+    Dùng như dict {track_id: giá trị}. Thời gian tính bằng số lần tracker được cập nhật (tick), cùng đơn
+    vị với track_buffer của tracker: track không được thấy quá ttl tick đã bị tracker xóa và ID sẽ không
+    quay lại, nên được loại bỏ (hết hạn). Nếu có max_tracks, khi vượt quá thì track thấy lâu nhất bị loại
+    bỏ trước (LRU). Các entry được giữ theo thứ tự thấy lần cuối nên mỗi lần loại bỏ chỉ tốn chi phí
+    theo số entry bị loại.
+
+    on_evict(track_id, giá trị), nếu có, được gọi cho mỗi entry hết hạn hoặc bị loại bỏ (không gọi khi clear).
+    """
+
+    def __init__(self, ttl=None, max_tracks=None, on_evict=None):
+        self.ttl = ttl
+        self.max_tracks = max_tracks
+        self.on_evict = on_evict
+        self.now = 0
+        self._entries = OrderedDict()  # track_id -> [giá trị, tick thấy lần cuối]
+        self.expired = 0
+        self.evicted_lru = 0
+
+    def __contains__(self, track_id):
+        return track_id in self._entries
+
+    def __getitem__(self, track_id):
+        return self._entries[track_id][0]
+
+    def __setitem__(self, track_id, value):
+        self._entries[track_id] = [value, self.now]
+        self._entries.move_to_end(track_id)
+        if self.max_tracks is not None:
+            while len(self._entries) > self.max_tracks:
+                evicted_id, entry = self._entries.popitem(last=False)
+                self.evicted_lru += 1
+                if self.on_evict is not None:
+                    self.on_evict(evicted_id, entry[0])
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __iter__(self):
+        return iter(self._entries)
+
+    def get(self, track_id, default=None):
+        entry = self._entries.get(track_id)
+        return default if entry is None else entry[0]
+
+    def items(self):
+        return ((track_id, entry[0]) for track_id, entry in self._entries.items())
+
+    def values(self):
+        return (entry[0] for entry in self._entries.values())
+
+    def last_seen(self, track_id):
+        return self._entries[track_id][1]
+
+    def seen(self, track_ids, now):
+        """Ghi nhận các track có mặt ở tick now và loại bỏ các track đã hết hạn."""
+        self.now = now
+        for track_id in track_ids:
+            entry = self._entries.get(track_id)
+            if entry is not None:
+                entry[1] = now
+                self._entries.move_to_end(track_id)
+        if self.ttl is not None:
+            while self._entries:
+                track_id, entry = next(iter(self._entries.items()))
+                if now - entry[1] <= self.ttl:
+                    break
+                del self._entries[track_id]
+                self.expired += 1
+                if self.on_evict is not None:
+                    self.on_evict(track_id, entry[0])
+
+    def clear(self):
+        self._entries.clear()
+        self.now = 0
+        self.expired = 0
+        self.evicted_lru = 0
+
+    @property
+    def evicted(self):
+        return self.expired + self.evicted_lru
+
+    def __str__(self):
+        return f"tracks: {len(self)} live, {self.expired} expired, {self.evicted_lru} evicted (LRU)"
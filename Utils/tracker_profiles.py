@@ -0,0 +1,48 @@
+import os
+
+# File cấu hình tracker gốc và thư mục chứa các biến thể được sinh ra từ nó
+BASE_TRACKER_CONFIG = "botsort.yaml"
+TRACKER_PROFILE_DIR = os.path.join("cache", "trackers")
+
+# Mỗi profile là các khóa ghi đè lên botsort.yaml
+TRACKER_PROFILES = {
+    "botsort-reid": {},
+    "botsort": {"with_reid": False},
+    "botsort-buffer30": {"with_reid": False, "track_buffer": 30},
+    "botsort-buffer90": {"with_reid": False, "track_buffer": 90},
+    "bytetrack": {"tracker_type": "bytetrack", "with_reid": False},
+    "bytetrack-buffer90": {"tracker_type": "bytetrack", "with_reid": False, "track_buffer": 90},
+}
+
+
+def tracker_config_path(profile):
+    """Đường dẫn file cấu hình tracker của profile, sinh từ botsort.yaml nếu chưa có hoặc đã cũ.
+
+    profile là None hoặc "botsort-reid" thì dùng trực tiếp botsort.yaml.
+    """
+    if profile is None or not TRACKER_PROFILES.get(profile, True):
+        return BASE_TRACKER_CONFIG
+    if profile not in TRACKER_PROFILES:
+        raise ValueError(f"Unknown tracker profile '{profile}', expected one of {list(TRACKER_PROFILES)}")
+    path = os.path.join(TRACKER_PROFILE_DIR, f"{profile}.yaml")
+    if os.path.exists(path) and os.path.getmtime(path) >= os.path.getmtime(BASE_TRACKER_CONFIG):
+        return path
+    import yaml
+    with open(BASE_TRACKER_CONFIG, encoding="utf-8") as f:
+        config = yaml.safe_load(f)
+    config.update(TRACKER_PROFILES[profile])
+    os.makedirs(TRACKER_PROFILE_DIR, exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        yaml.safe_dump(config, f, sort_keys=False)
+    return path
+
+
+def tracker_buffer(config_path):
+    """track_buffer (số lần cập nhật giữ track bị mất) của file cấu hình tracker; 30 nếu không đọc được."""
+    import yaml
+    try:
+        with open(config_path, encoding="utf-8") as f:
+            return int((yaml.safe_load(f) or {}).get("track_buffer", 30))
+    except (OSError, ValueError, yaml.YAMLError) as e:
+        print(f"Error reading track_buffer from {config_path}: {str(e)}")
+        return 30
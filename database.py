@@ -1 +1,7 @@
-server = "DESKTOP-M0KCUVC"
\ No newline at end of file
+server = "DESKTOP-M0KCUVC"
+
+# Connection pool dùng chung cho cả tiến trình (xem DataAccess/dbcontext.py)
+pool_size = 5
+max_overflow = 10
+pool_pre_ping = True
+pool_recycle = 1800
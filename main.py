@@ -1,4 +1,5 @@
 # main.py
+from Utils import startup  # Import đầu tiên để đo thời gian khởi động
 from PyQt5 import QtWidgets
 import sys
 from Presentation.Login import LoginView
@@ -9,6 +10,7 @@ def main():
     app = QApplication(sys.argv)
     login = LoginView()
     login.showMaximized()
+    startup.mark("login_shown")
     sys.exit(app.exec_())
 
 if __name__ == "__main__":